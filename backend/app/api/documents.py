@@ -1,5 +1,8 @@
-from fastapi import APIRouter, UploadFile, HTTPException, Depends
+import asyncio
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from app.core.config import settings
+from app.utils.uploads import UploadReceiver
 from app.utils.validators import FileValidator
 from pydantic import BaseModel, ConfigDict
 from app.core.service_container import ServiceContainer
@@ -20,44 +23,154 @@ class DocumentResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
-@router.post("/documents/upload")
+# The body is parsed by UploadReceiver rather than FastAPI, so describe it here
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@router.post("/documents/upload", status_code=202, openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_document(
-    file: UploadFile,
+    request: Request,
     current_user: str = Depends(get_current_user),
     services: ServiceContainer = Depends(ServiceContainer.get_instance)
 ):
-    """Upload and index a document."""
+    """Upload a document and queue it for indexing."""
+    receiver = UploadReceiver(file_validator)
     try:
-        logger.debug(f"Received upload request for file: {file.filename}")
-        # Validate file
-        content = await file.read()
-        file_validator.validate_file(content, file.filename)
+        # Stream and validate the file; bad uploads are rejected mid-stream
+        file = await receiver.receive(request)
+        logger.debug(f"Received upload {file.filename} ({file.size} bytes), queueing document")
         
-        logger.debug("File validation passed, indexing document")
-        # Index document
-        doc_id = await services.index_service.index_document(
-            content=content,
+        # Indexing runs in the background, progress is reported on the job
+        job = await services.ingestion_service.submit(
+            file=file.file,
             filename=file.filename,
             user_id=str(current_user.id)
         )
         
-        logger.debug("Document indexed successfully")
-        return {"id": doc_id}
+        logger.debug(f"Document queued as job {job['id']}")
+        return {"id": job["doc_id"], "job_id": job["id"], "status": job["status"]}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        receiver.close()
+
+BULK_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                    }
+                }
+            }
+        }
+    }
+}
+
+@router.post("/documents/upload/bulk", status_code=202, openapi_extra=BULK_UPLOAD_REQUEST_BODY)
+async def upload_documents(
+    request: Request,
+    current_user: str = Depends(get_current_user),
+    services: ServiceContainer = Depends(ServiceContainer.get_instance)
+):
+    """Upload several documents, or zip archives of them, and queue them as one job."""
+    receiver = UploadReceiver(
+        file_validator,
+        field_name="files",
+        max_files=settings.BULK_UPLOAD_MAX_FILES,
+        max_total_size=settings.BULK_UPLOAD_MAX_SIZE,
+        archive_extensions={"zip"}
+    )
+    try:
+        # Invalid files are set aside with a reason instead of failing the request
+        await receiver.receive_all(request)
+        files = await asyncio.to_thread(receiver.expand_archives)
+        logger.debug(f"Received bulk upload of {len(files)} files, {len(receiver.rejected)} rejected")
+
+        job = await services.ingestion_service.submit_bulk(
+            files=[(file.file, file.filename) for file in files],
+            user_id=str(current_user.id),
+            rejected=receiver.rejected
+        )
+
+        logger.debug(f"Bulk upload queued as job {job['id']}")
+        return {"job_id": job["id"], "status": job["status"], "files": job["files"]}
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        receiver.close()
+
+@router.get("/documents/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user),
+    services: ServiceContainer = Depends(ServiceContainer.get_instance)
+):
+    """Get status and stage-level progress of an upload"""
+    try:
+        job = await services.ingestion_service.get_job(job_id, str(current_user.id))
+    except Exception as e:
+        logger.error(f"Error getting ingestion job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.get("/documents/list")
 async def list_documents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.DOCUMENT_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "filename", "size", "chunks"] = "created_at",
+    order: Literal["asc", "desc"] = "asc",
+    active: Optional[bool] = None,
+    q: Optional[str] = None,
     current_user: str = Depends(get_current_user),
     services: ServiceContainer = Depends(ServiceContainer.get_instance)
 ):
-    """Get list of all documents"""
+    """Get a page of documents; the X-Next-Cursor header, if set, fetches the next one.
+
+    Without limit and cursor all documents are returned, as before paging.
+    """
+    if limit is None and cursor:
+        limit = settings.DOCUMENT_PAGE_SIZE
     try:
-        docs = await services.index_service.get_user_documents(str(current_user.id))
+        docs, next_cursor = await services.index_service.list_documents(
+            str(current_user.id),
+            limit,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc",
+            active=active,
+            search=q
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         logger.info(f"Retrieved {len(docs)} documents")
         return docs
+    except ValueError as e:
+        # Cursors of another sort order or mangled ones
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -93,12 +206,13 @@ async def clear_documents(
 async def update_document_status(
     doc_id: str,
     status: DocumentStatus,
+    current_user: str = Depends(get_current_user),
     services: ServiceContainer = Depends(ServiceContainer.get_instance)
 ):
     """Update document active status"""
     logger.debug(f"Updating document status for {doc_id} to {status.active}")
     try:
-        await services.index_service.update_document_status(doc_id, status.active)
+        await services.index_service.update_document_status(doc_id, str(current_user.id), status.active)
         return {"status": "success"}
     except Exception as e:
         logger.error(f"Error updating document status: {str(e)}")
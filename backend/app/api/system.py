@@ -50,4 +50,15 @@ async def switch_provider(
     
     except Exception as e:
         logger.exception("Error switching provider")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.get("/embeddings/metrics")
+async def get_embedding_metrics(
+    services: ServiceContainer = Depends(ServiceContainer.get_instance)
+):
+    """Get query embedding batch-size distribution and queueing delay"""
+    try:
+        return services.index_service.query_batcher.metrics.snapshot()
+    except Exception as e:
+        logger.exception("Error getting embedding metrics")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,95 @@
+"""Move chunks into the multi-tenant collection and manage its tenants.
+
+``migrate`` copies every cataloged document, vectors included, from the
+shared Documents collection into the tenant of each user who has it, so
+nothing is re-embedded; running it again only fills in what is missing.
+Switch WEAVIATE_MULTI_TENANCY on once it is done. ``status`` deactivates
+or offloads the tenants of idle users, and ``list`` shows them all::
+
+    python -m app.cli.tenants migrate
+    python -m app.cli.tenants status inactive user-42 user-43
+    python -m app.cli.tenants list
+"""
+import argparse
+import asyncio
+import time
+
+from weaviate.classes.tenants import TenantActivityStatus
+
+from app.core.config import settings
+from app.services.catalog_service import DocumentCatalog
+from app.services.db_service import DatabaseService
+from app.services.index_service import tenant_name
+from app.utils.logger import setup_logger
+from app.utils.weaviate_client import create_vector_store, ensure_collection
+from app.vectorstores import WeaviateChunkStore
+
+
+logger = setup_logger(__name__)
+
+
+async def migrate(client) -> None:
+    ensure_collection(client, settings.WEAVIATE_TENANT_COLLECTION, multi_tenancy=True)
+    source = WeaviateChunkStore(client, index_name="Documents")
+    root = WeaviateChunkStore(client, index_name=settings.WEAVIATE_TENANT_COLLECTION)
+    targets = {}
+    db_service = DatabaseService()
+    await db_service.initialize()
+    started = time.perf_counter()
+    documents = copies = failed = 0
+    try:
+        catalog = DocumentCatalog(db_service)
+        await catalog.initialize()
+        async for document in catalog.iter_documents():
+            documents += 1
+            # Users sharing a tenant share one copy
+            for tenant in sorted({tenant_name(user_id) for user_id in document["users"]}):
+                if tenant not in targets:
+                    targets[tenant] = root.for_tenant(tenant)
+                try:
+                    copies += await asyncio.to_thread(source.copy_document, document["doc_id"], targets[tenant])
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Failed to copy {document['doc_id']} into {tenant}: {str(e)}")
+    finally:
+        await db_service.close()
+    print(f"Copied {copies} chunks of {documents} documents into {len(targets)} tenants "
+          f"in {time.perf_counter() - started:.1f}s, {failed} copies failed")
+
+
+def set_status(client, status: str, tenants) -> None:
+    root = WeaviateChunkStore(client, index_name=settings.WEAVIATE_TENANT_COLLECTION)
+    root.set_tenant_status(tenants, TenantActivityStatus[status.upper()])
+    print(f"Set {len(tenants)} tenants {status}")
+
+
+def list_tenants(client) -> None:
+    root = WeaviateChunkStore(client, index_name=settings.WEAVIATE_TENANT_COLLECTION)
+    for name, status in sorted(root.tenants().items()):
+        print(f"{name}\t{status.value}")
+
+
+async def main(args) -> None:
+    # Tenant names and the tenant collection are those of a multi-tenant setup
+    settings.WEAVIATE_MULTI_TENANCY = True
+    vector_store = await create_vector_store()
+    try:
+        if args.command == "migrate":
+            await migrate(vector_store.client)
+        elif args.command == "status":
+            set_status(vector_store.client, args.status, args.tenants)
+        else:
+            list_tenants(vector_store.client)
+    finally:
+        vector_store.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Copy every document into the tenants of its users")
+    status = commands.add_parser("status", help="Activate, deactivate or offload tenants")
+    status.add_argument("status", choices=["active", "inactive", "offloaded"])
+    status.add_argument("tenants", nargs="+")
+    commands.add_parser("list", help="List tenants with their status")
+    asyncio.run(main(parser.parse_args()))
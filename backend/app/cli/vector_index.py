@@ -0,0 +1,111 @@
+"""Show and migrate the HNSW index settings of the chunk collections.
+
+Search ef, the filter strategy and turning compression on are applied in
+place whenever the app, or this command, connects to Weaviate. The
+neighbour count, ef_construction and a change of compression are fixed
+when a collection is created. ``rebuild`` copies the collection,
+vectors included, into a scratch collection, recreates it with the
+current settings and copies everything back. Nothing is re-embedded, but
+searches find nothing and writes are lost while it runs, so stop the app
+first::
+
+    WEAVIATE_COMPRESSION=bq python -m app.cli.vector_index rebuild Documents
+    python -m app.cli.vector_index show
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.utils.exceptions import VectorStoreError
+from app.utils.logger import setup_logger
+from app.utils.weaviate_client import compression_of, create_vector_store, ensure_collection
+
+
+logger = setup_logger(__name__)
+
+
+def chunk_collections(client):
+    names = ["Documents"]
+    if client.collections.exists(settings.WEAVIATE_TENANT_COLLECTION):
+        names.append(settings.WEAVIATE_TENANT_COLLECTION)
+    return names
+
+
+def show(client) -> None:
+    print(f"configured: ef_construction={settings.WEAVIATE_HNSW_EF_CONSTRUCTION} "
+          f"max_connections={settings.WEAVIATE_HNSW_MAX_CONNECTIONS} ef={settings.WEAVIATE_HNSW_EF} "
+          f"filter_strategy={settings.WEAVIATE_FILTER_STRATEGY} compression={settings.WEAVIATE_COMPRESSION}")
+    for name in chunk_collections(client):
+        index = client.collections.get(name).config.get().vector_index_config
+        print(f"{name}: ef_construction={index.ef_construction} max_connections={index.max_connections} "
+              f"ef={index.ef} filter_strategy={index.filter_strategy.value} compression={compression_of(index)}")
+
+
+def copy_collection(client, source: str, target: str, tenant=None) -> int:
+    """Copy every object of a collection, or of one of its tenants, with its vector"""
+    collection = client.collections.get(source)
+    if tenant:
+        collection = collection.with_tenant(tenant)
+    copied = 0
+    with client.batch.dynamic() as batch:
+        for obj in collection.iterator(include_vector=True):
+            batch.add_object(
+                collection=target,
+                properties=obj.properties,
+                uuid=obj.uuid,
+                vector=obj.vector["default"],
+                tenant=tenant
+            )
+            copied += 1
+    failed = client.batch.failed_objects
+    if failed:
+        logger.error(f"Failed to copy {len(failed)} objects from {source} to {target}: {failed[0].message}")
+        raise VectorStoreError(f"Failed to copy {len(failed)} objects from {source} to {target}")
+    return copied
+
+
+def copy_all(client, source: str, target: str, multi_tenancy: bool) -> int:
+    if not multi_tenancy:
+        return copy_collection(client, source, target)
+    # Target tenants are created as they are written to
+    tenants = client.collections.get(source).tenants.get()
+    return sum(copy_collection(client, source, target, tenant) for tenant in sorted(tenants))
+
+
+def rebuild(client, name: str) -> None:
+    scratch = f"{name}Rebuild"
+    if client.collections.exists(scratch):
+        raise SystemExit(f"{scratch} is left over from an interrupted rebuild; "
+                         f"check whether it or {name} holds the chunks before deleting it")
+    multi_tenancy = client.collections.get(name).config.get().multi_tenancy_config.enabled
+    started = time.perf_counter()
+    ensure_collection(client, scratch, multi_tenancy=multi_tenancy)
+    copied = copy_all(client, name, scratch, multi_tenancy)
+    client.collections.delete(name)
+    ensure_collection(client, name, multi_tenancy=multi_tenancy)
+    restored = copy_all(client, scratch, name, multi_tenancy)
+    if restored != copied:
+        raise SystemExit(f"Copied {copied} objects out of {name} but only {restored} back; {scratch} is kept")
+    client.collections.delete(scratch)
+    print(f"Rebuilt {name} with {restored} objects in {time.perf_counter() - started:.1f}s")
+
+
+async def main(args) -> None:
+    vector_store = await create_vector_store()
+    client = vector_store.client
+    try:
+        if args.command == "rebuild":
+            rebuild(client, args.collection)
+        show(client)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="Configured and actual index settings")
+    rebuild_parser = commands.add_parser("rebuild", help="Recreate a collection with the configured index")
+    rebuild_parser.add_argument("collection", help="Chunk collection to rebuild, e.g. Documents")
+    asyncio.run(main(parser.parse_args()))
@@ -2,6 +2,8 @@
 from app.services.db_service import DatabaseService
 from app.services.url_service import URLService
 from app.services.index_service import LlamaIndexService
+from app.services.catalog_service import DocumentCatalog
+from app.services.ingestion_service import IngestionService
 from app.services.cache_service import CacheService
 from app.services.qa_service import QAService
 from app.utils.logger import setup_logger
@@ -21,8 +23,10 @@ async def get_instance(cls):
     def __init__(self):
         self.llm_service = None
         self.db_service = None
+        self.catalog = None
         self.url_service = None
         self.index_service = None
+        self.ingestion_service = None
         self.cache_service = None
         self.qa_service = None
         self._initialized = False
@@ -42,12 +46,20 @@ async def initialize(self):
             self.db_service = DatabaseService()
             await self.db_service.initialize()
 
+            # Document access and status live next to the other relational data
+            self.catalog = DocumentCatalog(self.db_service)
+            await self.catalog.initialize()
 
             # Initialize URL service with cache
             self.url_service = URLService(self.cache_service)
 
-            self.index_service = LlamaIndexService()
+            # Ingestion locks live in Redis so all API processes see them
+            self.index_service = LlamaIndexService(self.catalog, self.cache_service)
             await self.index_service.initialize()
+
+            # Background ingestion workers share Redis with the cache
+            self.ingestion_service = IngestionService(self.cache_service, self.index_service)
+            await self.ingestion_service.initialize()
                         
             self.qa_service = QAService()
             self.qa_service.initialize(
@@ -68,6 +80,7 @@ async def cleanup(self):
         """Cleanup services on shutdown"""
         try:
             logger.info("Cleaning up services...")
+            await self.ingestion_service.close()
             await self.cache_service.close()
             await self.db_service.close()
             await self.index_service.close()
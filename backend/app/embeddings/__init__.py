@@ -0,0 +1,8 @@
+from .base_embedder import BaseEmbedder
+from .local_embedder import LocalEmbedder
+from .remote_embedder import RemoteEmbedder
+from .onnx_embedder import OnnxEmbedder
+from .batcher import EmbeddingBatcher
+from .cache import EmbeddingCache
+
+__all__ = ['BaseEmbedder', 'LocalEmbedder', 'RemoteEmbedder', 'OnnxEmbedder', 'EmbeddingBatcher', 'EmbeddingCache']
@@ -0,0 +1,24 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+
+class BaseEmbedder(ABC):
+    @property
+    @abstractmethod
+    def model_id(self) -> str:
+        pass
+
+    @abstractmethod
+    async def initialize(self):
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a contiguous float32 matrix of shape (len(texts), dim)"""
+        pass
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.embeddings.base_embedder import BaseEmbedder
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+PendingRequest = Tuple[str, asyncio.Future, float]
+
+
+class BatcherMetrics:
+    """Batch-size distribution and queueing delay of an EmbeddingBatcher"""
+
+    def __init__(self, window: int = 1024):
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes: Counter = Counter()
+        self.max_delay = 0.0
+        # Recent delays only, so percentiles follow the current load
+        self._delays: deque = deque(maxlen=window)
+
+    def record_batch(self, delays: List[float]) -> None:
+        self.batches += 1
+        self.requests += len(delays)
+        self.batch_sizes[len(delays)] += 1
+        self._delays.extend(delays)
+        self.max_delay = max(self.max_delay, *delays)
+
+    def snapshot(self) -> Dict:
+        delays = sorted(self._delays)
+
+        def percentile(p: float) -> float:
+            if not delays:
+                return 0.0
+            return round(delays[min(len(delays) - 1, int(p * len(delays)))] * 1000, 3)
+
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "queue_delay_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(self.max_delay * 1000, 3)
+            }
+        }
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched forward passes.
+
+    A batch is dispatched as soon as it holds max_batch_size texts or its
+    oldest request has waited max_wait_ms, whichever comes first. While a
+    batch is running new requests keep queueing, so bursts naturally form
+    larger batches.
+    """
+
+    def __init__(self, embedder: BaseEmbedder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = BatcherMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text as part of the next batch, returning its row of the batch matrix"""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed several texts, sharing forward passes with concurrent callers"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self._ensure_running()
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait((text, future, enqueued))
+            futures.append(future)
+        try:
+            return np.vstack(await asyncio.gather(*futures))
+        finally:
+            # Rows still queued are dropped from later batches
+            for future in futures:
+                future.cancel()
+
+    async def close(self):
+        """Stop the dispatcher and fail requests that never ran"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher closed"))
+            self._queue = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            await self._dispatch(batch)
+
+    async def _collect_batch(self) -> List[PendingRequest]:
+        """Wait for a first request, then gather more until the batch is full or its deadline passes"""
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything that arrived meanwhile rides along for free
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _dispatch(self, batch: List[PendingRequest]):
+        """Run one forward pass and resolve each caller's future on its own"""
+        started = time.perf_counter()
+        self.metrics.record_batch([started - enqueued for _, _, enqueued in batch])
+        # Callers that gave up while queued don't need a slot in the batch
+        live = [request for request in batch if not request[1].done()]
+        if not live:
+            return
+        try:
+            vectors = await self.embedder.embed_batch([text for text, _, _ in live])
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(live)} queries: {str(e)}")
+            for _, future, _ in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(live, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+VECTOR_DTYPE = np.dtype("<f4")
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingCache:
+    """On-disk embedding store keyed by hash(model id + chunk text).
+
+    Vectors are stored as float32 blobs in SQLite (WAL mode, so several API
+    workers can share one file). Once the store holds more than max_entries
+    vectors the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, model_id: str, max_entries: int = 500_000):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache opened at {path} ({self._size} entries)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts: Sequence[str]) -> Dict[int, np.ndarray]:
+        """Look up texts, returning cached vectors by position in the input"""
+        positions: Dict[bytes, List[int]] = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(self.key(text), []).append(i)
+
+        found: Dict[int, np.ndarray] = {}
+        keys = list(positions)
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=VECTOR_DTYPE)
+                    for i in positions[key]:
+                        found[i] = vector
+                if rows:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Store vectors for texts and evict the least recently used entries over the limit"""
+        if not texts:
+            return
+        now = time.time()
+        matrix = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+        rows = [
+            (self.key(text), matrix[i].tobytes(), now)
+            for i, text in enumerate(texts)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+            self._size += self._conn.total_changes - before
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Evict down to 90% of the limit so eviction doesn't run on every insert
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Evicted {excess} entries from embedding cache")
@@ -0,0 +1,69 @@
+import asyncio
+import backoff
+from typing import List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+from app.core.config import settings
+from app.embeddings.base_embedder import BaseEmbedder
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+@backoff.on_exception(
+    backoff.expo,
+    Exception,
+    max_tries=3,
+    max_time=30
+)
+def create_embedding_model():
+    logger.info("Creating embedding model...")
+    model = HuggingFaceEmbedding(
+        model_name=settings.EMBEDDING_MODEL,
+        cache_folder=settings.EMBEDDING_MODEL_CACHE,
+        embed_batch_size=settings.EMBED_BATCH_SIZE
+    )
+    logger.info("Embedding model created successfully")
+    return model
+
+
+class LocalEmbedder(BaseEmbedder):
+    """Runs a llama_index embedding model inside the current process"""
+
+    def __init__(self, embed_model: BaseEmbedding):
+        self.embed_model = embed_model
+
+    @property
+    def model_id(self) -> str:
+        return getattr(self.embed_model, "model_name", self.embed_model.class_name())
+
+    async def initialize(self):
+        """Nothing to do, the model is loaded on construction"""
+        pass
+
+    async def close(self):
+        """Nothing to do, the model lives as long as the process"""
+        pass
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one forward pass in a worker thread to keep the event loop free"""
+        return await asyncio.to_thread(self._encode, texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        model = self.embed_model
+        if isinstance(model, HuggingFaceEmbedding):
+            # Call sentence-transformers directly: llama_index would turn the
+            # output matrix into one Python float object per dimension
+            vectors = model._model.encode(
+                texts,
+                batch_size=model.embed_batch_size,
+                prompt_name="text",
+                normalize_embeddings=model.normalize,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            return np.ascontiguousarray(vectors, dtype=np.float32)
+        return np.asarray(model.get_text_embedding_batch(texts), dtype=np.float32)
@@ -0,0 +1,158 @@
+import asyncio
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.embeddings.base_embedder import BaseEmbedder
+from app.utils.exceptions import EmbeddingError
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+_INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+class OnnxEmbedder(BaseEmbedder):
+    """Runs a BERT-style sentence embedder (bge-small-en) through ONNX Runtime on CPU.
+
+    On first use the HuggingFace checkpoint is exported to ONNX and, if
+    requested, dynamically quantized to int8. Both files are kept in
+    model_dir so later starts only load them. Outputs use CLS pooling and L2
+    normalisation, matching the sentence-transformers config of bge models.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: str,
+        cache_folder: Optional[str] = None,
+        quantize: bool = True,
+        intra_op_threads: int = 0,
+        max_length: int = 512
+    ):
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.cache_folder = cache_folder
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.max_length = max_length
+        self._session = None
+        self._tokenizer = None
+        self._input_names: List[str] = []
+
+    @property
+    def model_id(self) -> str:
+        # Quantized vectors differ slightly, keep them apart in the embedding cache
+        return f"{self.model_name}:onnx-{'int8' if self.quantize else 'fp32'}"
+
+    async def initialize(self):
+        """Export, quantize and load the model in a worker thread"""
+        if self._session is None:
+            await asyncio.to_thread(self._load)
+
+    async def close(self):
+        self._session = None
+        self._tokenizer = None
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one forward pass in a worker thread to keep the event loop free"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return await asyncio.to_thread(self._embed, texts)
+
+    def _load(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise EmbeddingError("The 'onnx' embedding backend requires the onnxruntime package") from e
+        from transformers import AutoTokenizer
+
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, cache_dir=self.cache_folder)
+        model_path = self._ensure_model_file()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self._session.get_inputs()]
+        logger.info(f"Loaded ONNX embedding model {self.model_id} from {model_path}")
+
+    def _ensure_model_file(self) -> str:
+        """Return the ONNX model path, exporting and quantizing it if missing"""
+        os.makedirs(self.model_dir, exist_ok=True)
+        base_name = self.model_name.replace("/", "__")
+        fp32_path = os.path.join(self.model_dir, f"{base_name}.onnx")
+        int8_path = os.path.join(self.model_dir, f"{base_name}.int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+        if not self.quantize:
+            return fp32_path
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info(f"Quantizing {fp32_path} to int8")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _export(self, path: str):
+        import torch
+        from transformers import AutoModel
+
+        class HiddenStates(torch.nn.Module):
+            # Fixed positional inputs and a single tensor output keep the traced graph simple
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    token_type_ids=token_type_ids
+                ).last_hidden_state
+
+        logger.info(f"Exporting {self.model_name} to ONNX at {path}")
+        model = HiddenStates(AutoModel.from_pretrained(self.model_name, cache_dir=self.cache_folder))
+        model.eval()
+        sample = self._tokenizer(["export sample"], return_tensors="pt")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in _INPUT_NAMES}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in _INPUT_NAMES),
+                path,
+                input_names=_INPUT_NAMES,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False
+            )
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encoded = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feed = {name: encoded[name].astype(np.int64) for name in self._input_names}
+        hidden = self._session.run(None, feed)[0]
+        cls = hidden[:, 0]
+        cls /= np.linalg.norm(cls, axis=1, keepdims=True).clip(min=1e-12)
+        return np.ascontiguousarray(cls, dtype=np.float32)
+
+
+def create_onnx_embedder() -> OnnxEmbedder:
+    return OnnxEmbedder(
+        model_name=settings.EMBEDDING_MODEL,
+        model_dir=settings.ONNX_MODEL_DIR,
+        cache_folder=settings.EMBEDDING_MODEL_CACHE,
+        quantize=settings.ONNX_QUANTIZE,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS
+    )
@@ -0,0 +1,54 @@
+"""Wire format shared by the embedding worker and its clients.
+
+Every message is a frame made of a 4-byte big-endian header length, a JSON
+header and an optional binary payload whose size is given by the header's
+``payload_size``. Requests carry the texts in the header; successful
+responses carry the embeddings as a little-endian float32 matrix, which
+both ends hand over as NumPy arrays without unpacking it into Python floats.
+"""
+import asyncio
+import json
+import struct
+from typing import Any, Dict, Tuple, Union
+
+import numpy as np
+
+
+HEADER_SIZE = struct.Struct(">I")
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    """Read one frame, raising IncompleteReadError when the peer hangs up"""
+    (header_size,) = HEADER_SIZE.unpack(await reader.readexactly(HEADER_SIZE.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload_size = header.get("payload_size", 0)
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+
+async def write_frame(
+    writer: asyncio.StreamWriter,
+    header: Dict[str, Any],
+    payload: Union[bytes, memoryview] = b""
+) -> None:
+    """Write one frame and wait until it is flushed"""
+    header = dict(header, payload_size=len(payload))
+    encoded = json.dumps(header).encode("utf-8")
+    writer.write(HEADER_SIZE.pack(len(encoded)) + encoded)
+    if payload:
+        writer.write(payload)
+    await writer.drain()
+
+
+def encode_vectors(vectors: np.ndarray) -> Tuple[Dict[str, Any], memoryview]:
+    """Pack embeddings into a response header and a view of their float32 buffer"""
+    matrix = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+    count, dim = matrix.shape if matrix.ndim == 2 else (0, 0)
+    return {"status": "ok", "count": count, "dim": dim}, memoryview(matrix.reshape(-1).view(np.uint8))
+
+
+def decode_vectors(header: Dict[str, Any], payload: bytes) -> np.ndarray:
+    """Wrap a float32 payload produced by encode_vectors as a (count, dim) matrix"""
+    matrix = np.frombuffer(payload, dtype=VECTOR_DTYPE)
+    return matrix.reshape(header["count"], header["dim"])
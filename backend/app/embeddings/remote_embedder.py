@@ -0,0 +1,116 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.embeddings.base_embedder import BaseEmbedder
+from app.embeddings.protocol import read_frame, write_frame, decode_vectors
+from app.utils.exceptions import EmbeddingError
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class RemoteEmbedder(BaseEmbedder):
+    """Async client for the shared embedding worker process"""
+
+    def __init__(self, socket_path: str, max_connections: int = 4, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._model_id: Optional[str] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Requests in flight, which close() waits for before closing the pool
+        self._in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closing = False
+
+    @property
+    def model_id(self) -> str:
+        if not self._model_id:
+            raise EmbeddingError("Embedding worker client is not initialized")
+        return self._model_id
+
+    async def initialize(self):
+        """Check that the worker is reachable and learn which model it serves"""
+        self._idle = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._closing = False
+        header, _ = await self._request({"op": "info"})
+        self._model_id = header["model_id"]
+        logger.info(f"Connected to embedding worker at {self.socket_path} (model: {self._model_id})")
+
+    async def close(self):
+        """Close pooled connections to the worker once requests in flight are done"""
+        if not self._idle:
+            return
+        self._closing = True
+        await self._drained.wait()
+        while not self._idle.empty():
+            _, writer = self._idle.get_nowait()
+            writer.close()
+        self._idle = None
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in the worker process"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        header, payload = await self._request({"op": "embed", "texts": texts})
+        return decode_vectors(header, payload)
+
+    async def _request(self, header: dict):
+        """Send one request over a pooled connection, reconnecting once if it went stale"""
+        if self._closing:
+            raise EmbeddingError("Embedding worker client is closed")
+        if not self._idle:
+            raise EmbeddingError("Embedding worker client is not initialized")
+
+        self._in_flight += 1
+        self._drained.clear()
+        try:
+            return await self._send(header)
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._drained.set()
+
+    async def _send(self, header: dict):
+        async with self._slots:
+            for attempt in range(2):
+                reader, writer = await self._acquire()
+                try:
+                    await write_frame(writer, header)
+                    response, payload = await asyncio.wait_for(read_frame(reader), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    if attempt:
+                        raise EmbeddingError(f"Embedding worker connection failed: {str(e)}") from e
+                    logger.warning(f"Embedding worker connection lost, reconnecting: {str(e)}")
+                    continue
+                except asyncio.TimeoutError as e:
+                    # The late reply would be read as the answer to the next request
+                    writer.close()
+                    raise EmbeddingError(f"Embedding worker did not answer within {self.timeout}s") from e
+                except BaseException:
+                    # A cancelled request leaves an unread reply on the socket
+                    writer.close()
+                    raise
+
+                self._idle.put_nowait((reader, writer))
+                if response.get("status") != "ok":
+                    raise EmbeddingError(f"Embedding worker error: {response.get('error')}")
+                return response, payload
+
+    async def _acquire(self) -> Connection:
+        """Reuse an idle connection or open a new one"""
+        if not self._idle.empty():
+            return self._idle.get_nowait()
+        try:
+            return await asyncio.open_unix_connection(self.socket_path)
+        except OSError as e:
+            raise EmbeddingError(f"Embedding worker unavailable at {self.socket_path}: {str(e)}") from e
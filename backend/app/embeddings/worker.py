@@ -0,0 +1,109 @@
+"""Standalone embedding worker shared by every API worker on the host.
+
+The model is loaded once here and served over a Unix socket, so API
+processes never run inference on their event loop. Start it with::
+
+    python -m app.embeddings.worker --socket /run/embeddings/embedder.sock
+"""
+import argparse
+import asyncio
+import os
+import signal
+
+from app.core.config import settings
+from app.embeddings.base_embedder import BaseEmbedder
+from app.embeddings.local_embedder import LocalEmbedder, create_embedding_model
+from app.embeddings.onnx_embedder import create_onnx_embedder
+from app.embeddings.protocol import read_frame, write_frame, encode_vectors
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+class EmbeddingWorker:
+    def __init__(self, embedder: BaseEmbedder, socket_path: str):
+        self.embedder = embedder
+        self.socket_path = socket_path
+        self._server = None
+        # One forward pass at a time: concurrent passes only fight over the same cores
+        self._model_lock = asyncio.Lock()
+
+    async def start(self):
+        """Load the model and start listening on the socket"""
+        await self.embedder.initialize()
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        logger.info(f"Embedding worker serving {self.embedder.model_id} on {self.socket_path}")
+
+    async def stop(self):
+        """Stop accepting connections and release the model"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        await self.embedder.close()
+        logger.info("Embedding worker stopped")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests from one client connection until it closes"""
+        try:
+            while True:
+                try:
+                    header, _ = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                response, payload = await self._dispatch(header)
+                await write_frame(writer, response, payload)
+        except ConnectionError as e:
+            logger.warning(f"Embedding client disconnected: {str(e)}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, header: dict):
+        """Run a single request and build its response frame"""
+        op = header.get("op")
+        try:
+            if op == "info":
+                return {"status": "ok", "model_id": self.embedder.model_id}, b""
+            if op == "embed":
+                async with self._model_lock:
+                    vectors = await self.embedder.embed_batch(header["texts"])
+                return encode_vectors(vectors)
+            return {"status": "error", "error": f"Unknown operation: {op}"}, b""
+        except Exception as e:
+            logger.error(f"Error handling embedding request: {str(e)}")
+            return {"status": "error", "error": str(e)}, b""
+
+
+def create_worker_embedder() -> BaseEmbedder:
+    """Create the in-process embedder selected by EMBEDDING_WORKER_BACKEND"""
+    if settings.EMBEDDING_WORKER_BACKEND == "onnx":
+        return create_onnx_embedder()
+    return LocalEmbedder(create_embedding_model())
+
+
+async def run_worker(socket_path: str):
+    worker = EmbeddingWorker(create_worker_embedder(), socket_path)
+    await worker.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await stop_event.wait()
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding worker")
+    parser.add_argument("--socket", default=settings.EMBEDDING_WORKER_SOCKET, help="Unix socket path to listen on")
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.socket))
@@ -9,4 +9,6 @@ def add_cors_middleware(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Paginated listings name their next page here
+        expose_headers=["X-Next-Cursor"],
     ) 
\ No newline at end of file
@@ -32,6 +32,12 @@ async def close(self):
             await self._redis.close()
             self._redis = None
 
+    async def get_client(self) -> Redis:
+        """Shared Redis client for services that need more than key/value access"""
+        if not self._redis:
+            await self.initialize()
+        return self._redis
+
     async def get(self, key: str) -> str:
         """Get value from Redis"""
         try:
@@ -0,0 +1,271 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.db_service import DatabaseService
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# Listing sort keys and the columns behind them
+SORT_COLUMNS = {
+    "created_at": "a.added_at",
+    "filename": "a.filename",
+    "size": "d.file_size",
+    "chunks": "d.chunk_count",
+}
+
+
+class DocumentCatalog:
+    """Indexed documents, the users who have them and whether they are searched.
+
+    Every user holding a document has it under their own filename and
+    switches it on and off for themselves. The vector index only holds the
+    chunks; queries are limited to the documents the catalog lists as
+    active for the user, so sharing a document or switching it off never
+    writes to the vector index.
+    """
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+
+    async def initialize(self):
+        """Check that the catalog tables of db/initdb.d/catalog.sql exist"""
+        try:
+            async with self.db_service.acquire() as conn:
+                missing = await conn.fetchval("SELECT to_regclass('catalog.document_access') IS NULL")
+            if missing:
+                raise RuntimeError(
+                    "The document catalog tables are missing; apply backend/db/initdb.d/catalog.sql "
+                    "to databases created before them"
+                )
+            logger.info("Document catalog initialized")
+        except Exception as e:
+            logger.error(f"Error initializing document catalog: {str(e)}")
+            raise
+
+    async def is_empty(self) -> bool:
+        async with self.db_service.acquire() as conn:
+            return not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM catalog.documents)")
+
+    async def get(self, doc_id: str) -> Optional[Dict]:
+        """A document with the users who have it, None if nobody does"""
+        documents = await self.documents([doc_id])
+        return documents.get(doc_id)
+
+    async def documents(self, doc_ids: Sequence[str]) -> Dict[str, Dict]:
+        """The cataloged documents among doc_ids, with the users who have them"""
+        async with self.db_service.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT d.doc_id, d.file_size, a.user_id, a.filename, a.active
+                FROM catalog.documents d
+                JOIN catalog.document_access a ON a.doc_id = d.doc_id
+                WHERE d.doc_id = ANY($1::varchar[])
+                ORDER BY a.added_at
+            """, list(doc_ids))
+        found: Dict[str, Dict] = {}
+        for row in rows:
+            document = found.setdefault(row["doc_id"], {
+                "doc_id": row["doc_id"],
+                "file_size": row["file_size"],
+                "users": []
+            })
+            document["users"].append(row["user_id"])
+        return found
+
+    async def iter_documents(self, batch_size: int = 500) -> AsyncIterator[Dict]:
+        """Every cataloged document with the users who have it, in doc_id order"""
+        after = ""
+        while True:
+            async with self.db_service.acquire() as conn:
+                doc_ids = [row["doc_id"] for row in await conn.fetch("""
+                    SELECT doc_id FROM catalog.documents WHERE doc_id > $1 ORDER BY doc_id LIMIT $2
+                """, after, batch_size)]
+            if not doc_ids:
+                return
+            documents = await self.documents(doc_ids)
+            for doc_id in doc_ids:
+                if doc_id in documents:
+                    yield documents[doc_id]
+            after = doc_ids[-1]
+
+    async def user_documents(self, user_id: str, active_only: bool = False) -> List[Dict]:
+        """The user's documents, oldest first"""
+        async with self.db_service.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT a.doc_id, a.filename, a.active, a.added_at, d.file_size, d.chunk_count
+                FROM catalog.document_access a
+                JOIN catalog.documents d ON d.doc_id = a.doc_id
+                WHERE a.user_id = $1 AND (a.active OR NOT $2)
+                ORDER BY a.added_at, a.doc_id
+            """, user_id, active_only)
+        return [self._listed(row) for row in rows]
+
+    async def page(
+        self,
+        user_id: str,
+        limit: Optional[int],
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        descending: bool = False,
+        active: Optional[bool] = None,
+        search: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """One page of the user's documents and the cursor of the next page, if any.
+
+        Pages continue after the last row of the previous one (keyset
+        pagination), so each page costs the same however far down it is.
+        The cursor is only valid for the same sort and order; filters may
+        change between pages. Without a limit every document is one page.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Can't sort documents by {sort}")
+        column = SORT_COLUMNS[sort]
+        conditions = ["a.user_id = $1"]
+        params: List[Any] = [user_id]
+        if active is not None:
+            params.append(active)
+            conditions.append(f"a.active = ${len(params)}")
+        if search:
+            params.append(search.lower())
+            conditions.append(f"strpos(lower(a.filename), ${len(params)}) > 0")
+        if cursor:
+            value, doc_id = self._decode_cursor(cursor, sort, descending)
+            params.extend([value, doc_id])
+            conditions.append(
+                f"({column}, a.doc_id) {'<' if descending else '>'} (${len(params) - 1}, ${len(params)})"
+            )
+        direction = "DESC" if descending else "ASC"
+        limit_clause = ""
+        if limit is not None:
+            params.append(limit + 1)
+            limit_clause = f"LIMIT ${len(params)}"
+
+        async with self.db_service.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT a.doc_id, a.filename, a.active, a.added_at, d.file_size, d.chunk_count
+                FROM catalog.document_access a
+                JOIN catalog.documents d ON d.doc_id = a.doc_id
+                WHERE {" AND ".join(conditions)}
+                ORDER BY {column} {direction}, a.doc_id {direction}
+                {limit_clause}
+            """, *params)
+
+        documents = [self._listed(row) for row in rows[:limit]]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            last = rows[limit - 1]
+            key = last[column.split(".")[1]]
+            next_cursor = self._encode_cursor(sort, descending, key, last["doc_id"])
+        return documents, next_cursor
+
+    async def find_by_filename(self, user_id: str, filename: str, exclude: str) -> Optional[Dict]:
+        """Another document the user has under filename, with the users who have it"""
+        async with self.db_service.acquire() as conn:
+            doc_id = await conn.fetchval("""
+                SELECT doc_id FROM catalog.document_access
+                WHERE user_id = $1 AND filename = $2 AND doc_id <> $3
+                ORDER BY added_at DESC
+                LIMIT 1
+            """, user_id, filename, exclude)
+        if doc_id is None:
+            return None
+        return await self.get(doc_id)
+
+    async def add(self, doc_id: str, user_id: str, filename: str, file_size: int, chunk_count: int = 0) -> None:
+        """Give the user a document, switched on, registering the document if it is new"""
+        async with self.db_service.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO catalog.documents (doc_id, file_size, chunk_count) VALUES ($1, $2, $3)
+                    ON CONFLICT (doc_id) DO NOTHING
+                """, doc_id, file_size, chunk_count)
+                await conn.execute("""
+                    INSERT INTO catalog.document_access (doc_id, user_id, filename) VALUES ($1, $2, $3)
+                    ON CONFLICT (doc_id, user_id) DO UPDATE SET filename = EXCLUDED.filename, active = TRUE
+                """, doc_id, user_id, filename)
+
+    async def remove(self, doc_id: str, user_id: str) -> int:
+        """Take a document away from the user; returns how many users still have it.
+
+        A document nobody has anymore is removed from the catalog.
+        """
+        async with self.db_service.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM catalog.document_access WHERE doc_id = $1 AND user_id = $2",
+                    doc_id, user_id
+                )
+                remaining = await conn.fetchval(
+                    "SELECT COUNT(*) FROM catalog.document_access WHERE doc_id = $1", doc_id
+                )
+                if not remaining:
+                    await conn.execute("DELETE FROM catalog.documents WHERE doc_id = $1", doc_id)
+                return remaining
+
+    async def set_active(self, doc_id: str, user_id: str, active: bool) -> bool:
+        """Switch the user's document on or off; False if the user doesn't have it"""
+        async with self.db_service.acquire() as conn:
+            status = await conn.execute(
+                "UPDATE catalog.document_access SET active = $3 WHERE doc_id = $1 AND user_id = $2",
+                doc_id, user_id, active
+            )
+        return status != "UPDATE 0"
+
+    async def import_documents(self, documents: Iterable[Dict]) -> int:
+        """Catalog documents found in the vector index; returns how many were imported.
+
+        Each document has doc_id, filename, file_size, chunk_count, users and
+        active. Entries already in the catalog are left as they are.
+        """
+        imported = 0
+        async with self.db_service.acquire() as conn:
+            for document in documents:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO catalog.documents (doc_id, file_size, chunk_count) VALUES ($1, $2, $3)
+                        ON CONFLICT (doc_id) DO NOTHING
+                    """, document["doc_id"], document["file_size"] or 0, document.get("chunk_count") or 0)
+                    await conn.executemany("""
+                        INSERT INTO catalog.document_access (doc_id, user_id, filename, active)
+                        VALUES ($1, $2, $3, $4)
+                        ON CONFLICT (doc_id, user_id) DO NOTHING
+                    """, [
+                        (document["doc_id"], user, document["filename"] or "unknown", document["active"])
+                        for user in document["users"]
+                    ])
+                imported += 1
+        return imported
+
+    @staticmethod
+    def _listed(row) -> Dict:
+        return {
+            "id": row["doc_id"],
+            "filename": row["filename"],
+            "size": row["file_size"],
+            "chunks": row["chunk_count"],
+            "active": row["active"],
+            "created_at": row["added_at"]
+        }
+
+    @staticmethod
+    def _encode_cursor(sort: str, descending: bool, key: Any, doc_id: str) -> str:
+        if isinstance(key, datetime):
+            key = key.isoformat()
+        payload = json.dumps([sort, descending, key, doc_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, str]:
+        try:
+            payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            cursor_sort, cursor_descending, key, doc_id = json.loads(payload)
+            if sort == "created_at":
+                key = datetime.fromisoformat(key)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+        if (cursor_sort, cursor_descending) != (sort, descending):
+            raise ValueError("Cursor belongs to a different sort order")
+        return key, doc_id
@@ -16,7 +16,9 @@
 class DatabaseService:
     DANGEROUS_KEYWORDS = {
         'alter', 'drop', 'delete', 'truncate', 'update', 'insert', 
-        'grant', 'revoke', 'create', 'exec', 'execute'
+        'grant', 'revoke', 'create', 'exec', 'execute',
+        # Could switch back from the query role
+        'set_config'
     }
 
     def __init__(self):
@@ -58,6 +60,10 @@ async def close(self):
             await self._pool.close()
             logger.info("Database connection pool closed")
 
+    def acquire(self):
+        """Borrow a pooled connection: async with db_service.acquire() as conn"""
+        return self._pool.acquire()
+
     async def get_session(self):
         """Get a database session."""
         logger.info("Getting database session")
@@ -127,6 +133,9 @@ async def execute_query(self, query: str) -> Any:
 
         try:
             async with self.engine.connect() as conn:
+                # Generated queries only see the public schema, not the document catalog;
+                # the role lasts until the transaction is rolled back on leaving
+                await conn.execute(text(f'SET LOCAL ROLE "{settings.POSTGRES_QUERY_ROLE}"'))
                 result = await conn.execute(text(query))
                 return result.fetchall()
         except Exception as e:
@@ -1,6 +1,14 @@
+import asyncio
 import backoff
+import functools
 import hashlib
-from typing import List, Dict, Any, Optional
+import os
+import re
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Awaitable, Callable, Iterator, List, Dict, Any, Optional, Sequence, Set, Tuple
 from llama_index.core import (
     VectorStoreIndex,
     Document,
@@ -8,43 +16,113 @@
     StorageContext
 )
 from llama_index.core.node_parser import SimpleNodeParser
-from llama_index.core.schema import TextNode
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.vector_stores import VectorStoreQuery, MetadataFilters, MetadataFilter, ExactMatchFilter
-from llama_index.core.vector_stores.types import VectorStoreQueryMode
+from llama_index.core.schema import NodeRelationship, TextNode
+from weaviate.util import generate_uuid5
 
-from app.utils.weaviate_client import create_vector_store
+from app.core.config import settings
+from app.embeddings import BaseEmbedder, LocalEmbedder, RemoteEmbedder, EmbeddingBatcher, EmbeddingCache
+from app.embeddings.local_embedder import create_embedding_model
+from app.embeddings.onnx_embedder import create_onnx_embedder
+from app.utils.exceptions import EmbeddingError
+
+from app.services.cache_service import CacheService
+from app.services.catalog_service import DocumentCatalog
+from app.vectorstores import BaseChunkStore, BaseSearcher, LocalSearcher, WeaviateChunkStore, WeaviateSearcher
+from app.vectorstores.local_store import create_local_store
+from app.utils.weaviate_client import create_async_client, create_vector_store
 from app.utils.logger import setup_logger
-from app.utils.document_utils import extract_text_from_pdf, extract_text_from_docx
+from app.utils.async_utils import iterate_in_thread
+from app.utils.locks import LocalLocks, RedisLock
+from app.utils.minhash import MinHasher
+from app.utils.document_utils import FileContent, iter_document_segments, shutdown_extraction_pool
 
 
 logger = setup_logger(__name__)
 
-@backoff.on_exception(
-    backoff.expo,
-    Exception,
-    max_tries=3,
-    max_time=30
-)
-def create_embedding_model():
-    logger.info("Creating embedding model...")
-    model = HuggingFaceEmbedding(
-        model_name="BAAI/bge-small-en",
-        cache_folder="/app/storage/models/embeddings"
-    )
-    logger.info("Embedding model created successfully")
-    return model
+# Called with a stage name and the fraction of that stage completed
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+def create_embedder() -> BaseEmbedder:
+    """Create the embedder selected by EMBEDDING_BACKEND"""
+    if settings.EMBEDDING_BACKEND == "worker":
+        logger.info(f"Using shared embedding worker at {settings.EMBEDDING_WORKER_SOCKET}")
+        return RemoteEmbedder(
+            settings.EMBEDDING_WORKER_SOCKET,
+            max_connections=settings.EMBEDDING_WORKER_CONNECTIONS,
+            timeout=settings.EMBEDDING_WORKER_TIMEOUT
+        )
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return create_onnx_embedder()
+    return LocalEmbedder(create_embedding_model())
+
+
+# Kept consistent by ingestion itself; text and vectors only change by re-indexing.
+# llama_index reads the document references and _node_content back
+PROTECTED_METADATA = frozenset({
+    "text", "doc_id", "search_id", "doc_ids", "chunk_id", "total_chunks", "chunk_hash", "minhash", "lsh_bands",
+    "ref_doc_id", "document_id", "_node_content", "filename", "file_size"
+})
+
+
+def chunk_uuid(doc_id: str, chunk_id: int) -> str:
+    """Stable id of a document's chunk_id-th chunk"""
+    return generate_uuid5(f"{doc_id}:{chunk_id}")
+
+
+_TENANT_SAFE = re.compile(r"[A-Za-z0-9_-]{1,58}")
+
+
+def tenant_name(user_id: str) -> Optional[str]:
+    """Weaviate tenant holding the user's chunks, None without multi-tenancy"""
+    if settings.VECTOR_STORE_BACKEND != "weaviate" or not settings.WEAVIATE_MULTI_TENANCY:
+        return None
+    if settings.WEAVIATE_TENANT_GROUPS:
+        group = int(hashlib.sha256(user_id.encode()).hexdigest(), 16) % settings.WEAVIATE_TENANT_GROUPS
+        return f"group-{group}"
+    if _TENANT_SAFE.fullmatch(user_id):
+        return f"user-{user_id}"
+    return f"user-{hashlib.sha256(user_id.encode()).hexdigest()[:58]}"
 
 
 class LlamaIndexService:
-    def __init__(self):
+    def __init__(self, catalog: DocumentCatalog, cache_service: Optional[CacheService] = None):
         logger.info("Initializing LlamaIndexService...")
+        # Who has which document, and whether they search it
+        self.catalog = catalog
+        # Without Redis, ingestion locks only cover this process
+        self.cache_service = cache_service
+        self.redis = None
+        self.local_locks = LocalLocks()
+        self.weaviate_executor = ThreadPoolExecutor(
+            max_workers=settings.WEAVIATE_WORKERS, thread_name_prefix="weaviate"
+        )
         self.vector_store = None
+        self.searcher: Optional[BaseSearcher] = None
+        self.chunk_store: Optional[BaseChunkStore] = None
+        self.tenant_root = None
+        self.tenant_stores: Dict[str, BaseChunkStore] = {}
         self.index = None
-        logger.info("Creating embedding model instance...")
-        self.embed_model = create_embedding_model()
-        logger.debug(f"Embedding model created: {self.embed_model}")
+        logger.info("Creating embedder...")
+        self.embedder = create_embedder()
+        # Only an in-process embedder has a llama_index model; with the shared
+        # worker llama_index never embeds anything in this process
+        self.embed_model = self.embedder.embed_model if isinstance(self.embedder, LocalEmbedder) else None
+        logger.debug(f"Embedder created: {self.embedder}")
+        self.embedding_cache = None
+        self.query_batcher = EmbeddingBatcher(
+            self.embedder,
+            max_batch_size=settings.QUERY_EMBED_MAX_BATCH,
+            max_wait_ms=settings.QUERY_EMBED_MAX_WAIT_MS
+        )
+        # Chunk batches of documents indexed at the same time share forward passes
+        self.ingest_batcher = EmbeddingBatcher(
+            self.embedder,
+            max_batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+            max_wait_ms=settings.INGEST_EMBED_MAX_WAIT_MS
+        )
         
+        self.minhasher = MinHasher(settings.MINHASH_PERMUTATIONS, settings.MINHASH_BANDS)
+
         self.node_parser = SimpleNodeParser.from_defaults(
             chunk_size=512,
             chunk_overlap=50
@@ -54,96 +132,463 @@ def __init__(self):
         logger.info("LlamaIndexService initialization complete")
 
     async def initialize(self):
-        # Get pre-configured vector store
+        await self._initialize_embedder()
+        self.embedding_cache = self._open_embedding_cache()
+        if self.cache_service:
+            self.redis = await self.cache_service.get_client()
+
+        if settings.VECTOR_STORE_BACKEND == "local":
+            # In process: no Weaviate to run, and no network hop per search
+            self.chunk_store = create_local_store()
+            self.searcher = LocalSearcher(self.chunk_store)
+            logger.info(f"Using local vector store at {settings.LOCAL_VECTOR_STORE_PATH}")
+        else:
+            await self._initialize_weaviate()
+
+        if await self.catalog.is_empty():
+            await self._import_legacy_documents()
+
+    async def _initialize_weaviate(self):
+        # Get pre-configured vector store; ingestion writes through its sync
+        # client on the Weaviate threads, searches go through the async one
         self.vector_store = await create_vector_store()
-        
+        self.chunk_store = WeaviateChunkStore(
+            self.vector_store.client,
+            index_name=self.vector_store.index_name,
+            text_key="text"
+        )
+        # With multi-tenancy every user's chunks live in a tenant of their
+        # own (or of their group), searched without crossing other users'
+        self.tenant_root = None
+        search_index = self.vector_store.index_name
+        if settings.WEAVIATE_MULTI_TENANCY:
+            search_index = settings.WEAVIATE_TENANT_COLLECTION
+            self.tenant_root = WeaviateChunkStore(self.vector_store.client, index_name=search_index, text_key="text")
+        self.searcher = WeaviateSearcher(await create_async_client(), index_name=search_index, text_key="text")
+
         # Create storage context and index
         storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
         self.index = VectorStoreIndex([], storage_context=storage_context)
 
+    async def _import_legacy_documents(self) -> None:
+        """Catalog documents indexed while users and status lived on the chunks"""
+        try:
+            documents = await self._in_store(lambda: list(self.chunk_store.legacy_documents()))
+            if documents:
+                imported = await self.catalog.import_documents(documents)
+                logger.info(f"Imported {imported} documents from the vector store into the catalog")
+        except Exception as e:
+            logger.error(f"Error importing documents into the catalog: {str(e)}")
+            raise
+
+    @backoff.on_exception(
+        backoff.expo,
+        EmbeddingError,
+        max_time=120
+    )
+    async def _initialize_embedder(self):
+        # The shared embedding worker may still be loading its model
+        await self.embedder.initialize()
+
     async def close(self):
-        """Close vector store"""
-        if self.vector_store.client:
+        """Close embedder and vector store"""
+        await self.query_batcher.close()
+        await self.ingest_batcher.close()
+        await self.embedder.close()
+        shutdown_extraction_pool()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+        if self.vector_store is not None and self.vector_store.client:
             self.vector_store.client.close()
+        await self.searcher.close()
+        self.weaviate_executor.shutdown(wait=False)
+
+    async def _update_chunks(
+        self, chunk_store: BaseChunkStore, updates: Dict[str, Dict[str, Any]], ref_doc_id: Optional[str] = None
+    ) -> None:
+        """Update chunks in slices spread over the store threads; stores send one request per chunk"""
+        ids = list(updates)
+        slices = [ids[start::settings.WEAVIATE_WORKERS] for start in range(settings.WEAVIATE_WORKERS)]
+        await asyncio.gather(*(
+            self._in_store(chunk_store.update_chunks, {uuid: updates[uuid] for uuid in part}, ref_doc_id)
+            for part in slices if part
+        ))
+
+    def _in_store(self, call: Callable[..., Any], *args):
+        """Run a blocking chunk store call on the Weaviate threads"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.weaviate_executor, functools.partial(call, *args))
+
+    async def _store_for(self, user_id: str) -> BaseChunkStore:
+        """Chunk store holding the user's documents"""
+        tenant = tenant_name(user_id)
+        if tenant is None:
+            return self.chunk_store
+        if tenant not in self.tenant_stores:
+            self.tenant_stores[tenant] = await self._in_store(self.tenant_root.for_tenant, tenant)
+        return self.tenant_stores[tenant]
+
+    def document_id(self, content: FileContent) -> str:
+        """ID the document will be indexed under: a hash of its content"""
+        return self._generate_doc_id(content)
+
+    async def existing_documents(self, doc_ids: List[str]) -> Dict[str, Dict]:
+        """Users of those of doc_ids that are already indexed"""
+        try:
+            return await self.catalog.documents(doc_ids)
+        except Exception as e:
+            logger.error(f"Error looking up documents: {str(e)}")
+            raise
 
-    async def index_document(self, content: bytes, filename: str, user_id: str):
-        """Index document with chunking and user tracking"""
+    async def index_document(
+        self,
+        content: FileContent,
+        filename: str,
+        user_id: str,
+        progress: Optional[ProgressCallback] = None
+    ):
+        """Index document with chunking and user tracking, reusing unchanged chunks of an earlier version"""
         try:
             # Generate document ID
-            file_size = len(content)
-            doc_id = self._generate_doc_id(filename, file_size)
-            
-            # Check if document exists
-            existing_doc = await self._get_document_by_id(doc_id)
-            if existing_doc:
-                # Just add user to the users list if document exists
-                await self._add_user_to_document(doc_id, user_id)
-                return doc_id
-            
-            # Extract text from content
-            text = self._extract_text(content, filename)
-            
-            # Create document and split into chunks
-            doc = Document(text=text)
-            nodes = self.node_parser.get_nodes_from_documents([doc])
-            
-            # Add metadata to each chunk
-            total_chunks = len(nodes)
-            for i, node in enumerate(nodes):
-                node.metadata.update({
-                    "doc_id": doc_id,
-                    "search_id": doc_id,
-                    "filename": filename,
-                    "chunk_id": i,
-                    "total_chunks": total_chunks,
-                    "file_size": file_size,
-                    "users": [user_id],
-                    "active": "true"
-                })
-            
-            # Index all chunks
-            await self._add_nodes(nodes)
-            return doc_id
-            
+            file_size = self._content_size(content)
+            doc_id = await asyncio.to_thread(self._generate_doc_id, content)
+            async with self._document_lock(doc_id):
+                return await self._index_locked(content, filename, doc_id, file_size, user_id, progress)
         except Exception as e:
             logger.error(f"Error indexing document: {str(e)}")
             raise
 
-    async def query(self, question: str, user_id: str, max_results: int = 5, hybrid: bool = False) -> List[Dict]:
-        """Query documents with user filter"""
+    async def _index_locked(
+        self,
+        content: FileContent,
+        filename: str,
+        doc_id: str,
+        file_size: int,
+        user_id: str,
+        progress: Optional[ProgressCallback]
+    ) -> str:
+        previous = await self._find_previous_version(filename, user_id, doc_id)
+        chunk_store = await self._store_for(user_id)
+
+        # Check if document exists
+        existing_doc = await self._get_document_by_id(doc_id)
+        if existing_doc:
+            # Just give the user the document if it is indexed already
+            await self._share_into_tenant(doc_id, existing_doc.get("users", []), user_id, chunk_store)
+            await self.catalog.add(doc_id, user_id, filename, file_size)
+            if previous:
+                await self.delete_document(previous["doc_id"], user_id)
+            return doc_id
+
+        reusable = None
+        if previous and previous["users"] == [user_id]:
+            reusable = await self._in_store(chunk_store.chunk_hashes, previous["doc_id"])
+            logger.info(f"Re-indexing {filename} incrementally over {previous['doc_id']}")
+
+        visible = []
+        if settings.CHUNK_DEDUP_ENABLED:
+            visible = [document["id"] for document in await self.catalog.user_documents(user_id)]
+
+        await self._report(progress, "extracting", 0.0)
+        metadata = {
+            "doc_id": doc_id,
+            "search_id": doc_id,
+            "doc_ids": [doc_id],
+            "filename": filename,
+            "file_size": file_size
+        }
+        chunk_count = await self._index_stream(
+            content, filename, doc_id, metadata, progress, reusable, visible, chunk_store
+        )
+        # Searchable from here on
+        await self.catalog.add(doc_id, user_id, filename, file_size, chunk_count)
+        if previous and reusable is None:
+            # Others still use the earlier version; only this user moves on
+            await self.delete_document(previous["doc_id"], user_id)
+        elif previous:
+            # Its chunks shared with other documents were left out of reuse
+            async with self._owners_lock(chunk_store):
+                await self._in_store(chunk_store.detach_document, previous["doc_id"])
+            await self.catalog.remove(previous["doc_id"], user_id)
+        return doc_id
+
+    async def _share_into_tenant(
+        self, doc_id: str, holders: Sequence[str], user_id: str, chunk_store: BaseChunkStore
+    ) -> None:
+        """Copy an indexed document into the user's tenant unless it is there already"""
+        tenant = tenant_name(user_id)
+        if tenant is None or not holders or tenant in {tenant_name(holder) for holder in holders}:
+            return
+        source = await self._store_for(holders[0])
+        async with self._owners_lock(chunk_store):
+            copied = await self._in_store(source.copy_document, doc_id, chunk_store)
+        logger.info(f"Copied {copied} chunks of {doc_id} from tenant {source.tenant} to {tenant}")
+
+    def _document_lock(self, doc_id: str):
+        """Lock held while a document is being indexed"""
+        return self._lock(f"ingest:lock:{doc_id}")
+
+    def _owners_lock(self, chunk_store: BaseChunkStore):
+        """Lock held while changing which documents use the stored chunks of a store"""
+        return self._lock(f"ingest:owners:{chunk_store.tenant or ''}")
+
+    def _lock(self, name: str):
+        if self.redis is None:
+            return self.local_locks.lock(name)
+        return RedisLock(
+            self.redis,
+            name,
+            lease=settings.INGEST_LOCK_LEASE,
+            timeout=settings.INGEST_LOCK_TIMEOUT
+        )
+
+    async def _index_stream(
+        self,
+        content: FileContent,
+        filename: str,
+        doc_id: str,
+        metadata: Dict[str, Any],
+        progress: Optional[ProgressCallback] = None,
+        reusable: Optional[Dict[str, List[str]]] = None,
+        visible: Sequence[str] = (),
+        chunk_store: Optional[BaseChunkStore] = None
+    ) -> int:
+        """Extract, chunk, embed and store a document batch by batch; returns the chunk count"""
+        chunk_store = chunk_store or self.chunk_store
+        start_time = time.perf_counter()
+        stored_ids: List[str] = []
+        batches: asyncio.Queue = asyncio.Queue(settings.INGEST_PIPELINE_DEPTH)
+        # MinHash signatures of the chunks to store, and hashes of those seen so far
+        signatures: Dict[str, np.ndarray] = {}
+        seen: Set[str] = set()
+        # Stored chunks of other documents this one shares
+        shared: Set[str] = set()
+
+        async def store():
+            while True:
+                item = await batches.get()
+                if item is None:
+                    return
+                nodes, embeddings, properties, fraction = item
+                first = not stored_ids
+                stored_ids.extend(
+                    await self._in_store(chunk_store.add, nodes, embeddings, properties)
+                )
+                if first:
+                    logger.info(
+                        f"First chunks of {filename} searchable after "
+                        f"{time.perf_counter() - start_time:.2f}s"
+                    )
+                await self._report(progress, "indexing", fraction)
+
+        async def hand_over(item):
+            # Fail fast if the writer died instead of blocking on a full queue
+            put = asyncio.ensure_future(batches.put(item))
+            try:
+                await asyncio.wait({put, writer}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not put.done():
+                    put.cancel()
+            if put.cancelled():
+                writer.result()
+
+        async def flush(nodes: List[TextNode], fraction: float) -> int:
+            properties = None
+            if settings.CHUNK_DEDUP_ENABLED:
+                matches = await self._find_shared_chunks(nodes, signatures, doc_id, visible, chunk_store)
+                shared.update(matches.values())
+                nodes = [node for node in nodes if node.node_id not in matches]
+                properties = [
+                    {
+                        "minhash": signatures[node.node_id].tolist(),
+                        "lsh_bands": self.minhasher.band_keys(signatures[node.node_id])
+                    }
+                    for node in nodes
+                ]
+            if nodes:
+                embeddings = await self._embed_texts([node.text for node in nodes])
+                await hand_over((nodes, embeddings, properties, fraction))
+            return len(nodes)
+
+        writer = asyncio.create_task(store())
         try:
-            query_embedding = self.embed_model.get_text_embedding(question)
-            
-            # Add filters for active documents and user access
-            filters = MetadataFilters(filters=[
-                ExactMatchFilter(key="active", value="true"),
-                MetadataFilter(key="users", value=[user_id], operator="any"),
-            ])
-            
-            # Query vector store
-            query_result = self.vector_store.query(
-                VectorStoreQuery(
-                    query_embedding=query_embedding,
-                    similarity_top_k=max_results,
-                    mode=VectorStoreQueryMode.HYBRID if hybrid else VectorStoreQueryMode.DEFAULT,
-                    alpha=0.5 if hybrid else None,
-                    filters=filters
+            pending: List[TextNode] = []
+            reused: Dict[str, int] = {}
+            repeated = 0
+            fraction = 0.0
+            chunk_id = 0
+            chunks = iterate_in_thread(
+                lambda: self._iter_chunks(content, filename, doc_id),
+                maxsize=settings.INGEST_PIPELINE_DEPTH
+            )
+            async with aclosing(chunks):
+                async for nodes, node_signatures, fraction in chunks:
+                    for node, signature in zip(nodes, node_signatures):
+                        chunk_hash = hashlib.sha256(node.text.encode()).hexdigest()
+                        node.metadata.update(
+                            metadata, chunk_id=chunk_id, total_chunks=0, chunk_hash=chunk_hash
+                        )
+                        if reusable and reusable.get(chunk_hash):
+                            reused[reusable[chunk_hash].pop()] = chunk_id
+                        elif signature is not None and chunk_id > 0 and chunk_hash in seen:
+                            # The document already has this chunk
+                            repeated += 1
+                        else:
+                            pending.append(node)
+                            if signature is not None:
+                                signatures[node.node_id] = signature
+                                seen.add(chunk_hash)
+                        chunk_id += 1
+                    while len(pending) >= settings.EMBED_BATCH_SIZE:
+                        batch = pending[:settings.EMBED_BATCH_SIZE]
+                        pending = pending[settings.EMBED_BATCH_SIZE:]
+                        await flush(batch, fraction)
+
+            # The last batch already carries the final count
+            for node in pending:
+                node.metadata["total_chunks"] = chunk_id
+            if pending:
+                await flush(pending, 1.0)
+            await hand_over(None)
+            await writer
+
+            await self._report(progress, "finalizing", 0.0)
+            if shared:
+                async with self._owners_lock(chunk_store):
+                    await self._in_store(chunk_store.add_owner, list(shared), doc_id)
+            if reused:
+                await self._update_chunks(
+                    chunk_store,
+                    {
+                        uuid: {**metadata, "chunk_id": number, "total_chunks": chunk_id}
+                        for uuid, number in reused.items()
+                    },
+                    doc_id
                 )
+            logger.info(
+                f"Indexed {chunk_id} chunks of {filename} in {time.perf_counter() - start_time:.2f}s "
+                f"({len(stored_ids)} embedded, {len(reused)} carried over, "
+                f"{len(shared)} shared with other documents, {repeated} repeated)"
+            )
+        except BaseException:
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+            if stored_ids:
+                try:
+                    await self._in_store(chunk_store.delete, stored_ids)
+                except Exception as e:
+                    logger.error(f"Error rolling back partially indexed {filename}: {str(e)}")
+            raise
+
+        stale = [uuid for ids in (reusable or {}).values() for uuid in ids]
+        if stale:
+            await self._in_store(chunk_store.delete, stale)
+        return chunk_id
+
+    def _iter_chunks(
+        self, content: FileContent, filename: str, doc_id: str
+    ) -> Iterator[Tuple[List[TextNode], List[Optional[np.ndarray]], float]]:
+        """Chunk a document segment by segment, with MinHash signatures and the fraction consumed"""
+        segments = iter_document_segments(
+            content, filename, settings.INGEST_SEGMENT_CHARS, timeout=settings.EXTRACT_TIMEOUT
+        )
+        chunk_id = 0
+        for text, fraction in segments:
+            # The document id becomes each chunk's ref_doc_id, which
+            # llama_index stores as "doc_id"
+            document = Document(text=text, id_=doc_id)
+            nodes = self.node_parser.get_nodes_from_documents([document])
+            ids = {}
+            for node in nodes:
+                ids[node.node_id] = chunk_uuid(doc_id, chunk_id)
+                node.id_ = ids[node.node_id]
+                chunk_id += 1
+            for node in nodes:
+                for relationship in (NodeRelationship.PREVIOUS, NodeRelationship.NEXT):
+                    related = node.relationships.get(relationship)
+                    if related is not None and related.node_id in ids:
+                        related.node_id = ids[related.node_id]
+            if settings.CHUNK_DEDUP_ENABLED:
+                signatures = [self.minhasher.signature(node.text) for node in nodes]
+            else:
+                signatures = [None] * len(nodes)
+            yield nodes, signatures, fraction
+
+    async def _find_shared_chunks(
+        self,
+        nodes: List[TextNode],
+        signatures: Dict[str, np.ndarray],
+        doc_id: str,
+        visible: Sequence[str],
+        chunk_store: BaseChunkStore
+    ) -> Dict[str, str]:
+        """Map node ids to stored chunks of the visible documents with the same text"""
+        candidates = [node for node in nodes if node.metadata["chunk_id"] > 0]
+        if not candidates or not visible:
+            return {}
+        band_keys = [
+            key for node in candidates for key in self.minhasher.band_keys(signatures[node.node_id])
+        ]
+        stored = await self._in_store(chunk_store.lsh_candidates, band_keys, visible)
+        by_hash = {}
+        for uuid, chunk in stored.items():
+            # A retry finds chunks stored by the failed attempt; those are overwritten
+            if chunk["search_id"] != doc_id and chunk.get("chunk_hash"):
+                by_hash.setdefault(chunk["chunk_hash"], uuid)
+        return {
+            node.node_id: by_hash[node.metadata["chunk_hash"]]
+            for node in candidates
+            if node.metadata["chunk_hash"] in by_hash
+        }
+
+    async def embed_query(self, question: str) -> np.ndarray:
+        """Embed a single question as part of the next micro-batch"""
+        return await self.query_batcher.embed(question)
+
+    async def query(
+        self,
+        question: str,
+        user_id: str,
+        max_results: int = 5,
+        hybrid: bool = False,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """Query documents with user filter, embedding the question unless its embedding is given"""
+        try:
+            # Only the user's active documents are searched
+            documents = {
+                document["id"]: document
+                for document in await self.catalog.user_documents(user_id, active_only=True)
+            }
+            if not documents:
+                return []
+            if query_embedding is None:
+                query_embedding = await self.embed_query(question)
+
+            hits = await self.searcher.search(
+                query_embedding,
+                list(documents),
+                max_results,
+                query=question if hybrid else None,
+                alpha=0.5 if hybrid else 1.0,
+                tenant=tenant_name(user_id)
             )
             
             # Process results
             results = []
             seen_docs = set()
-            for node, score in zip(query_result.nodes, query_result.similarities):
-                doc_id = node.metadata.get("doc_id")
-                if doc_id not in seen_docs:
+            for hit in hits:
+                # A shared chunk is attributed to one of its documents the user has
+                doc_id = next((owner for owner in hit.owners if owner in documents), None)
+                if doc_id is not None and doc_id not in seen_docs:
                     seen_docs.add(doc_id)
                     results.append({
-                        "text": node.text,
-                        "filename": node.metadata.get("filename", "unknown"),
-                        "similarity_score": score,
-                        "chunk_id": node.metadata.get("chunk_id"),
-                        "total_chunks": node.metadata.get("total_chunks")
+                        "text": hit.text,
+                        "filename": documents[doc_id]["filename"],
+                        "similarity_score": hit.score,
+                        "chunk_id": hit.chunk_id,
+                        # Chunks only carry the count when stored in the last batch
+                        "total_chunks": documents[doc_id].get("chunks") or hit.total_chunks
                     })
             
             logger.info(f"Found {len(results)} relevant documents for query '{question}'")
@@ -155,100 +600,74 @@ async def query(self, question: str, user_id: str, max_results: int = 5, hybrid:
 
     async def delete_document(self, doc_id: str, user_id: str):
         """Remove document from user's list"""
-        doc = await self._get_document_by_id(doc_id)
-        if not doc:
-            return
-            
-        users = doc.get("users", [])
-        if user_id in users:
-            users.remove(user_id)
-            
-            if not users:
-                # No users left, delete document completely
-                self.vector_store.delete(
-                    filter=MetadataFilters(filters=[
-                        ExactMatchFilter(key="doc_id", value=doc_id)
-                    ])
-                )
-            else:
-                # Update users list
-                self.vector_store.update(
-                    filter=MetadataFilters(filters=[
-                        ExactMatchFilter(key="doc_id", value=doc_id)
-                    ]),
-                    update={
-                        "users": users
-                    }
-                )
+        async with self._document_lock(doc_id):
+            remaining = await self.catalog.remove(doc_id, user_id)
+            tenant = tenant_name(user_id)
+            if remaining and tenant is not None:
+                # Other tenants keep their own copies
+                holders = (await self.catalog.get(doc_id) or {}).get("users", [])
+                remaining = sum(tenant_name(holder) == tenant for holder in holders)
+            if remaining:
+                return
+            # No users left, delete document completely, except for chunks
+            # other documents still share
+            chunk_store = await self._store_for(user_id)
+            async with self._owners_lock(chunk_store):
+                await self._in_store(chunk_store.detach_document, doc_id)
+                await self.searcher.delete_document(doc_id, tenant=tenant)
 
     async def get_user_documents(self, user_id: str) -> List[Dict]:
         """Get list of user's documents"""
         try:
-        # Query using MetadataFilters directly
-            logger.debug(f"Querying documents for user {user_id} {type(user_id)}")
-            
-            # Add filters for active documents and user access
-            filters = MetadataFilters(filters=[
-                MetadataFilter(key="users", value=[user_id], operator="any"),
-            ])
-
-            query_result = self.vector_store.query(
-                VectorStoreQuery(
-                    query_embedding=None,  # No embedding needed for listing
-                    similarity_top_k=1000,  # Get all matching documents
-                    filters=filters
-                )
-            )
-            
-            # Process results
-            documents = []
-            seen_docs = set()
-         
-            for node in query_result.nodes:
-                doc_id = node.metadata.get("doc_id")
-                if doc_id and doc_id not in seen_docs:
-                    seen_docs.add(doc_id)
-                    documents.append({
-                        "id": doc_id,
-                        "filename": node.metadata.get("filename", "unknown"),
-                        "size": node.metadata.get("file_size", 0),
-                        "active": node.metadata.get("active", "true") == "true"
-                    })
-            
-            return documents
+            return await self.catalog.user_documents(user_id)
         except Exception as e:
             logger.error(f"Error fetching documents: {str(e)}")
             raise
 
-    async def update_document_status(self, doc_id: str, active: bool) -> None:
-        """Update the active status of a document"""
+    async def list_documents(
+        self,
+        user_id: str,
+        limit: Optional[int],
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        descending: bool = False,
+        active: Optional[bool] = None,
+        search: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """A page of the user's documents and the cursor of the next one; all of them without a limit"""
         try:
-            # Get all nodes for this document
-            filters=MetadataFilters(filters=[
-                        MetadataFilter(key="search_id", value=doc_id),
-                    ])
-            
-            query_result = self.vector_store.query(
-                VectorStoreQuery(
-                    query_embedding=None,
-                    similarity_top_k=1000,
-                    filters=filters
-                )
-            )
-            
-            # Update active status in metadata
-            for node in query_result.nodes:
-                node.metadata["active"] = "true" if active else "false"
-            
-            logger.debug(f"Updated nodes: {query_result.nodes}")
-            # Update nodes in vector store
-            if query_result.nodes:
-                # Delete old nodes and add updated ones
-                self.vector_store.delete(ref_doc_id=doc_id)
-                self.vector_store.add(
-                    nodes=query_result.nodes,
-                )
-            
+            return await self.catalog.page(user_id, limit, cursor, sort, descending, active, search)
+        except Exception as e:
+            logger.error(f"Error listing documents: {str(e)}")
+            raise
+
+    async def get_chunks(self, ids: Sequence[str], user_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Metadata of stored chunks by id, from the user's tenant under multi-tenancy"""
+        try:
+            chunk_store = await self._store_for(user_id) if user_id else self.chunk_store
+            return await self._in_store(chunk_store.get, list(ids))
+        except Exception as e:
+            logger.error(f"Error fetching chunks: {str(e)}")
+            raise
+
+    async def update_chunks(self, updates: Dict[str, Dict[str, Any]], user_id: Optional[str] = None) -> None:
+        """Change metadata of stored chunks in place, in the user's tenant under multi-tenancy"""
+        protected = set().union(*updates.values()) & PROTECTED_METADATA
+        if protected:
+            raise ValueError(f"Can't update {', '.join(sorted(protected))} of stored chunks")
+        try:
+            chunk_store = await self._store_for(user_id) if user_id else self.chunk_store
+            await self._update_chunks(chunk_store, updates)
+            logger.info(f"Updated metadata of {len(updates)} chunks")
+        except Exception as e:
+            logger.error(f"Error updating chunks: {str(e)}")
+            raise
+
+    async def update_document_status(self, doc_id: str, user_id: str, active: bool) -> None:
+        """Switch a document on or off in the user's searches"""
+        try:
+            if not await self.catalog.set_active(doc_id, user_id, active):
+                raise ValueError(f"Document {doc_id} not found")
             logger.info(f"Updated document status for {doc_id}")
         except Exception as e:
             logger.error(f"Error updating status: {str(e)}")
@@ -272,91 +691,119 @@ async def clear_user_documents(self, user_id: str) -> None:
     async def _get_document_by_id(self, doc_id: str) -> Optional[Dict]:
         """Get document by ID"""
         try:
-            # Query for document with specific doc_id
-            query_result = self.vector_store.query(
-                VectorStoreQuery(
-                    query_embedding=None,  # No embedding needed for exact match
-                    filters=MetadataFilters(filters=[
-                        ExactMatchFilter(key="search_id", value=doc_id)
-                    ]),
-                    similarity_top_k=1  # We only need one result
-                )
-            )
-            
-            if query_result.nodes:
-                node = query_result.nodes[0]
-                return {
-                    "doc_id": node.metadata.get("doc_id"),
-                    "filename": node.metadata.get("filename"),
-                    "file_size": node.metadata.get("file_size"),
-                    "users": node.metadata.get("users", [])
-                }
-            return None
-            
+            return await self.catalog.get(doc_id)
         except Exception as e:
             logger.error(f"Error getting document by ID: {str(e)}")
             raise
 
+    async def _find_previous_version(self, filename: str, user_id: str, doc_id: str) -> Optional[Dict]:
+        """The user's document with the same filename but different content, if any"""
+        try:
+            return await self.catalog.find_by_filename(user_id, filename, exclude=doc_id)
+        except Exception as e:
+            logger.error(f"Error looking up previous version of {filename}: {str(e)}")
+            raise
+
     async def _add_nodes(self, nodes: List[TextNode]) -> None:
-        """Add nodes to vector store"""
+        """Embed nodes in batches and add them to vector store"""
         try:
-            for node in nodes:
-                node.embedding = self.embed_model.get_text_embedding(node.text)
+            start_time = time.perf_counter()
+            embeddings = await self._embed_texts([node.text for node in nodes])
+            embed_time = time.perf_counter() - start_time
 
-            self.vector_store.add(nodes=nodes)
-            logger.info(f"Added {len(nodes)} nodes to vector store")
+            # Vectors go to the store as rows of the float32 matrix instead
+            # of being copied onto each node as a list of Python floats
+            await self._in_store(self.chunk_store.add, nodes, embeddings)
+            throughput = len(nodes) / embed_time if embed_time > 0 else float(len(nodes))
+            logger.info(
+                f"Added {len(nodes)} nodes to vector store "
+                f"(embedding took {embed_time:.2f}s, {throughput:.1f} chunks/sec)"
+            )
         except Exception as e:
             logger.error(f"Error adding nodes: {str(e)}")
             raise
 
-    async def _add_user_to_document(self, doc_id: str, user_id: str) -> None:
-        """Add user to document's users list"""
+    async def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in length-sorted batches into one float32 matrix, reusing cached embeddings"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        matrix: Optional[np.ndarray] = None
+
+        def fill(rows, vectors: np.ndarray):
+            nonlocal matrix
+            if matrix is None:
+                # The embedding width is only known once the first vectors arrive
+                matrix = np.empty((len(texts), vectors.shape[-1]), dtype=np.float32)
+            matrix[rows] = vectors
+
+        cached: Dict[int, np.ndarray] = {}
+        if self.embedding_cache:
+            cached = await asyncio.to_thread(self.embedding_cache.get_many, texts)
+            for i, vector in cached.items():
+                fill(i, vector)
+
+        # Identical chunk texts only need one forward pass
+        pending: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if i not in cached:
+                pending.setdefault(text, []).append(i)
+
+        # Character length is a cheap proxy for token length: grouping chunks
+        # of similar size keeps padding inside each batch to a minimum
+        unique_texts = sorted(pending, key=len)
+        batch_size = settings.EMBED_BATCH_SIZE
+        for start in range(0, len(unique_texts), batch_size):
+            batch = unique_texts[start:start + batch_size]
+            vectors = await self.ingest_batcher.embed_many(batch)
+            rows, sources = [], []
+            for j, text in enumerate(batch):
+                rows.extend(pending[text])
+                sources.extend([j] * len(pending[text]))
+            fill(rows, vectors[sources])
+            if self.embedding_cache:
+                await asyncio.to_thread(self.embedding_cache.put_many, batch, vectors)
+
+        logger.debug(
+            f"Embedded {len(unique_texts)} of {len(texts)} chunks ({len(cached)} cache hits)"
+        )
+        return matrix
+
+    async def _report(self, progress: Optional[ProgressCallback], stage: str, fraction: float) -> None:
+        """Report ingestion progress without letting a failing reporter abort indexing"""
+        if progress is None:
+            return
         try:
-            # Get current document nodes
-            query_result = self.vector_store.query(
-                VectorStoreQuery(
-                    query_embedding=None,
-                    filters=MetadataFilters(filters=[
-                        ExactMatchFilter(key="search_id", value=doc_id)
-                    ])
-                )
-            )
-            
-            if not query_result.nodes:
-                raise ValueError(f"Document {doc_id} not found")
-            
-            # Update users list in metadata
-            for node in query_result.nodes:
-                users = node.metadata.get("users", [])
-                if user_id not in users:
-                    users.append(user_id)
-                    node.metadata["users"] = users
-            
-            # Delete old nodes and add updated ones
-            self.vector_store.delete(
-                filter=MetadataFilters(filters=[
-                    ExactMatchFilter(key="search_id", value=doc_id)
-                ])
+            await progress(stage, fraction)
+        except Exception as e:
+            logger.warning(f"Error reporting progress for stage {stage}: {str(e)}")
+
+    def _open_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """Open the on-disk embedding cache, continuing without it if that fails"""
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return None
+        try:
+            return EmbeddingCache(
+                settings.EMBEDDING_CACHE_PATH,
+                self.embedder.model_id,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
             )
-            self.vector_store.add(nodes=query_result.nodes)
-            
-            logger.info(f"Added user {user_id} to document {doc_id}")
-            
         except Exception as e:
-            logger.error(f"Error adding user to document: {str(e)}")
-            raise
+            logger.warning(f"Embedding cache unavailable, continuing without it: {str(e)}")
+            return None
 
-    def _extract_text(self, content: bytes, filename: str) -> str:
-        """Extract text based on file type"""
-        if filename.lower().endswith('.pdf'):
-            return extract_text_from_pdf(content)
-        elif filename.lower().endswith('.docx'):
-            return extract_text_from_docx(content)
-        else:
-            return content.decode('utf-8')
+    def _content_size(self, content: FileContent) -> int:
+        """Size of the content without reading a file into memory"""
+        if isinstance(content, bytes):
+            return len(content)
+        size = content.seek(0, os.SEEK_END)
+        content.seek(0)
+        return size
         
-    def _generate_doc_id(self, filename: str, file_size: int) -> str:
-        """Generate unique document ID based on filename and size"""
-        unique_str = f"{filename}:{file_size}"
-        return hashlib.md5(unique_str.encode()).hexdigest()
-    
\ No newline at end of file
+    def _generate_doc_id(self, content: FileContent) -> str:
+        """Generate document ID from a hash of the content"""
+        if isinstance(content, bytes):
+            return hashlib.sha256(content).hexdigest()
+        content.seek(0)
+        doc_id = hashlib.file_digest(content, "sha256").hexdigest()
+        content.seek(0)
+        return doc_id
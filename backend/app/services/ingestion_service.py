@@ -0,0 +1,507 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.config import settings
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+QUEUE_KEY = "ingest:queue"
+JOB_KEY = "ingest:job:{}"
+# Jobs a worker has taken off the queue, kept until they are settled
+PROCESSING_KEY = "ingest:processing:{}"
+# Workers scored by the expiry of their lease on their processing list
+WORKERS_KEY = "ingest:workers"
+ACTIVE_KEY = "ingest:active"
+USER_ACTIVE_KEY = "ingest:active:user:{}"
+# Identity of the spool directory all workers share, in the directory and, while
+# workers run, in Redis
+SPOOL_ID_KEY = "ingest:spool"
+SPOOL_MARKER = ".spool-id"
+
+# Share of the overall progress taken by each stage of index_document
+STAGE_SPANS = {
+    "queued": (0.0, 0.0),
+    "extracting": (0.0, 0.0),
+    "indexing": (0.0, 0.95),
+    "finalizing": (0.95, 1.0),
+    "done": (1.0, 1.0),
+}
+
+# Takes a concurrency slot only if both the global and the user's limit allow it.
+# Slots are sorted set members scored by lease expiry, so the slots of a worker
+# that died mid-job free up on their own once the lease runs out.
+ACQUIRE_SLOT_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) or redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    return 0
+end
+local expires = now + tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], expires, ARGV[5])
+redis.call('ZADD', KEYS[2], expires, ARGV[5])
+redis.call('EXPIRE', KEYS[2], math.ceil(tonumber(ARGV[2])))
+return 1
+"""
+
+
+class IngestionService:
+    """Runs document ingestion in the background from a Redis-backed job queue.
+
+    Uploads are spooled to INGEST_SPOOL_DIR and queued as jobs; a pool of
+    worker tasks in every API process pulls them and runs
+    LlamaIndexService.index_document, recording stage-level progress on the
+    job. Global and per-user slot limits are shared through Redis by all
+    processes, so ingestion can't crowd out QA traffic.
+    """
+
+    def __init__(self, cache_service, index_service):
+        self.cache_service = cache_service
+        self.index_service = index_service
+        self._redis = None
+        # Names this process's workers apart from those of other processes
+        self._id = uuid.uuid4().hex
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._spool_id: Optional[str] = None
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    async def initialize(self):
+        self._redis = await self.cache_service.get_client()
+        self._stopping.clear()
+        os.makedirs(settings.INGEST_SPOOL_DIR, exist_ok=True)
+        await self._check_spool()
+        await self._renew_workers()
+        await self._recover()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ingest-worker-{i}")
+            for i in range(settings.INGEST_WORKERS)
+        ]
+        logger.info(f"Started {len(self._workers)} ingestion workers")
+
+    async def _check_spool(self):
+        """Fail unless INGEST_SPOOL_DIR is the directory the other workers spool to.
+
+        Any process sharing the Redis queue may run a job, so the payload
+        must be readable by all of them: the spool has to be one shared
+        volume. The directory is tagged with an id, which the running
+        processes keep in Redis under a lease; a process finding another
+        id there is looking at a directory of its own and refuses to start.
+        """
+        marker = os.path.join(settings.INGEST_SPOOL_DIR, SPOOL_MARKER)
+        self._spool_id = await asyncio.to_thread(self._tag_spool, marker)
+        if not await self._claim_spool():
+            logger.error(
+                f"Ingestion spool {settings.INGEST_SPOOL_DIR} differs from the one in use. If the spool "
+                f"volume was recreated, start again once the old id expires, {settings.INGEST_WORKER_LEASE}s "
+                f"after the last process using it stopped, or delete the Redis key {SPOOL_ID_KEY}"
+            )
+            raise RuntimeError(
+                f"INGEST_SPOOL_DIR {settings.INGEST_SPOOL_DIR} is not the spool the other ingestion "
+                f"workers use; mount the same shared volume there on every host"
+            )
+
+    async def _claim_spool(self) -> bool:
+        """Record or renew the spool id in Redis; False if another spool's id is there"""
+        lease = int(settings.INGEST_WORKER_LEASE * 1000)
+        if await self._redis.set(SPOOL_ID_KEY, self._spool_id, nx=True, px=lease):
+            return True
+        if await self._redis.get(SPOOL_ID_KEY) != self._spool_id:
+            return False
+        await self._redis.pexpire(SPOOL_ID_KEY, lease)
+        return True
+
+    def _tag_spool(self, marker: str) -> str:
+        """Id of the spool directory, tagging it first unless it is tagged already"""
+        if not os.path.exists(marker):
+            scratch = f"{marker}.{uuid.uuid4().hex}"
+            with open(scratch, "w") as f:
+                f.write(uuid.uuid4().hex)
+            try:
+                # Atomic: of processes starting together, one tag wins
+                os.link(scratch, marker)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(scratch)
+        with open(marker) as f:
+            return f.read().strip()
+
+    async def close(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        # Idle workers are left to finish their current poll rather than
+        # cancelled: a cancelled BLMOVE can still take a job on the server
+        # side, stranding it until the worker's lease runs out
+        self._stopping.set()
+        for task in self._running:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        await self._redis.zrem(WORKERS_KEY, *self._worker_names())
+
+    async def submit(self, file: BinaryIO, filename: str, user_id: str) -> Dict:
+        """Spool an upload to disk and queue it for ingestion"""
+        try:
+            job_id = uuid.uuid4().hex
+            doc_id = await asyncio.to_thread(self.index_service.document_id, file)
+            await asyncio.to_thread(self._spool, file, self._payload_path(job_id))
+
+            now = time.time()
+            job = {
+                "id": job_id,
+                "user_id": user_id,
+                "doc_id": doc_id,
+                "filename": filename,
+                "status": "queued",
+                "stage": "queued",
+                "progress": 0.0,
+                "error": "",
+                "created_at": now,
+                "updated_at": now,
+            }
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(JOB_KEY.format(job_id), mapping=job)
+                pipe.expire(JOB_KEY.format(job_id), settings.INGEST_JOB_TTL)
+                pipe.lpush(QUEUE_KEY, job_id)
+                await pipe.execute()
+            logger.info(f"Queued ingestion job {job_id} for {filename} (user {user_id})")
+            return self._format(job)
+        except Exception as e:
+            logger.error(f"Error queueing ingestion job: {str(e)}")
+            raise
+
+    async def submit_bulk(
+        self,
+        files: List[Tuple[BinaryIO, str]],
+        user_id: str,
+        rejected: Sequence[Tuple[str, str]] = ()
+    ) -> Dict:
+        """Queue several uploads as one job, with a status per file.
+
+        Files this user already has, or that repeat another file of the same
+        upload, are settled right away; whether the documents exist is looked
+        up for all files in one document catalog query.
+        """
+        try:
+            job_id = uuid.uuid4().hex
+            doc_ids = [
+                await asyncio.to_thread(self.index_service.document_id, file) for file, _ in files
+            ]
+            existing = await self.index_service.existing_documents(doc_ids)
+
+            entries = [
+                {"filename": filename, "doc_id": None, "status": "rejected", "error": reason}
+                for filename, reason in rejected
+            ]
+            seen = set()
+            payload_dir = self._payload_path(job_id)
+            for index, ((file, filename), doc_id) in enumerate(zip(files, doc_ids)):
+                entry = {"filename": filename, "doc_id": doc_id, "status": "queued", "error": None}
+                if doc_id in seen:
+                    entry["status"] = "duplicate"
+                elif user_id in existing.get(doc_id, {}).get("users", []):
+                    entry["status"] = "exists"
+                else:
+                    entry["payload"] = str(index)
+                    os.makedirs(payload_dir, exist_ok=True)
+                    await asyncio.to_thread(self._spool, file, os.path.join(payload_dir, entry["payload"]))
+                seen.add(doc_id)
+                entries.append(entry)
+
+            queued = any(entry["status"] == "queued" for entry in entries)
+            now = time.time()
+            job = {
+                "id": job_id,
+                "user_id": user_id,
+                "doc_id": "",
+                "filename": f"{len(entries)} files",
+                "status": "queued" if queued else "done",
+                "stage": "queued" if queued else "done",
+                "progress": 0.0 if queued else 1.0,
+                "error": "",
+                "files": json.dumps(entries),
+                "created_at": now,
+                "updated_at": now,
+            }
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(JOB_KEY.format(job_id), mapping=job)
+                pipe.expire(JOB_KEY.format(job_id), settings.INGEST_JOB_TTL)
+                if queued:
+                    pipe.lpush(QUEUE_KEY, job_id)
+                await pipe.execute()
+            logger.info(f"Queued bulk ingestion job {job_id} with {len(entries)} files (user {user_id})")
+            return self._format(job)
+        except Exception as e:
+            logger.error(f"Error queueing bulk ingestion job: {str(e)}")
+            raise
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[Dict]:
+        """Current state of a user's job, or None if it is unknown, expired or not theirs"""
+        job = await self._redis.hgetall(JOB_KEY.format(job_id))
+        if not job or job["user_id"] != user_id:
+            return None
+        return self._format(job)
+
+    async def _worker(self, number: int):
+        processing = PROCESSING_KEY.format(self._worker_names()[number])
+        while not self._stopping.is_set():
+            try:
+                # Moved rather than popped: if this process dies mid-job, the
+                # job is still on the worker's list for _recover to requeue
+                job_id = await self._redis.blmove(
+                    QUEUE_KEY, processing, settings.INGEST_POLL_INTERVAL, "RIGHT", "LEFT"
+                )
+                if not job_id:
+                    continue
+                if self._stopping.is_set():
+                    # Put it back at the head of the queue for the next process
+                    await self._redis.lmove(processing, QUEUE_KEY, "LEFT", "RIGHT")
+                    break
+                job = await self._redis.hgetall(JOB_KEY.format(job_id))
+                if not job:
+                    logger.warning(f"Dropping expired ingestion job {job_id}")
+                    self._discard_payload(job_id)
+                    await self._redis.lrem(processing, 0, job_id)
+                    continue
+                if not await self._acquire_slot(job_id, job["user_id"]):
+                    # Over a limit: move the job to the back of the queue and
+                    # let jobs of other users through meanwhile
+                    await self._redis.lmove(processing, QUEUE_KEY, "LEFT", "LEFT")
+                    await asyncio.sleep(settings.INGEST_POLL_INTERVAL)
+                    continue
+                # The job runs as its own task so close() can cancel it
+                # without interrupting the worker's bookkeeping
+                task = asyncio.create_task(self._run(job, processing))
+                self._running.add(task)
+                try:
+                    await asyncio.wait({task})
+                finally:
+                    self._running.discard(task)
+                    await self._release_slot(job_id, job["user_id"])
+                    await self._redis.lrem(processing, 0, job_id)
+            except Exception as e:
+                logger.error(f"Ingestion worker {number} error: {str(e)}")
+                await asyncio.sleep(settings.INGEST_POLL_INTERVAL)
+
+    def _worker_names(self) -> List[str]:
+        return [f"{self._id}:{number}" for number in range(settings.INGEST_WORKERS)]
+
+    async def _renew_workers(self):
+        expires = time.time() + settings.INGEST_WORKER_LEASE
+        await self._redis.zadd(WORKERS_KEY, {name: expires for name in self._worker_names()})
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.INGEST_WORKER_LEASE / 3)
+            try:
+                await self._renew_workers()
+                if not await self._claim_spool():
+                    logger.error(f"Ingestion spool id {SPOOL_ID_KEY} was taken by a spool other than this one")
+                await self._recover()
+            except Exception as e:
+                logger.error(f"Error renewing ingestion worker leases: {str(e)}")
+
+    async def _recover(self):
+        """Requeue the jobs of workers whose lease ran out, e.g. of a process that was killed"""
+        for worker in await self._redis.zrangebyscore(WORKERS_KEY, "-inf", time.time()):
+            processing = PROCESSING_KEY.format(worker)
+            while (job_id := await self._redis.lmove(processing, QUEUE_KEY, "RIGHT", "RIGHT")) is not None:
+                logger.warning(f"Requeueing ingestion job {job_id} of lost worker {worker}")
+                if await self._redis.exists(JOB_KEY.format(job_id)):
+                    await self._update(job_id, status="queued", stage="queued", progress=0.0)
+            await self._redis.zrem(WORKERS_KEY, worker)
+
+    async def _run(self, job: Dict, processing: str):
+        job_id = job["id"]
+        lease = asyncio.create_task(self._renew_slot(job_id, job["user_id"]))
+        requeued = False
+
+        async def progress(stage: str, fraction: float):
+            await self._update(job_id, stage=stage, progress=round(self._overall(stage, fraction), 3))
+
+        try:
+            logger.info(f"Running ingestion job {job_id} ({job['filename']})")
+            await self._update(job_id, status="running", stage="extracting", progress=0.0)
+            status = "done"
+            if job.get("files"):
+                status = await self._run_bulk(job)
+            else:
+                with open(self._payload_path(job_id), "rb") as file:
+                    await self.index_service.index_document(
+                        content=file,
+                        filename=job["filename"],
+                        user_id=job["user_id"],
+                        progress=progress
+                    )
+            await self._update(job_id, status=status, stage="done", progress=1.0)
+            logger.info(f"Ingestion job {job_id} {status}")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to whichever worker runs next
+            requeued = True
+            await self._requeue(job_id, processing)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            await self._update(job_id, status="failed", error=str(e))
+        finally:
+            lease.cancel()
+            if not requeued:
+                self._discard_payload(job_id)
+
+    async def _run_bulk(self, job: Dict) -> str:
+        """Index the queued files of a bulk job a few at a time.
+
+        Files in flight share embedding forward passes through the index
+        service's batcher. Files finished before a restart keep their status
+        and are not indexed again when the job is requeued.
+        """
+        job_id = job["id"]
+        entries = json.loads(job["files"])
+        pending = [entry for entry in entries if entry["status"] in ("queued", "running")]
+        fractions = {id(entry): 0.0 for entry in pending}
+        limit = asyncio.Semaphore(settings.BULK_INGEST_CONCURRENCY)
+
+        async def save(**fields):
+            overall = sum(fractions.values()) / len(fractions) if fractions else 1.0
+            await self._update(job_id, files=json.dumps(entries), progress=round(overall, 3), **fields)
+
+        async def index(entry: Dict):
+            async with limit:
+                async def progress(stage: str, fraction: float):
+                    fractions[id(entry)] = self._overall(stage, fraction)
+                    await save(stage="indexing")
+
+                entry["status"] = "running"
+                await save()
+                path = os.path.join(self._payload_path(job_id), entry["payload"])
+                try:
+                    with open(path, "rb") as file:
+                        await self.index_service.index_document(
+                            content=file,
+                            filename=entry["filename"],
+                            user_id=job["user_id"],
+                            progress=progress
+                        )
+                    entry["status"] = "done"
+                except Exception as e:
+                    logger.error(f"Bulk job {job_id}: {entry['filename']} failed: {str(e)}")
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                fractions[id(entry)] = 1.0
+                self._remove(path)
+                await save()
+
+        try:
+            await asyncio.gather(*(index(entry) for entry in pending))
+        except asyncio.CancelledError:
+            # Unfinished files run again when the job is picked up next
+            for entry in entries:
+                if entry["status"] == "running":
+                    entry["status"] = "queued"
+            await self._update(job_id, files=json.dumps(entries))
+            raise
+
+        failed = sum(entry["status"] == "failed" for entry in pending)
+        return "failed" if pending and failed == len(pending) else "done"
+
+    def _overall(self, stage: str, fraction: float) -> float:
+        """Overall progress of a document at a fraction of one of its stages"""
+        start, end = STAGE_SPANS.get(stage, (0.0, 0.0))
+        return start + (end - start) * fraction
+
+    async def _requeue(self, job_id: str, processing: str):
+        await self._update(job_id, status="queued", stage="queued", progress=0.0)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(processing, 0, job_id)
+            pipe.rpush(QUEUE_KEY, job_id)
+            await pipe.execute()
+
+    async def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(JOB_KEY.format(job_id), mapping=fields)
+            pipe.expire(JOB_KEY.format(job_id), settings.INGEST_JOB_TTL)
+            await pipe.execute()
+
+    async def _acquire_slot(self, job_id: str, user_id: str) -> bool:
+        acquired = await self._redis.eval(
+            ACQUIRE_SLOT_SCRIPT,
+            2,
+            ACTIVE_KEY,
+            USER_ACTIVE_KEY.format(user_id),
+            time.time(),
+            settings.INGEST_SLOT_LEASE,
+            settings.INGEST_MAX_CONCURRENT,
+            settings.INGEST_MAX_PER_USER,
+            job_id
+        )
+        return bool(acquired)
+
+    async def _renew_slot(self, job_id: str, user_id: str):
+        while True:
+            await asyncio.sleep(settings.INGEST_SLOT_LEASE / 3)
+            expires = time.time() + settings.INGEST_SLOT_LEASE
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.zadd(ACTIVE_KEY, {job_id: expires}, xx=True)
+                pipe.zadd(USER_ACTIVE_KEY.format(user_id), {job_id: expires}, xx=True)
+                await pipe.execute()
+
+    async def _release_slot(self, job_id: str, user_id: str):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(ACTIVE_KEY, job_id)
+            pipe.zrem(USER_ACTIVE_KEY.format(user_id), job_id)
+            await pipe.execute()
+
+    def _payload_path(self, job_id: str) -> str:
+        return os.path.join(settings.INGEST_SPOOL_DIR, job_id)
+
+    def _spool(self, file: BinaryIO, path: str):
+        file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file, out)
+
+    def _discard_payload(self, job_id: str):
+        path = self._payload_path(job_id)
+        if os.path.isdir(path):
+            # Bulk jobs keep one file per upload in a directory
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _format(self, job: Dict) -> Dict:
+        """Public view of a job record as stored in Redis"""
+        view = {
+            "id": job["id"],
+            "doc_id": job["doc_id"],
+            "filename": job["filename"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "progress": float(job["progress"]),
+            "error": job["error"] or None,
+            "created_at": float(job["created_at"]),
+            "updated_at": float(job["updated_at"]),
+        }
+        if job.get("files"):
+            view["files"] = [
+                {key: value for key, value in entry.items() if key != "payload"}
+                for entry in json.loads(job["files"])
+            ]
+        return view
@@ -1,9 +1,10 @@
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from app.utils.logger import setup_logger
 from app.db.sql_generator import SQLGenerator
 from app.models.user import User
+from app.services.query_context import QueryContext
 from app.utils.prompt_generator import PromptGenerator
 
 
@@ -51,38 +52,34 @@ async def get_answer(self, query: str, user: User) -> dict:
                 logger.info(f"Switched to {model_type} model")
             else:
                 logger.info(f"Using current model: {self.llm_service.current_provider}")
+
+            # Every stage below shares this context, so the question is
+            # embedded at most once however many stages need its embedding
+            ctx = QueryContext(query, str(user.id), self.index_service.embed_query)
             
             # 1. Handle URLs in question
             url_contents = []
             if user.handle_urls and self.url_service:
-                urls = await self.url_service.extract_urls(query)
-                if urls:
-                    logger.info(f"Found URLs in question: {urls}")
-                for url in urls:
-                    content = await self.url_service.fetch_url_content(url)
-                    if content:
-                        logger.info(f"Successfully fetched content from {url}")
-                        url_contents.append(content)
-                    else:
-                        logger.warning(f"Failed to fetch content from {url}")
+                url_contents = await self._get_url_contents(ctx)
             
             # 2. Check if question needs DB access
             db_data = None
             if user.check_db and self.llm_service:
-                needs_db = await self.llm_service.is_db_question(query)
+                needs_db = await self.llm_service.is_db_question(ctx.question)
                 logger.info(f"Question requires DB access: {needs_db}")
                 if needs_db:
-                    db_data = await self._get_db_data(query)
+                    db_data = await self._get_db_data(ctx)
                     if db_data:
                         logger.info(f"Retrieved DB data with query: {db_data.get('sql_query')}")
             
             # 3. Get document context if enabled
             context = ""
+            doc_data = None
             source_nodes = []
             if user.enable_document_search:
                 logger.info("Searching document context...")
                 try:
-                    doc_data = await self._get_document_data(query, str(user.id))
+                    doc_data = await self._get_document_data(ctx)
                     if doc_data:
                         source_nodes = doc_data['source_nodes']
                 except Exception as e:
@@ -145,7 +142,22 @@ async def get_answer(self, query: str, user: User) -> dict:
                 }
             }
 
-    async def _get_db_data(self, question: str) -> Optional[Dict[str, Any]]:
+    async def _get_url_contents(self, ctx: QueryContext) -> List[str]:
+        """Fetch the content of URLs mentioned in the question"""
+        url_contents = []
+        urls = await self.url_service.extract_urls(ctx.question)
+        if urls:
+            logger.info(f"Found URLs in question: {urls}")
+        for url in urls:
+            content = await self.url_service.fetch_url_content(url)
+            if content:
+                logger.info(f"Successfully fetched content from {url}")
+                url_contents.append(content)
+            else:
+                logger.warning(f"Failed to fetch content from {url}")
+        return url_contents
+
+    async def _get_db_data(self, ctx: QueryContext) -> Optional[Dict[str, Any]]:
         """Get data from database if question requires it"""
         try:
             from app.core.service_container import ServiceContainer  # Move import inside method
@@ -158,7 +170,7 @@ async def _get_db_data(self, question: str) -> Optional[Dict[str, Any]]:
                 llm_service=container.llm_service
             )
             
-            sql_query = await sql_generator.generate_query(question=question)
+            sql_query = await sql_generator.generate_query(question=ctx.question)
             logger.info(f"Generated SQL query: {sql_query}")
             db_service = container.db_service
             results = await db_service.execute_query(sql_query)
@@ -171,10 +183,14 @@ async def _get_db_data(self, question: str) -> Optional[Dict[str, Any]]:
             logger.error(f"Error getting DB data: {str(e)}")
             return None
 
-    async def _get_document_data(self, question: str, user_id: str) -> Optional[Dict]:
+    async def _get_document_data(self, ctx: QueryContext) -> Optional[Dict]:
         """Get relevant document data if available"""
         try:
-            results = await self.index_service.query(question, user_id)
+            results = await self.index_service.query(
+                ctx.question,
+                ctx.user_id,
+                query_embedding=await ctx.embedding()
+            )
             if results and len(results) > 0:
                 return {
                     "source_nodes": results  # Results already have the right structure
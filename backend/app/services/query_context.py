@@ -0,0 +1,33 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+
+class QueryContext:
+    """Per-request state shared by every stage of the QA pipeline.
+
+    The question embedding is computed lazily on first use and then shared:
+    however many stages ask for it (document retrieval, answer cache lookup,
+    DB routing, URL relevance), the question goes through the embedding
+    model at most once per request.
+    """
+
+    def __init__(self, question: str, user_id: str, embed: Callable[[str], Awaitable[np.ndarray]]):
+        self.question = question
+        self.user_id = user_id
+        self._embed = embed
+        self._embedding: Optional[asyncio.Future] = None
+
+    @property
+    def has_embedding(self) -> bool:
+        """Whether some stage already requested the question embedding"""
+        return self._embedding is not None
+
+    async def embedding(self) -> np.ndarray:
+        """Question embedding, computed on first call and shared afterwards"""
+        if self._embedding is None:
+            self._embedding = asyncio.ensure_future(self._embed(self.question))
+        # Shielded so one stage being cancelled doesn't cancel the
+        # computation the other stages are waiting on
+        return await asyncio.shield(self._embedding)
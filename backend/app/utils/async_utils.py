@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_thread(factory: Callable[[], Iterator[T]], maxsize: int = 2) -> AsyncIterator[T]:
+    """Drive a blocking iterator in a worker thread and yield its items.
+
+    At most maxsize items are buffered: the thread blocks until the consumer
+    catches up, so a slow consumer holds back a fast producer instead of
+    letting items pile up in memory. Exceptions raised by the iterator are
+    re-raised in the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize)
+    stopped = threading.Event()
+
+    def put(item, error=None):
+        asyncio.run_coroutine_threadsafe(queue.put((item, error)), loop).result()
+
+    def produce():
+        try:
+            for item in factory():
+                if stopped.is_set():
+                    return
+                put(item)
+        except BaseException as e:
+            put(_DONE, e)
+            return
+        put(_DONE)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        # Unblock a producer waiting on a full queue so its thread can exit
+        stopped.set()
+        while not producer.done():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
@@ -1,29 +1,481 @@
-import tempfile
+import io
+import multiprocessing
 import os
-from llama_index.readers.file.docs import PDFReader, DocxReader
+import queue
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, BinaryIO, Callable, Deque, Iterator, List, Optional, Set, Tuple, Union
+from xml.etree import ElementTree
+import lxml.html
+from lxml import etree
+from pypdf import PdfReader
+from pypdf.errors import PdfReadError
 
-def extract_text_from_pdf(content: bytes) -> str:
+from app.core.config import settings
+from app.utils.exceptions import DocumentExtractionError
+
+FileContent = Union[bytes, BinaryIO]
+
+# A piece of document text and the fraction of the source consumed up to its end
+Segment = Tuple[str, float]
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Never part of the readable text of a page. Forms aren't: some sites wrap
+# the whole page in one, so only their controls go
+_HTML_DROPPED = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "input", "button", "select", "nav", "footer", "aside"
+}
+# Content containers; a <header> inside one holds its title rather than page chrome
+_HTML_CONTENT = ("main", "article")
+_HTML_DROPPED_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+# Elements that start a new block of text
+_HTML_BLOCKS = {
+    "p", "div", "section", "article", "main", "h1", "h2", "h3", "h4", "h5", "h6",
+    "li", "ul", "ol", "dl", "dt", "dd", "pre", "blockquote", "table", "tr",
+    "caption", "figcaption", "br", "hr", "address", "details", "summary"
+}
+# Table cells stay on their row's line, separated by a space
+_HTML_CELLS = {"td", "th"}
+# Blocks made up mostly of link text are menus and link lists
+_HTML_MAX_LINK_DENSITY = 0.5
+
+class ExtractionPool:
+    """Worker processes that parse PDF and DOCX files.
+
+    A task's timeout runs from when a worker picks it up, so time spent
+    queued behind other documents doesn't count. A worker that overruns it
+    is killed and replaced on its own; the other workers keep going.
+    """
+
+    def __init__(self, workers: int):
+        # Spawned rather than forked: the parent runs threads and an event loop
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self._processes: Set[multiprocessing.process.BaseProcess] = set()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._serve, name=f"extraction-{number}", daemon=True)
+            for number in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Future:
+        """Run fn(*args) in a worker process, failing with DocumentExtractionError past timeout seconds"""
+        future: Future = Future()
+        self._tasks.put((future, fn, args, timeout))
+        return future
+
+    def shutdown(self, terminate: bool = False) -> None:
+        """Cancel queued tasks and stop the workers once they are idle, or right away with terminate"""
+        self._closed = True
+        for _ in self._threads:
+            self._tasks.put(None)
+        if terminate:
+            for process in list(self._processes):
+                process.terminate()
+
+    def _serve(self) -> None:
+        """Feed tasks to one worker process, replacing it when it dies or overruns a task"""
+        process, connection = None, None
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    return
+                future, fn, args, timeout = task
+                if self._closed:
+                    future.cancel()
+                    continue
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if process is None:
+                    process, connection = self._start()
+                try:
+                    connection.send((fn, args))
+                    if not connection.poll(timeout):
+                        self._stop(process, connection, terminate=True)
+                        process = None
+                        future.set_exception(DocumentExtractionError(f"Text extraction timed out after {timeout}s"))
+                        continue
+                    succeeded, result = connection.recv()
+                except (EOFError, OSError):
+                    # The worker died (e.g. out of memory)
+                    self._stop(process, connection, terminate=True)
+                    process = None
+                    future.set_exception(DocumentExtractionError("Text extraction process crashed"))
+                    continue
+                except Exception as e:
+                    # The task couldn't be pickled; the worker never got it
+                    future.set_exception(e)
+                    continue
+                if succeeded:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+        finally:
+            if process is not None:
+                self._stop(process, connection)
+
+    def _start(self):
+        connection, child = self._context.Pipe()
+        process = self._context.Process(target=_extraction_worker, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        self._processes.add(process)
+        return process, connection
+
+    def _stop(self, process, connection, terminate: bool = False) -> None:
+        if terminate:
+            process.terminate()
+        connection.close()
+        process.join()
+        self._processes.discard(process)
+
+def _extraction_worker(connection) -> None:
+    """Run the tasks sent over connection until it is closed (runs in a worker process)"""
+    while True:
+        try:
+            fn, args = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = (True, fn(*args))
+        except Exception as e:
+            result = (False, e)
+        connection.send(result)
+
+_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool() -> ExtractionPool:
+    """Process pool that parses PDF and DOCX files, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool(settings.EXTRACT_WORKERS or os.cpu_count() or 1)
+        return _pool
+
+def shutdown_extraction_pool(terminate: bool = False) -> None:
+    """Stop the extraction processes; the next extraction starts a new pool.
+
+    With terminate, workers still busy with a task are killed instead of
+    being left to finish it.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(terminate)
+
+def _as_stream(content: FileContent) -> BinaryIO:
+    if isinstance(content, bytes):
+        return io.BytesIO(content)
+    content.seek(0)
+    return content
+
+def _read_bytes(content: FileContent) -> bytes:
+    return content if isinstance(content, bytes) else _as_stream(content).read()
+
+def extract_text_from_pdf(content: FileContent, timeout: Optional[float] = None) -> str:
     """Extract text from a PDF file."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        temp_file.write(content)
-        temp_path = temp_file.name
+    return "\n".join(text for text, _ in iter_pdf_pages(content, timeout))
+
+def extract_text_from_docx(content: FileContent, timeout: Optional[float] = None) -> str:
+    """Extract text from a DOCX file."""
+    return "\n".join(text for text, _ in iter_docx_paragraphs(content, timeout))
+
+def iter_document_segments(
+    content: FileContent,
+    filename: str,
+    min_chars: int = 8000,
+    timeout: Optional[float] = None
+) -> Iterator[Segment]:
+    """Yield a document's text in pieces of at least min_chars, without loading all of it.
+
+    Pieces end on natural boundaries (PDF pages, DOCX paragraphs, blank lines
+    in text files, HTML blocks) so chunks don't straddle them needlessly. Once a piece
+    holds min_chars, it ends after a unit picked by a hash of the unit's text,
+    so editing one part of a document changes only the pieces around the
+    edit instead of shifting every later boundary. PDF and DOCX files are
+    parsed on the extraction pool, timeout seconds per task.
+    """
+    if filename.lower().endswith('.pdf'):
+        units = iter_pdf_pages(content, timeout)
+    elif filename.lower().endswith('.docx'):
+        units = iter_docx_paragraphs(content, timeout)
+    elif filename.lower().endswith(('.html', '.htm')):
+        units = iter_html_blocks(content)
+    else:
+        units = iter_text_blocks(content)
+
+    parts, size, fraction = [], 0, 0.0
+    for text, fraction in units:
+        if not text.strip():
+            continue
+        parts.append(text)
+        size += len(text)
+        if size >= min_chars and (size >= 4 * min_chars or zlib.crc32(text.encode()) % 4 == 0):
+            yield "\n".join(parts), fraction
+            parts, size = [], 0
+    if parts:
+        yield "\n".join(parts), fraction
+
+def iter_pdf_pages(content: FileContent, timeout: Optional[float] = None) -> Iterator[Segment]:
+    """Yield the text of each PDF page, extracting page ranges in parallel.
+
+    The file is shared with the pool through shared memory instead of being
+    pickled for every range, and even the pages are counted there. A few
+    ranges run ahead of the consumer. Each task, counting the pages or
+    extracting a range, gets timeout seconds once a worker starts it.
+    """
+    data = _read_bytes(content)
+    if not data:
+        raise DocumentExtractionError("Empty PDF file")
+    buffer = shared_memory.SharedMemory(create=True, size=len(data))
+    pending: Deque[Tuple[int, Future]] = deque()
     try:
-        reader = PDFReader()
-        documents = reader.load_data(temp_path)
-        text = "\n".join(doc.text for doc in documents)
-        return text
+        buffer.buf[:len(data)] = data
+        del data
+        pool = get_extraction_pool()
+        total = _result(pool.submit(_pdf_page_count, buffer.name, buffer.size, timeout=timeout))
+        step = settings.EXTRACT_PAGES_PER_TASK
+        starts = iter(range(0, total, step))
+        window = 2 * (settings.EXTRACT_WORKERS or os.cpu_count() or 1)
+        while True:
+            while len(pending) < window:
+                first = next(starts, None)
+                if first is None:
+                    break
+                stop = min(first + step, total)
+                future = pool.submit(_pdf_page_texts, buffer.name, buffer.size, first, stop, timeout=timeout)
+                pending.append((first, future))
+            if not pending:
+                return
+            first, future = pending.popleft()
+            texts = _result(future)
+            for offset, text in enumerate(texts, start=1):
+                yield text, (first + offset) / total
     finally:
-        os.unlink(temp_path)
+        for _, future in pending:
+            future.cancel()
+        buffer.close()
+        buffer.unlink()
 
-def extract_text_from_docx(content: bytes) -> str:
-    """Extract text from a DOCX file."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-        temp_file.write(content)
-        temp_path = temp_file.name
+def iter_docx_paragraphs(content: FileContent, timeout: Optional[float] = None) -> Iterator[Segment]:
+    """Yield the text of each DOCX body paragraph, parsed on the extraction pool."""
+    future = get_extraction_pool().submit(_docx_paragraph_texts, _read_bytes(content), timeout=timeout)
+    paragraphs = _result(future)
+    for number, text in enumerate(paragraphs, start=1):
+        yield text, number / len(paragraphs)
+
+def _result(future: Future):
+    """Wait for an extraction task, turning parser failures into DocumentExtractionError"""
     try:
-        reader = DocxReader()
-        documents = reader.load_data(temp_path)
-        text = "\n".join(doc.text for doc in documents)
-        return text
+        return future.result()
+    except PdfReadError as e:
+        raise DocumentExtractionError(f"Invalid PDF file: {str(e)}")
+
+class _MemoryStream(io.RawIOBase):
+    """Read-only file over a memoryview, reading it in place instead of copying it"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def readinto(self, target) -> int:
+        end = min(self._position + len(target), len(self._view))
+        count = max(end - self._position, 0)
+        target[:count] = self._view[self._position:end]
+        self._position += count
+        return count
+
+def _read_shared_pdf(buffer_name: str, size: int, read):
+    """Call read with a PdfReader over a PDF held in shared memory (runs in the pool)"""
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    view = buffer.buf[:size]
+    try:
+        return read(PdfReader(_MemoryStream(view)))
     finally:
-        os.unlink(temp_path) 
\ No newline at end of file
+        # The shared memory can only be closed once no view of it is left
+        view.release()
+        buffer.close()
+
+def _pdf_page_count(buffer_name: str, size: int) -> int:
+    """Number of pages of a PDF held in shared memory (runs in the pool)"""
+    return _read_shared_pdf(buffer_name, size, lambda reader: len(reader.pages))
+
+def _pdf_page_texts(buffer_name: str, size: int, start: int, stop: int) -> List[str]:
+    """Extract pages start..stop-1 of a PDF held in shared memory (runs in the pool)"""
+    return _read_shared_pdf(
+        buffer_name, size,
+        lambda reader: [reader.pages[number].extract_text() or "" for number in range(start, stop)]
+    )
+
+def _docx_paragraph_texts(data: bytes) -> List[str]:
+    """Text of each DOCX body paragraph, parsing the XML incrementally (runs in the pool)"""
+    paragraphs = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        with archive.open("word/document.xml") as xml:
+            for _, element in ElementTree.iterparse(xml, events=("end",)):
+                if element.tag != f"{_WORD_NS}p":
+                    continue
+                parts = []
+                for node in element.iter():
+                    if node.tag == f"{_WORD_NS}t" and node.text:
+                        parts.append(node.text)
+                    elif node.tag == f"{_WORD_NS}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                        parts.append("\n")
+                element.clear()
+                # Blank line between paragraphs, as docx2txt does
+                paragraphs.append("".join(parts) + "\n")
+    return paragraphs
+
+def iter_html_blocks(content: FileContent) -> Iterator[Segment]:
+    """Yield the readable text blocks of an HTML page, without markup or boilerplate."""
+    blocks = extract_html_blocks(_read_bytes(content))
+    for number, text in enumerate(blocks, start=1):
+        yield text, number / len(blocks)
+
+def extract_text_from_html(html: Union[str, bytes]) -> str:
+    """Extract the readable text of an HTML page, one block per line."""
+    return "\n".join(extract_html_blocks(html))
+
+def extract_html_blocks(html: Union[str, bytes]) -> List[str]:
+    """Readable text blocks of an HTML page, in document order.
+
+    Scripts, styles, form controls and page chrome (navigation, page
+    header, footer, sidebars) are dropped, as are blocks that are mostly
+    link text. If the page marks up its content with <main> or <article>,
+    only that is kept, each outermost one once. Whitespace inside a block
+    is collapsed.
+    """
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+        encoding = "utf-8"
+    else:
+        # Let lxml go by the page's <meta charset> unless it is valid UTF-8
+        try:
+            html.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = None
+    if not html.strip():
+        return []
+    parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+    try:
+        root = lxml.html.document_fromstring(html, parser=parser)
+    except (etree.ParserError, ValueError):
+        return []
+
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str):
+            continue
+        if (
+            element.tag in _HTML_DROPPED
+            or (element.tag == "header" and next(element.iterancestors(*_HTML_CONTENT), None) is None)
+            or element.get("role") in _HTML_DROPPED_ROLES
+            or element.get("aria-hidden") == "true"
+            or element.get("hidden") is not None
+        ):
+            # Keeps the text following the element
+            element.drop_tree()
+
+    body = root.find("body")
+    if body is None:
+        body = root
+    content = _outermost(body, "main") or _outermost(body, "article") or [body]
+
+    blocks: List[str] = []
+    for container in content:
+        _collect_html_blocks(container, blocks)
+    return blocks
+
+def _outermost(root, tag: str) -> list:
+    """Elements with the tag that aren't inside another one, which would collect them already"""
+    return [element for element in root.iter(tag) if next(element.iterancestors(tag), None) is None]
+
+def _collect_html_blocks(root, blocks: List[str]) -> None:
+    parts: List[str] = []
+    link_chars = 0
+    in_link = 0
+
+    def flush():
+        nonlocal link_chars
+        text = " ".join("".join(parts).split())
+        if text and link_chars <= _HTML_MAX_LINK_DENSITY * len(text):
+            blocks.append(text)
+        parts.clear()
+        link_chars = 0
+
+    def add(text: Optional[str]):
+        nonlocal link_chars
+        if text:
+            parts.append(text)
+            if in_link:
+                link_chars += len(text.strip())
+
+    # Iterative walk: deeply nested pages don't hit the recursion limit
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag if isinstance(element.tag, str) else None
+        if event == "start":
+            if tag in _HTML_BLOCKS:
+                flush()
+            elif tag in _HTML_CELLS:
+                parts.append(" ")
+            if tag == "a":
+                in_link += 1
+            add(element.text)
+        else:
+            if tag in _HTML_BLOCKS:
+                flush()
+            if tag == "a":
+                in_link -= 1
+            if element is not root:
+                add(element.tail)
+    flush()
+
+def iter_text_blocks(content: FileContent) -> Iterator[Segment]:
+    """Yield blank-line separated blocks of a UTF-8 text file."""
+    stream = _as_stream(content)
+    total = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        block, consumed = [], 0
+        for line in reader:
+            consumed += len(line.encode("utf-8"))
+            if line.strip():
+                block.append(line)
+            elif block:
+                yield "".join(block), consumed / max(total, 1)
+                block = []
+        if block:
+            yield "".join(block), 1.0
+    finally:
+        # Leave the caller's stream open
+        reader.detach()
+
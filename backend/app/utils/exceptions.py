@@ -8,4 +8,20 @@ class DatabaseQueryError(Exception):
 
 class SchemaError(Exception):
     """Raised when schema retrieval fails"""
-    pass 
\ No newline at end of file
+    pass
+
+class EmbeddingError(Exception):
+    """Raised when computing embeddings fails"""
+    pass
+
+class VectorStoreError(Exception):
+    """Raised when writing to the vector store fails"""
+    pass
+
+class DocumentExtractionError(Exception):
+    """Raised when the text of an uploaded document can't be extracted"""
+    pass
+
+class LockError(Exception):
+    """Raised when a lock can't be acquired in time"""
+    pass
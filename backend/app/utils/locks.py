@@ -0,0 +1,165 @@
+import asyncio
+import uuid
+from typing import Dict, Optional
+
+from redis.asyncio import Redis
+
+from app.utils.exceptions import LockError
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# Only the holder's token may extend or release a lock
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Mutual exclusion across processes through a Redis key with a lease.
+
+    The lease is renewed in the background while the lock is held, so long
+    critical sections keep it, while the lock of a process that died frees
+    up once its lease runs out. Use as an async context manager.
+
+    If the lease runs out anyway, e.g. because Redis was unreachable for
+    longer than the lease, another process may already hold the lock. The
+    task holding it is then cancelled, and leaving the context raises
+    LockError instead of CancelledError, so the critical section stops
+    rather than carry on unprotected.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        name: str,
+        lease: float = 30.0,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.1
+    ):
+        self.redis = redis
+        self.name = name
+        self.lease = lease
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._token = uuid.uuid4().hex
+        self._renewer: Optional[asyncio.Task] = None
+        self._holder: Optional[asyncio.Task] = None
+        self.lost = False
+
+    async def acquire(self) -> None:
+        """Wait for the lock, raising LockError after timeout seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        while not await self.redis.set(self.name, self._token, nx=True, px=int(self.lease * 1000)):
+            if deadline is not None and loop.time() >= deadline:
+                raise LockError(f"Timed out waiting for lock {self.name}")
+            await asyncio.sleep(self.poll_interval)
+        self.lost = False
+        self._holder = asyncio.current_task()
+        self._renewer = asyncio.create_task(self._renew())
+
+    async def release(self) -> None:
+        if self._renewer:
+            self._renewer.cancel()
+            self._renewer = None
+        try:
+            await self.redis.eval(RELEASE_SCRIPT, 1, self.name, self._token)
+        except Exception as e:
+            # The lease runs out on its own
+            logger.warning(f"Error releasing lock {self.name}: {str(e)}")
+
+    async def _renew(self) -> None:
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + self.lease
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                renewed = await self.redis.eval(
+                    RENEW_SCRIPT, 1, self.name, self._token, int(self.lease * 1000)
+                )
+            except Exception as e:
+                logger.warning(f"Error renewing lock {self.name}: {str(e)}")
+                if loop.time() < expires:
+                    continue
+                renewed = False
+            if not renewed:
+                logger.error(f"Lost lock {self.name}: its lease ran out before it was renewed")
+                self._lose()
+                return
+            expires = loop.time() + self.lease
+
+    def _lose(self) -> None:
+        self.lost = True
+        if self._holder is not None and not self._holder.done():
+            self._holder.cancel(f"Lost lock {self.name}")
+
+    async def __aenter__(self) -> "RedisLock":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            await self.release()
+        except asyncio.CancelledError as e:
+            if not self.lost:
+                raise
+            # The cancellation from _lose only arrived here
+            exc_type, exc = type(e), e
+        if not self.lost:
+            return
+        if exc_type is asyncio.CancelledError and asyncio.current_task().uncancel() > 0:
+            # Cancelled by the caller as well
+            raise asyncio.CancelledError()
+        raise LockError(f"Lost lock {self.name} while holding it") from exc
+
+
+class LocalLocks:
+    """Named asyncio locks, standing in for RedisLock in a single process"""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def lock(self, name: str) -> "_LocalLock":
+        return _LocalLock(self, name)
+
+
+class _LocalLock:
+    def __init__(self, locks: LocalLocks, name: str):
+        self.locks = locks
+        self.name = name
+
+    async def __aenter__(self):
+        locks = self.locks
+        lock = locks._locks.setdefault(self.name, asyncio.Lock())
+        locks._waiters[self.name] = locks._waiters.get(self.name, 0) + 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.locks._locks[self.name].release()
+        self._forget()
+
+    def _forget(self):
+        # Drop the lock once nobody holds or waits for it
+        locks = self.locks
+        locks._waiters[self.name] -= 1
+        if not locks._waiters[self.name]:
+            del locks._waiters[self.name]
+            del locks._locks[self.name]
@@ -0,0 +1,63 @@
+import hashlib
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+
+# Prime just above 2**32, so hashed shingles stay distinct modulo it
+_PRIME = 4294967311
+_WORD = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash signatures and LSH band keys of texts, for near-duplicate detection.
+
+    Two texts' signatures agree in about as many positions as the Jaccard
+    similarity of their word shingle sets. Signatures are cut into bands of
+    rows; texts sharing any band key are candidate near-duplicates, which
+    with 16 bands of 8 rows catches pairs above ~0.8 similarity almost
+    always and pairs below ~0.5 rarely.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations can't be cut into {bands} bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Below 2**31, so a * hash + b fits into 64 bits
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles, as num_perm uint32 values"""
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return (permuted.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[str]:
+        """One key per band; equal keys mean the band's rows are all equal"""
+        return [
+            hashlib.blake2b(
+                signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                digest_size=8,
+                # Equal rows in different bands don't make texts candidates
+                salt=band.to_bytes(8, "little")
+            ).hexdigest()
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the texts behind two signatures"""
+        return float(np.mean(np.asarray(first) == np.asarray(second)))
+
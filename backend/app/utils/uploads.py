@@ -0,0 +1,302 @@
+import zipfile
+from tempfile import SpooledTemporaryFile
+from typing import List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import parse_options_header
+from starlette.datastructures import UploadFile
+
+from app.utils.logger import setup_logger
+from app.utils.validators import FileValidator
+
+
+logger = setup_logger(__name__)
+
+# Uploads are kept in memory up to this size, larger ones roll over to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadReceiver:
+    """Streams multipart file uploads into spooled temporary files.
+
+    Each file is validated while it arrives: the extension as soon as the part
+    headers are parsed, the MIME type once the first FileValidator.HEADER_SIZE
+    bytes are in, and the size limit on every chunk. A bad upload is rejected
+    without reading the rest of the request, and memory use per upload stays
+    bounded by SPOOL_MAX_SIZE whatever the file size.
+
+    With max_files above 1, a bad file doesn't fail the request: it is set
+    aside in rejected with the reason and the other files are still read, so
+    every file of a bulk upload gets its own verdict. max_total_size then
+    bounds the whole request. Files with one of archive_extensions are taken
+    as zip archives, only size-checked against max_total_size, and replaced
+    by their members in expand_archives().
+    """
+
+    def __init__(
+        self,
+        validator: FileValidator,
+        field_name: str = "file",
+        max_files: int = 1,
+        max_total_size: Optional[int] = None,
+        archive_extensions: Set[str] = frozenset()
+    ):
+        self.validator = validator
+        self.field_name = field_name
+        self.max_files = max_files
+        self.max_total_size = max_total_size
+        self.archive_extensions = archive_extensions
+        self.uploads: List[UploadFile] = []
+        self.rejected: List[Tuple[str, str]] = []
+        self._current: Optional[UploadFile] = None
+        self._filename = ""
+        self._is_archive = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._received = 0
+        self._total = 0
+        self._unpacked = 0
+        self._head = bytearray()
+        self._head_checked = False
+        self._pending: List[Tuple[UploadFile, bytes]] = []
+
+    @property
+    def upload(self) -> Optional[UploadFile]:
+        return self.uploads[0] if self.uploads else None
+
+    async def receive(self, request: Request) -> UploadFile:
+        """Read a single-file request body and return the spooled upload, rewound to the start"""
+        return (await self.receive_all(request))[0]
+
+    async def receive_all(self, request: Request) -> List[UploadFile]:
+        """Read the request body and return the accepted uploads, rewound to the start"""
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+        # Refuse bodies that announce themselves as too large before reading them
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            self._check_total(max(0, int(content_length) - MULTIPART_OVERHEAD * self.max_files))
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await self._flush()
+            parser.finalize()
+        except FormParserError as e:
+            self.close()
+            raise HTTPException(status_code=400, detail=f"Invalid multipart data: {str(e)}")
+        except BaseException:
+            self.close()
+            raise
+
+        if not self.uploads and not self.rejected:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{self.field_name}'")
+        for upload in self.uploads:
+            await upload.seek(0)
+        return self.uploads
+
+    def expand_archives(self) -> List[UploadFile]:
+        """Replace received archives by their members, validated like uploaded files.
+
+        An archive is refused before anything is extracted if it has more
+        members than max_files allows or declares more bytes than
+        max_total_size. Declared sizes can lie, so the bytes actually
+        extracted are counted as well, and the upload is refused as soon as
+        they go over.
+
+        Blocking: decompresses the archives, so run it in a thread.
+        """
+        expanded = []
+        try:
+            for upload in self.uploads:
+                if self._extension(upload.filename) not in self.archive_extensions:
+                    expanded.append(upload)
+                    continue
+                try:
+                    with zipfile.ZipFile(upload.file) as archive:
+                        members = [info for info in archive.infolist() if not info.is_dir()]
+                        self._check_count(len(expanded) + len(self.rejected) + len(members))
+                        self._check_total(self._unpacked + sum(info.file_size for info in members))
+                        for info in members:
+                            member = self._extract_member(archive, info, f"{upload.filename}/{info.filename}")
+                            if member is not None:
+                                expanded.append(member)
+                except zipfile.BadZipFile:
+                    self.rejected.append((upload.filename, "Not a valid zip archive"))
+                finally:
+                    upload.file.close()
+            self._check_count(len(expanded) + len(self.rejected))
+        except HTTPException:
+            for upload in expanded:
+                upload.file.close()
+            self.close()
+            raise
+        self.uploads = expanded
+        return self.uploads
+
+    def close(self):
+        for upload in self.uploads:
+            upload.file.close()
+
+    def _extract_member(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, filename: str) -> Optional[UploadFile]:
+        try:
+            self.validator.validate_extension(filename)
+            # The declared size can lie, so the copy below is capped as well
+            self.validator.validate_size(info.file_size)
+            spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            try:
+                with archive.open(info) as source:
+                    head = source.read(self.validator.HEADER_SIZE)
+                    self.validator.validate_header(head, filename)
+                    spool.write(head)
+                    size = len(head)
+                    self._add_unpacked(len(head))
+                    while chunk := source.read(SPOOL_MAX_SIZE):
+                        size += len(chunk)
+                        self.validator.validate_size(size)
+                        self._add_unpacked(len(chunk))
+                        spool.write(chunk)
+            except BaseException:
+                spool.close()
+                raise
+        except HTTPException as e:
+            if self._unpacked > self._total_limit:
+                # The upload as a whole is too large, not just this member
+                raise
+            self.rejected.append((filename, e.detail))
+            return None
+        spool.seek(0)
+        return UploadFile(file=spool, size=size, filename=filename)
+
+    async def _flush(self):
+        # Parser callbacks are synchronous; UploadFile.write moves disk
+        # writes off the event loop once the spool has rolled over
+        for upload, data in self._pending:
+            await upload.write(data)
+        self._pending.clear()
+
+    def _on_part_begin(self):
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        self._current = None
+        if name != self.field_name or b"filename" not in options:
+            return
+        if len(self.uploads) + len(self.rejected) >= self.max_files:
+            if self.max_files == 1:
+                raise HTTPException(status_code=400, detail="Only one file can be uploaded at a time")
+            raise HTTPException(status_code=400, detail=f"Too many files. At most {self.max_files} per upload")
+        self._filename = options[b"filename"].decode("utf-8", errors="replace")
+        self._is_archive = self._extension(self._filename) in self.archive_extensions
+        self._received = 0
+        self._head = bytearray()
+        self._head_checked = self._is_archive
+        if not self._is_archive and not self._validate(self.validator.validate_extension, self._filename):
+            return
+        self._current = UploadFile(
+            file=SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE),
+            size=0,
+            filename=self._filename
+        )
+        self.uploads.append(self._current)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._current is None:
+            return
+        chunk = data[start:end]
+        self._received += len(chunk)
+        self._total += len(chunk)
+        if self.max_total_size is not None:
+            self._check_total(self._total)
+        if not self._is_archive and not self._validate(self.validator.validate_size, self._received):
+            return
+        if not self._head_checked:
+            self._head.extend(chunk[:self.validator.HEADER_SIZE - len(self._head)])
+            if len(self._head) >= self.validator.HEADER_SIZE and not self._check_head():
+                return
+        self._pending.append((self._current, chunk))
+
+    def _on_part_end(self):
+        if self._current is not None and not self._head_checked:
+            # Files shorter than the sniffing window are checked as a whole
+            self._check_head()
+        self._current = None
+
+    def _check_head(self) -> bool:
+        self._head_checked = True
+        head, self._head = bytes(self._head), bytearray()
+        return self._validate(self.validator.validate_header, head, self._filename)
+
+    @property
+    def _total_limit(self) -> int:
+        return self.validator.max_size if self.max_total_size is None else self.max_total_size
+
+    def _check_total(self, size: int):
+        if self.max_total_size is None:
+            self.validator.validate_size(size)
+        elif size > self.max_total_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Upload too large. Maximum size is {self.max_total_size/1024/1024}MB"
+            )
+
+    def _check_count(self, count: int):
+        if count > self.max_files:
+            raise HTTPException(status_code=400, detail=f"Too many files. At most {self.max_files} per upload")
+
+    def _add_unpacked(self, size: int):
+        """Count bytes extracted from archives against the upload limit"""
+        self._unpacked += size
+        self._check_total(self._unpacked)
+
+    def _validate(self, check, *args) -> bool:
+        """Run a validator check; in bulk mode a failure only rejects the current file"""
+        try:
+            check(*args)
+            return True
+        except HTTPException as e:
+            if self.max_files == 1:
+                raise
+            self._reject(e.detail)
+            return False
+
+    def _reject(self, reason: str):
+        self.rejected.append((self._filename, reason))
+        if self._current is not None:
+            self._pending = [(upload, data) for upload, data in self._pending if upload is not self._current]
+            self.uploads.remove(self._current)
+            self._current.file.close()
+            self._current = None
+
+    def _extension(self, filename: str) -> str:
+        return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
@@ -1,8 +1,9 @@
 import aiohttp
+import asyncio
 import hashlib
-from bs4 import BeautifulSoup
 from app.core.config import settings
 from app.utils.cache import QueryCache
+from app.utils.document_utils import extract_text_from_html
 from app.utils.logger import setup_logger
 import re
 from typing import Optional, Tuple
@@ -57,21 +58,8 @@ async def fetch_url_content(self, url: str) -> Tuple[Optional[str], Optional[str
                     
                     html = await response.text()
                     
-                    # Parse HTML
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Remove unwanted elements
-                    for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                        element.decompose()
-                    
-                    # Extract text while preserving some structure
-                    content = []
-                    for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']):
-                        text = element.get_text(strip=True)
-                        if text:
-                            content.append(text)
-                    
-                    text_content = '\n'.join(content)
+                    # Same extraction as uploaded HTML documents
+                    text_content = await asyncio.to_thread(extract_text_from_html, html)
                     
                     # Cache the content
                     await self.cache.set(
@@ -5,6 +5,16 @@
 from app.utils.logger import setup_logger
 
 class FileValidator:
+    # libmagic only needs the start of a file to identify it
+    HEADER_SIZE = 8192
+
+    ALLOWED_MIMES = {
+        'txt': 'text/plain',
+        'pdf': 'application/pdf',
+        'html': 'text/html',
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    }
+
     def __init__(self, allowed_extensions: Set[str], max_size: int):
         self.allowed_extensions = allowed_extensions
         self.max_size = max_size
@@ -12,34 +22,36 @@ def __init__(self, allowed_extensions: Set[str], max_size: int):
 
     def validate_file(self, content: bytes, filename: str) -> None:
         """Validate file size, extension and mime type"""
-        # Check file size
-        if len(content) > self.max_size:
+        self.validate_size(len(content))
+        self.validate_extension(filename)
+        self.validate_header(content[:self.HEADER_SIZE], filename)
+
+    def validate_size(self, size: int) -> None:
+        """Check a (possibly partial) file size against the limit"""
+        if size > self.max_size:
             raise HTTPException(
                 status_code=400,
                 detail=f"File too large. Maximum size is {self.max_size/1024/1024}MB"
             )
 
-        # Get file extension without the dot
-        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        
-        if extension not in self.allowed_extensions:
+    def validate_extension(self, filename: str) -> None:
+        """Check the file extension, which is known before any content arrives"""
+        if self._extension(filename) not in self.allowed_extensions:
             raise HTTPException(
                 status_code=400,
                 detail=f"File type not allowed. Supported types: {', '.join(self.allowed_extensions)}"
             )
 
-        # Check mime type
-        mime_type = self.mime.from_buffer(content)
-        allowed_mimes = {
-            'txt': 'text/plain',
-            'pdf': 'application/pdf',
-            'html': 'text/html',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        }
-
-        expected_mime = allowed_mimes.get(extension)
+    def validate_header(self, header: bytes, filename: str) -> None:
+        """Check that the first bytes of a file match its extension"""
+        mime_type = self.mime.from_buffer(header)
+        expected_mime = self.ALLOWED_MIMES.get(self._extension(filename))
         if expected_mime and not mime_type.startswith(expected_mime):
             raise HTTPException(
                 status_code=400,
                 detail=f"File content doesn't match its extension"
-            ) 
\ No newline at end of file
+            )
+
+    def _extension(self, filename: str) -> str:
+        # Get file extension without the dot
+        return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
@@ -1,6 +1,7 @@
 import weaviate
-from weaviate.classes.config import Configure, DataType, Property
-from weaviate.classes.config import VectorDistances
+from weaviate.classes.config import Configure, DataType, Property, Reconfigure, Tokenization
+from weaviate.classes.config import VectorDistances, VectorFilterStrategy
+from weaviate.classes.init import AdditionalConfig, Timeout
 from llama_index.vector_stores.weaviate import WeaviateVectorStore
 
 from app.core.config import settings
@@ -9,41 +10,159 @@
 
 logger = setup_logger(__name__)
 
+# Near-duplicate detection; band keys and document ids are matched whole
+DEDUP_PROPERTIES = [
+    Property(name="doc_ids", data_type=DataType.TEXT_ARRAY, tokenization=Tokenization.FIELD),
+    Property(name="lsh_bands", data_type=DataType.TEXT_ARRAY, tokenization=Tokenization.FIELD),
+    Property(name="minhash", data_type=DataType.INT_ARRAY, index_filterable=False),
+]
+
+COMPRESSIONS = ("none", "pq", "bq", "sq")
+
+def _connection_params():
+    return dict(
+        host='weaviate',
+        port=8080,
+        grpc_port=50051,
+        additional_config=AdditionalConfig(timeout=Timeout(
+            query=settings.WEAVIATE_QUERY_TIMEOUT,
+            insert=settings.WEAVIATE_INSERT_TIMEOUT
+        ))
+    )
+
+def _quantizer(factory, compression: str):
+    """Quantizer config of a Configure or Reconfigure factory, None when uncompressed"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown vector compression {compression!r}, expected one of {', '.join(COMPRESSIONS)}")
+    rescore = dict(rescore_limit=settings.WEAVIATE_RESCORE_LIMIT) if settings.WEAVIATE_RESCORE_LIMIT else {}
+    if compression == "pq":
+        return factory.Quantizer.pq()
+    if compression == "bq":
+        return factory.Quantizer.bq(**rescore)
+    if compression == "sq":
+        return factory.Quantizer.sq(**rescore)
+    return None
+
+def vector_index_config():
+    """HNSW index of new chunk collections, as the settings describe it"""
+    return Configure.VectorIndex.hnsw(
+        distance_metric=VectorDistances.COSINE,
+        ef_construction=settings.WEAVIATE_HNSW_EF_CONSTRUCTION,
+        max_connections=settings.WEAVIATE_HNSW_MAX_CONNECTIONS,
+        ef=settings.WEAVIATE_HNSW_EF,
+        filter_strategy=VectorFilterStrategy(settings.WEAVIATE_FILTER_STRATEGY),
+        quantizer=_quantizer(Configure.VectorIndex, settings.WEAVIATE_COMPRESSION)
+    )
+
+def compression_of(index_config) -> str:
+    """Compression an existing vector index uses"""
+    quantizer = getattr(index_config, "quantizer", None)
+    if quantizer is None:
+        return "none"
+    return type(quantizer).__name__.strip("_").replace("Config", "").lower()
+
+def update_vector_index(collection) -> bool:
+    """Bring an existing collection's index in line with the settings; True if it was changed.
+
+    Search ef, the filter strategy and turning compression on can change in
+    place, and compression is applied to the vectors already stored.
+    Neighbour counts, ef_construction and switching or removing compression
+    need a rebuild: python -m app.cli.vector_index rebuild.
+    """
+    current = collection.config.get().vector_index_config
+    name = collection.name
+    if (current.ef_construction, current.max_connections) != (
+        settings.WEAVIATE_HNSW_EF_CONSTRUCTION, settings.WEAVIATE_HNSW_MAX_CONNECTIONS
+    ):
+        logger.warning(
+            f"{name} was built with ef_construction={current.ef_construction}, "
+            f"max_connections={current.max_connections}; rebuild it to apply the configured ones"
+        )
+    changes = {}
+    if current.ef != settings.WEAVIATE_HNSW_EF:
+        changes["ef"] = settings.WEAVIATE_HNSW_EF
+    strategy = VectorFilterStrategy(settings.WEAVIATE_FILTER_STRATEGY)
+    if current.filter_strategy != strategy:
+        changes["filter_strategy"] = strategy
+    compression = compression_of(current)
+    if compression != settings.WEAVIATE_COMPRESSION:
+        if compression == "none":
+            changes["quantizer"] = _quantizer(Reconfigure.VectorIndex, settings.WEAVIATE_COMPRESSION)
+        else:
+            logger.warning(
+                f"{name} vectors are {compression}-compressed; rebuild it to use {settings.WEAVIATE_COMPRESSION}"
+            )
+    if not changes:
+        return False
+    collection.config.update(vector_index_config=Reconfigure.VectorIndex.hnsw(**changes))
+    logger.info(f"Updated {name} vector index: {', '.join(sorted(changes))}")
+    return True
+
+def ensure_collection(client, name: str, multi_tenancy: bool = False) -> None:
+    """Create a chunk collection unless it exists, or add properties it predates.
+
+    Tenants of a multi-tenant collection are created when first written
+    to, and reactivated when accessed after being deactivated or offloaded.
+    """
+    if not client.collections.exists(name):
+        client.collections.create(
+            name=name,
+            properties=[
+                Property(name="text", data_type=DataType.TEXT),
+                Property(name="filename", data_type=DataType.TEXT),
+                Property(name="doc_id", data_type=DataType.TEXT),
+                Property(name="chunk_id", data_type=DataType.INT),
+                # Superseded by the document catalog; read to backfill it
+                Property(name="active", data_type=DataType.TEXT),
+                Property(name="users", data_type=DataType.TEXT_ARRAY),
+                Property(name="file_size", data_type=DataType.INT),  # For document uniqueness
+                Property(name="total_chunks", data_type=DataType.INT),  # For document reconstruction
+                *DEDUP_PROPERTIES
+            ],
+            vectorizer_config=Configure.Vectorizer.none(),  # We provide our own vectors
+            vector_index_config=vector_index_config(),
+            multi_tenancy_config=Configure.multi_tenancy(
+                enabled=True, auto_tenant_creation=True, auto_tenant_activation=True
+            ) if multi_tenancy else None
+        )
+        logger.info(f"Created {name} collection")
+    else:
+        logger.info(f"{name} collection already exists")
+        collection = client.collections.get(name)
+        existing = {prop.name for prop in collection.config.get().properties}
+        for prop in DEDUP_PROPERTIES:
+            if prop.name not in existing:
+                collection.config.add_property(prop)
+                logger.info(f"Added property {prop.name} to {name} collection")
+        update_vector_index(collection)
+
+async def create_async_client():
+    """Connected async Weaviate client, for searches from request handlers.
+
+    Searches await the network instead of holding the event loop, and the
+    client's connection pool is reused across them. Expects the schema
+    create_vector_store sets up.
+    """
+    try:
+        client = weaviate.use_async_with_local(**_connection_params())
+        await client.connect()
+        logger.info("Async Weaviate client connected")
+        return client
+    except Exception as e:
+        logger.error(f"Error initializing async Weaviate client: {str(e)}")
+        raise
+
 async def create_vector_store():
     """Initialize Weaviate client and create schema"""
     try:
         logger.info(f"Connecting to Weaviate at: {settings.WEAVIATE_URL}")
         # For newer versions (v4+):
-        client = weaviate.connect_to_local(
-            host='weaviate',
-            port=8080,
-            grpc_port=50051,
-        )
+        client = weaviate.connect_to_local(**_connection_params())
         
         # Create collection if not exists
-        if not client.collections.exists("Documents"):
-            client.collections.create(
-                name="Documents",
-                properties=[
-                    Property(name="text", data_type=DataType.TEXT),
-                    Property(name="filename", data_type=DataType.TEXT),
-                    Property(name="doc_id", data_type=DataType.TEXT),
-                    Property(name="chunk_id", data_type=DataType.INT),
-                    Property(name="active", data_type=DataType.TEXT),
-                    Property(name="users", data_type=DataType.TEXT_ARRAY),  # Add users array
-                    Property(name="file_size", data_type=DataType.INT),  # For document uniqueness
-                    Property(name="total_chunks", data_type=DataType.INT)  # For document reconstruction
-                ],
-                vectorizer_config=Configure.Vectorizer.none(),  # We provide our own vectors
-                vector_index_config=Configure.VectorIndex.hnsw(
-                    distance_metric=VectorDistances.COSINE,
-                    ef_construction=128,
-                    max_connections=64
-                )
-            )
-            logger.info("Created Documents collection")
-        else:
-            logger.info("Documents collection already exists")
+        ensure_collection(client, "Documents")
+        if settings.WEAVIATE_MULTI_TENANCY:
+            ensure_collection(client, settings.WEAVIATE_TENANT_COLLECTION, multi_tenancy=True)
             
         # Create and return WeaviateVectorStore instance
         vector_store = WeaviateVectorStore(
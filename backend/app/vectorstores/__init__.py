@@ -0,0 +1,9 @@
+from .base_store import BaseChunkStore, BaseSearcher, SearchHit
+from .local_store import LocalChunkStore, LocalSearcher
+from .weaviate_search import WeaviateSearcher
+from .weaviate_store import WeaviateChunkStore
+
+__all__ = [
+    'BaseChunkStore', 'BaseSearcher', 'LocalChunkStore', 'LocalSearcher', 'SearchHit',
+    'WeaviateChunkStore', 'WeaviateSearcher'
+]
@@ -0,0 +1,175 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode, NodeRelationship
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+
+class SearchHit:
+    """One chunk found by a search"""
+
+    __slots__ = ("text", "doc_id", "doc_ids", "chunk_id", "total_chunks", "score")
+
+    def __init__(
+        self,
+        text: str,
+        doc_id: str,
+        doc_ids: Sequence[str],
+        chunk_id: Optional[int],
+        total_chunks: Optional[int],
+        score: Optional[float]
+    ):
+        self.text = text
+        self.doc_id = doc_id
+        self.doc_ids = doc_ids
+        self.chunk_id = chunk_id
+        self.total_chunks = total_chunks
+        self.score = score
+
+    @property
+    def owners(self) -> Sequence[str]:
+        """Documents the chunk is part of; chunks stored before sharing only know their own"""
+        return self.doc_ids or [self.doc_id]
+
+
+class BaseChunkStore(ABC):
+    """Keeps embedded chunks with the metadata ingestion works on.
+
+    Chunks are stored in llama_index's property layout: the text under
+    text_key, the node's metadata as flat properties and the serialized
+    node in _node_content. search_id is the document a chunk was stored
+    for and doc_ids every document using it. Calls block; LlamaIndexService
+    runs them on its vector store threads.
+    """
+
+    text_key = "text"
+    # Tenant of a multi-tenant collection the store works on, if any
+    tenant: Optional[str] = None
+
+    @abstractmethod
+    def add(
+        self,
+        nodes: Sequence[BaseNode],
+        embeddings: np.ndarray,
+        properties: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> List[str]:
+        """Insert or overwrite nodes with embeddings[i] as the vector of nodes[i].
+
+        properties[i] are stored with nodes[i] next to its metadata, without
+        becoming part of the node llama_index reads back.
+        """
+        pass
+
+    @abstractmethod
+    def update_chunks(self, updates: Mapping[str, Dict[str, Any]], ref_doc_id: Optional[str] = None) -> None:
+        """Set metadata fields per chunk id, optionally moving the chunks to another document"""
+        pass
+
+    @abstractmethod
+    def get(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored metadata of chunks by id, without vectors; missing ids are left out"""
+        pass
+
+    @abstractmethod
+    def chunk_hashes(self, doc_id: str) -> Dict[str, List[str]]:
+        """Ids of the chunks only this document uses, keyed by their chunk_hash"""
+        pass
+
+    @abstractmethod
+    def lsh_candidates(self, band_keys: Sequence[str], doc_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Chunks other than first ones of the given documents sharing any of the LSH band keys.
+
+        Returns the MinHash signature, chunk hash and owning document of each.
+        """
+        pass
+
+    @abstractmethod
+    def add_owner(self, ids: Sequence[str], doc_id: str) -> None:
+        """Make stored chunks part of another document as well"""
+        pass
+
+    @abstractmethod
+    def detach_document(self, doc_id: str) -> None:
+        """Hand the document's shared chunks over to the next document using them"""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete chunks by id"""
+        pass
+
+    def update_metadata(self, ids: Sequence[str], metadata: Dict[str, Any]) -> None:
+        """Set the same metadata fields on already stored chunks"""
+        self.update_chunks({chunk_id: metadata for chunk_id in ids})
+
+    def legacy_documents(self) -> Iterator[Dict[str, Any]]:
+        """Documents as recorded on their first chunks before the document catalog existed"""
+        return iter(())
+
+    def _properties(self, node: BaseNode) -> Dict[str, Any]:
+        properties = {self.text_key: node.get_content(metadata_mode=MetadataMode.NONE) or ""}
+        properties.update(node_to_metadata_dict(node, remove_text=True, flat_metadata=False))
+        return properties
+
+    @staticmethod
+    def _patched(node_content: str, metadata: Dict[str, Any], ref_doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """Properties to write for new metadata, in the flat properties and _node_content"""
+        metadata = dict(metadata)
+        node = json.loads(node_content)
+        node["metadata"].update(metadata)
+        if ref_doc_id is not None:
+            source = node["relationships"].get(NodeRelationship.SOURCE.value)
+            if source:
+                source["node_id"] = ref_doc_id
+            metadata.update(doc_id=ref_doc_id, document_id=ref_doc_id, ref_doc_id=ref_doc_id)
+        return {**metadata, "_node_content": json.dumps(node)}
+
+    @staticmethod
+    def _owned_copy(properties: Dict[str, Any], doc_id: str) -> Dict[str, Any]:
+        """Properties of a chunk made to belong to doc_id alone"""
+        node_content = json.loads(properties["_node_content"])
+        node_content["metadata"].update(search_id=doc_id, doc_ids=[doc_id])
+        source = node_content["relationships"].get(NodeRelationship.SOURCE.value)
+        if source:
+            source["node_id"] = doc_id
+        return {
+            **properties,
+            "search_id": doc_id,
+            "doc_ids": [doc_id],
+            "doc_id": doc_id,
+            "document_id": doc_id,
+            "ref_doc_id": doc_id,
+            "_node_content": json.dumps(node_content)
+        }
+
+
+class BaseSearcher(ABC):
+    """Finds the chunks of a set of documents closest to a question"""
+
+    @abstractmethod
+    async def search(
+        self,
+        vector: np.ndarray,
+        doc_ids: Sequence[str],
+        limit: int,
+        query: Optional[str] = None,
+        alpha: float = 1.0,
+        tenant: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Chunks of the given documents closest to vector, best first.
+
+        With a query and alpha below 1, keyword matches on the query count
+        towards the score as well.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_document(self, doc_id: str, tenant: Optional[str] = None) -> None:
+        """Delete the chunks a document owns"""
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,513 @@
+import asyncio
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+
+from app.core.config import settings
+from app.utils.exceptions import VectorStoreError
+from app.utils.logger import setup_logger
+from app.vectorstores.base_store import BaseChunkStore, BaseSearcher, SearchHit
+
+
+logger = setup_logger(__name__)
+
+VECTOR_DTYPE = np.dtype("<f4")
+# Near-duplicate candidates returned per page of LSH band keys
+_CANDIDATE_LIMIT = 1000
+# Band keys looked up per query
+_BAND_PAGE = 500
+# Hybrid searches rerank this many times the requested hits by keyword
+_HYBRID_POOL = 4
+# Compaction starts once this share of the vector rows is dead, and there are at least _COMPACT_MIN_ROWS
+_COMPACT_RATIO = 0.5
+_COMPACT_MIN_ROWS = 1000
+_WORDS = re.compile(r"\w+")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS chunks (
+        id TEXT PRIMARY KEY,
+        row INTEGER NOT NULL UNIQUE,
+        doc_id TEXT,
+        search_id TEXT,
+        chunk_id INTEGER,
+        chunk_hash TEXT,
+        properties TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id);
+    CREATE INDEX IF NOT EXISTS chunks_search_id ON chunks (search_id);
+    CREATE TABLE IF NOT EXISTS owners (
+        doc_id TEXT NOT NULL,
+        chunk TEXT NOT NULL,
+        PRIMARY KEY (doc_id, chunk)
+    );
+    CREATE INDEX IF NOT EXISTS owners_chunk ON owners (chunk);
+    CREATE TABLE IF NOT EXISTS bands (
+        band TEXT NOT NULL,
+        chunk TEXT NOT NULL,
+        PRIMARY KEY (band, chunk)
+    );
+    CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk);
+"""
+
+
+class LocalChunkStore(BaseChunkStore):
+    """Keeps chunks on local disk and searches them in process, for single-process deployments.
+
+    Vectors are rows of one float32 file, normalised so cosine similarity
+    is a dot product. They are appended as chunks arrive and memory-mapped
+    for search. Metadata, the documents using each chunk and LSH band keys
+    are kept in SQLite next to it.
+
+    A search scores the rows of the documents it may return exactly, one
+    matrix-vector product. When more than exact_limit rows are allowed and
+    hnswlib is installed, it walks an HNSW graph over all rows instead,
+    restricted to the allowed ones. The graph is built on first use and
+    saved on close.
+
+    Rows of overwritten or deleted chunks stay in the file, skipped, until
+    they make up half of it; then the file is compacted.
+
+    Row numbers are handed out in memory, so one process at a time may open
+    the store; others fail with VectorStoreError until it is closed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        exact_limit: int = 20000,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 128,
+        hnsw_ef: int = 64
+    ):
+        self.path = path
+        self.exact_limit = exact_limit
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef = hnsw_ef
+        # Writes, and reads of more than one statement, take turns
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(os.path.join(path, "lock"), "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise VectorStoreError(
+                f"Local vector store {path} is open in another process; it serves one process at a time, "
+                f"so run a single API worker and stop the API while bulk_ingest uses the store"
+            )
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._graph_path = os.path.join(path, "hnsw.bin")
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        dim = self._meta("dim")
+        self.dim = int(dim) if dim else None
+        # Rows written to the file; a crash between the file and SQLite leaves unused ones
+        self._rows = os.path.getsize(self._vectors_path) // (4 * self.dim) if self.dim else 0
+        self._matrix: Optional[np.ndarray] = None
+        self._graph = None
+        self._graph_unavailable = False
+
+    def add(
+        self,
+        nodes: Sequence[BaseNode],
+        embeddings: np.ndarray,
+        properties: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> List[str]:
+        if len(nodes) != len(embeddings):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(nodes)} nodes")
+        if not len(nodes):
+            return []
+        vectors = _normalized(np.asarray(embeddings, dtype=VECTOR_DTYPE))
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with self._conn:
+                    self._conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise VectorStoreError(f"Got {vectors.shape[1]}-dim vectors for a store of {self.dim}-dim ones")
+            first = self._rows
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            self._rows += len(vectors)
+
+            ids = [node.node_id for node in nodes]
+            replaced = self._rows_of(ids)
+            with self._conn:
+                self._remove(ids)
+                for i, node in enumerate(nodes):
+                    self._write(node.node_id, first + i, {
+                        **self._properties(node), **(properties[i] if properties else {})
+                    })
+            if self._graph is not None:
+                self._grow_graph(len(vectors))
+                self._graph.add_items(vectors, np.arange(first, self._rows))
+                for row in replaced:
+                    self._graph.mark_deleted(row)
+        return ids
+
+    def update_chunks(self, updates: Mapping[str, Dict[str, Any]], ref_doc_id: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            for chunk_id, row, properties in self._chunks(list(updates)):
+                properties.update(self._patched(properties["_node_content"], updates[chunk_id], ref_doc_id))
+                self._write(chunk_id, row, properties)
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                chunk_id: json.loads(properties["_node_content"])["metadata"]
+                for chunk_id, _, properties in self._chunks(ids)
+            }
+
+    def chunk_hashes(self, doc_id: str) -> Dict[str, List[str]]:
+        hashes: Dict[str, List[str]] = {}
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT c.id, c.chunk_hash FROM chunks c
+                WHERE c.search_id = ? AND (SELECT count(*) FROM owners o WHERE o.chunk = c.id) <= 1
+            """, (doc_id,)).fetchall()
+        for chunk_id, chunk_hash in rows:
+            hashes.setdefault(chunk_hash or "", []).append(chunk_id)
+        return hashes
+
+    def lsh_candidates(self, band_keys: Sequence[str], doc_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        keys = list(dict.fromkeys(band_keys))
+        with self._lock:
+            for start in range(0, len(keys), _BAND_PAGE):
+                rows = self._conn.execute("""
+                    SELECT DISTINCT c.id, c.search_id, c.chunk_hash, c.properties FROM bands b
+                    JOIN chunks c ON c.id = b.chunk
+                    JOIN owners o ON o.chunk = c.id
+                    WHERE b.band IN (SELECT value FROM json_each(?))
+                      AND o.doc_id IN (SELECT value FROM json_each(?))
+                      AND c.chunk_id > 0
+                    LIMIT ?
+                """, (json.dumps(keys[start:start + _BAND_PAGE]), json.dumps(list(doc_ids)), _CANDIDATE_LIMIT))
+                for chunk_id, search_id, chunk_hash, properties in rows:
+                    found[chunk_id] = {
+                        "minhash": np.asarray(json.loads(properties)["minhash"], dtype=np.uint32),
+                        "chunk_hash": chunk_hash,
+                        "search_id": search_id
+                    }
+        return found
+
+    def add_owner(self, ids: Sequence[str], doc_id: str) -> None:
+        with self._lock, self._conn:
+            for chunk_id, row, properties in self._chunks(ids):
+                owners = properties.get("doc_ids") or [properties["search_id"]]
+                properties.update(self._patched(properties["_node_content"], {
+                    "doc_ids": list(dict.fromkeys([*owners, doc_id]))
+                }))
+                self._write(chunk_id, row, properties)
+
+    def detach_document(self, doc_id: str) -> None:
+        with self._lock, self._conn:
+            ids = [chunk_id for (chunk_id,) in self._conn.execute("""
+                SELECT id FROM chunks WHERE search_id = ?
+                UNION SELECT chunk FROM owners WHERE doc_id = ?
+            """, (doc_id, doc_id))]
+            for chunk_id, row, properties in self._chunks(ids):
+                owners = [owner for owner in properties.get("doc_ids") or [] if owner != doc_id]
+                if not owners:
+                    continue
+                if properties.get("search_id") != doc_id:
+                    patch = self._patched(properties["_node_content"], {"doc_ids": owners})
+                else:
+                    patch = self._patched(
+                        properties["_node_content"], {"doc_ids": owners, "search_id": owners[0]}, owners[0]
+                    )
+                self._write(chunk_id, row, {**properties, **patch})
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            rows = self._rows_of(ids)
+            with self._conn:
+                self._remove(ids)
+            if self._graph is not None:
+                for row in rows:
+                    self._graph.mark_deleted(row)
+            self._compact_if_sparse()
+
+    def delete_document(self, doc_id: str) -> int:
+        """Delete the chunks a document owns; returns how many"""
+        with self._lock:
+            ids = [chunk_id for (chunk_id,) in self._conn.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,))]
+            self.delete(ids)
+        return len(ids)
+
+    def search(
+        self,
+        vector: np.ndarray,
+        doc_ids: Sequence[str],
+        limit: int,
+        query: Optional[str] = None,
+        alpha: float = 1.0
+    ) -> List[SearchHit]:
+        """Chunks of the given documents closest to vector, best first.
+
+        With a query and alpha below 1, a few times more chunks are taken by
+        vector and reranked with the share of the query's words they
+        contain, both scores scaled to 0..1 as in Weaviate's relative score
+        fusion.
+        """
+        hybrid = bool(query) and alpha < 1.0
+        wanted = limit * _HYBRID_POOL if hybrid else limit
+        query_vector = _normalized(np.asarray(vector, dtype=VECTOR_DTYPE).reshape(1, -1))[0]
+        with self._lock:
+            # Row numbers only hold until the next compaction, so they are
+            # mapped to chunk ids along with the vectors they index
+            allowed_ids = dict(self._conn.execute("""
+                SELECT DISTINCT c.row, c.id FROM owners o JOIN chunks c ON c.id = o.chunk
+                WHERE o.doc_id IN (SELECT value FROM json_each(?))
+                ORDER BY c.row
+            """, (json.dumps(list(doc_ids)),)))
+            if not allowed_ids:
+                return []
+            allowed = np.fromiter(allowed_ids, dtype=np.int64, count=len(allowed_ids))
+            matrix = self._vectors()
+            graph = None
+            if len(allowed) > self.exact_limit and not self._graph_unavailable:
+                graph = self._load_graph()
+            if graph is not None:
+                # add() grows and changes the graph; it is only walked while that can't happen
+                k = min(wanted, len(allowed_ids))
+                graph.set_ef(max(self.hnsw_ef, k))
+                labels, distances = graph.knn_query(query_vector, k=k, filter=allowed_ids.__contains__)
+                rows, similarities = labels[0], 1.0 - distances[0]
+
+        if graph is None:
+            # Rows in file order, so the mapped pages are read front to back.
+            # A compaction swaps in a new file; this mapping keeps the old one
+            scores = matrix[allowed] @ query_vector
+            top = _top(scores, wanted)
+            rows, similarities = allowed[top], scores[top]
+        ids = [allowed_ids[int(row)] for row in rows]
+
+        with self._lock:
+            found = {
+                chunk_id: json.loads(properties)
+                for chunk_id, properties in self._conn.execute(
+                    "SELECT id, properties FROM chunks WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(ids),)
+                )
+            }
+        hits = [
+            SearchHit(
+                found[chunk_id].get(self.text_key) or "",
+                found[chunk_id].get("doc_id"),
+                found[chunk_id].get("doc_ids") or (),
+                found[chunk_id].get("chunk_id"),
+                found[chunk_id].get("total_chunks"),
+                float(score)
+            )
+            for chunk_id, score in zip(ids, similarities)
+            # Deleted since the rows were read
+            if chunk_id in found
+        ]
+        return _rerank(hits, query, alpha)[:limit] if hybrid else hits
+
+    def compact(self) -> None:
+        """Rewrite the vector file without the rows no chunk uses"""
+        with self._lock:
+            live = self._conn.execute("SELECT id, row FROM chunks ORDER BY row").fetchall()
+            matrix = self._vectors()
+            scratch = self._vectors_path + ".compact"
+            with open(scratch, "wb") as f:
+                for start in range(0, len(live), 4096):
+                    rows = [row for _, row in live[start:start + 4096]]
+                    f.write(np.ascontiguousarray(matrix[rows]).tobytes())
+            with self._conn:
+                # Negated first so the new row numbers never clash with old ones
+                self._conn.execute("UPDATE chunks SET row = -1 - row")
+                self._conn.executemany("UPDATE chunks SET row = ? WHERE id = ?", [
+                    (row, chunk_id) for row, (chunk_id, _) in enumerate(live)
+                ])
+            os.replace(scratch, self._vectors_path)
+            logger.info(f"Compacted local vector store from {self._rows} to {len(live)} rows")
+            self._rows = len(live)
+            self._matrix = None
+            self._graph = None
+            if os.path.exists(self._graph_path):
+                os.remove(self._graph_path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._graph is not None:
+                self._graph.save_index(self._graph_path)
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('graph_rows', ?)", (str(self._rows),)
+                    )
+            self._conn.close()
+            # Closing the file releases the flock
+            self._lock_file.close()
+
+    def _write(self, chunk_id: str, row: int, properties: Dict[str, Any]) -> None:
+        """Store a chunk's properties with the rows filters and lookups use"""
+        properties = dict(properties)
+        bands = properties.pop("lsh_bands", None)
+        self._conn.execute("""
+            INSERT OR REPLACE INTO chunks (id, row, doc_id, search_id, chunk_id, chunk_hash, properties)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            chunk_id, row, properties.get("doc_id"), properties.get("search_id"), properties.get("chunk_id"),
+            properties.get("chunk_hash"), json.dumps(properties)
+        ))
+        self._conn.execute("DELETE FROM owners WHERE chunk = ?", (chunk_id,))
+        owners = properties.get("doc_ids") or [properties.get("search_id")]
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO owners (doc_id, chunk) VALUES (?, ?)",
+            [(owner, chunk_id) for owner in owners if owner]
+        )
+        if bands is not None:
+            self._conn.execute("DELETE FROM bands WHERE chunk = ?", (chunk_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bands (band, chunk) VALUES (?, ?)", [(band, chunk_id) for band in bands]
+            )
+
+    def _remove(self, ids: Sequence[str]) -> None:
+        ids = json.dumps(list(ids))
+        for table, column in (("chunks", "id"), ("owners", "chunk"), ("bands", "chunk")):
+            self._conn.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))", (ids,))
+
+    def _chunks(self, ids: Iterable[str]):
+        """(id, row, properties) of the stored ones of ids"""
+        return [
+            (chunk_id, row, json.loads(properties))
+            for chunk_id, row, properties in self._conn.execute(
+                "SELECT id, row, properties FROM chunks WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(ids)),)
+            )
+        ]
+
+    def _rows_of(self, ids: Sequence[str]) -> List[int]:
+        return [row for (row,) in self._conn.execute(
+            "SELECT row FROM chunks WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),)
+        )]
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _vectors(self) -> np.ndarray:
+        """The vector file, mapped again whenever rows were added"""
+        if self._matrix is None or len(self._matrix) != self._rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=VECTOR_DTYPE, mode="r", shape=(self._rows, self.dim))
+        return self._matrix
+
+    def _load_graph(self):
+        """HNSW graph over every row, None without hnswlib"""
+        if self._graph is not None:
+            return self._graph
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; large local searches are exact")
+            self._graph_unavailable = True
+            return None
+        graph = hnswlib.Index(space="cosine", dim=self.dim)
+        if os.path.exists(self._graph_path) and self._meta("graph_rows") == str(self._rows):
+            graph.load_index(self._graph_path, max_elements=max(2 * self._rows, 1024))
+        else:
+            graph.init_index(
+                max_elements=max(2 * self._rows, 1024), M=self.hnsw_m, ef_construction=self.hnsw_ef_construction
+            )
+            graph.add_items(self._vectors(), np.arange(self._rows))
+            live = {row for (row,) in self._conn.execute("SELECT row FROM chunks")}
+            for row in set(range(self._rows)) - live:
+                graph.mark_deleted(row)
+            logger.info(f"Built HNSW graph over {self._rows} local vectors")
+        self._graph = graph
+        return graph
+
+    def _grow_graph(self, added: int) -> None:
+        if self._rows > self._graph.get_max_elements():
+            self._graph.resize_index(max(2 * self._rows, self._graph.get_max_elements() + added))
+
+    def _compact_if_sparse(self) -> None:
+        (live,) = self._conn.execute("SELECT count(*) FROM chunks").fetchone()
+        if self._rows >= _COMPACT_MIN_ROWS and self._rows - live > _COMPACT_RATIO * self._rows:
+            self.compact()
+
+
+class LocalSearcher(BaseSearcher):
+    """Searches a LocalChunkStore off the event loop; closing it closes the store"""
+
+    def __init__(self, store: LocalChunkStore):
+        self.store = store
+
+    async def search(
+        self,
+        vector: np.ndarray,
+        doc_ids: Sequence[str],
+        limit: int,
+        query: Optional[str] = None,
+        alpha: float = 1.0,
+        tenant: Optional[str] = None
+    ) -> List[SearchHit]:
+        # A single node keeps every user's chunks together; there are no tenants
+        return await asyncio.to_thread(self.store.search, vector, doc_ids, limit, query, alpha)
+
+    async def delete_document(self, doc_id: str, tenant: Optional[str] = None) -> None:
+        deleted = await asyncio.to_thread(self.store.delete_document, doc_id)
+        logger.info(f"Deleted {deleted} chunks of {doc_id}")
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.store.close)
+
+
+def create_local_store() -> LocalChunkStore:
+    return LocalChunkStore(
+        settings.LOCAL_VECTOR_STORE_PATH,
+        exact_limit=settings.LOCAL_VECTOR_STORE_EXACT_LIMIT,
+        hnsw_m=settings.LOCAL_VECTOR_STORE_HNSW_M,
+        hnsw_ef=settings.LOCAL_VECTOR_STORE_HNSW_EF
+    )
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.where(norms == 0, 1, norms), dtype=VECTOR_DTYPE)
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _scaled(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+def _rerank(hits: List[SearchHit], query: str, alpha: float) -> List[SearchHit]:
+    """Fuse vector scores with the share of the query's words each hit contains"""
+    if not hits:
+        return hits
+    words = set(_WORDS.findall(query.lower()))
+    keyword = np.array([
+        len(words & set(_WORDS.findall(hit.text.lower()))) / max(len(words), 1) for hit in hits
+    ])
+    vector = np.array([hit.score for hit in hits])
+    fused = alpha * _scaled(vector) + (1 - alpha) * _scaled(keyword)
+    for hit, score in zip(hits, fused):
+        hit.score = float(score)
+    return sorted(hits, key=lambda hit: -hit.score)
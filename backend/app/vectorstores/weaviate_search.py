@@ -0,0 +1,85 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+from weaviate.classes.query import Filter, MetadataQuery
+
+from app.utils.logger import setup_logger
+from app.vectorstores.base_store import BaseSearcher, SearchHit
+
+
+logger = setup_logger(__name__)
+
+# All a search result needs; nodes, relationships and vectors stay on the server
+_HIT_PROPERTIES = ["doc_id", "doc_ids", "chunk_id", "total_chunks"]
+
+
+class WeaviateSearcher(BaseSearcher):
+    """Searches a Weaviate collection over the async client's gRPC API.
+
+    Retrieval skips llama_index: it would fetch every property and the
+    vector of each hit and rebuild full TextNodes from them, only for the
+    caller to read a few fields. Here only those fields are requested, and
+    results come back as SearchHit records. Scoring matches
+    WeaviateVectorStore, which also runs a hybrid query, with alpha=1 for
+    pure vector search.
+    """
+
+    def __init__(self, client, index_name: str = "Documents", text_key: str = "text"):
+        self.client = client
+        self.index_name = index_name
+        self.text_key = text_key
+
+    async def search(
+        self,
+        vector: np.ndarray,
+        doc_ids: Sequence[str],
+        limit: int,
+        query: Optional[str] = None,
+        alpha: float = 1.0,
+        tenant: Optional[str] = None
+    ) -> List[SearchHit]:
+        """Chunks of the given documents closest to vector, best first.
+
+        With a query and alpha below 1, keyword matches on the query count
+        towards the score as well. On a multi-tenant collection only the
+        tenant's own, smaller, graph is searched.
+        """
+        collection = self._collection(tenant)
+        doc_ids = list(doc_ids)
+        result = await collection.query.hybrid(
+            query=query,
+            vector=vector,
+            alpha=alpha,
+            limit=limit,
+            # Chunks indexed before chunks could be shared have no doc_ids
+            filters=(
+                Filter.by_property("doc_ids").contains_any(doc_ids)
+                | Filter.by_property("search_id").contains_any(doc_ids)
+            ),
+            return_properties=[self.text_key, *_HIT_PROPERTIES],
+            return_metadata=MetadataQuery(score=True)
+        )
+        return [
+            SearchHit(
+                obj.properties.get(self.text_key) or "",
+                obj.properties.get("doc_id"),
+                obj.properties.get("doc_ids") or (),
+                obj.properties.get("chunk_id"),
+                obj.properties.get("total_chunks"),
+                obj.metadata.score
+            )
+            for obj in result.objects
+        ]
+
+    async def delete_document(self, doc_id: str, tenant: Optional[str] = None) -> None:
+        """Delete the chunks a document owns"""
+        collection = self._collection(tenant)
+        result = await collection.data.delete_many(where=Filter.by_property("doc_id").equal(doc_id))
+        logger.info(f"Deleted {result.successful} chunks of {doc_id}")
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def _collection(self, tenant: Optional[str]):
+        collection = self.client.collections.get(self.index_name)
+        return collection.with_tenant(tenant) if tenant else collection
@@ -0,0 +1,341 @@
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from weaviate.classes.query import Filter
+from weaviate.classes.tenants import Tenant
+
+from app.utils.exceptions import VectorStoreError
+from app.utils.logger import setup_logger
+from app.vectorstores.base_store import BaseChunkStore
+
+
+logger = setup_logger(__name__)
+
+# Objects addressed per request when working on lists of ids
+_ID_PAGE = 500
+# Weaviate's default QUERY_MAXIMUM_RESULTS: offset plus limit of a query can't go past it
+_QUERY_WINDOW = 10000
+# Near-duplicate candidates fetched per page of LSH band keys
+_CANDIDATE_LIMIT = 1000
+# What reassigning chunks between documents needs to know about them
+_OWNER_PROPERTIES = ["_node_content", "search_id", "doc_ids"]
+
+
+class WeaviateChunkStore(BaseChunkStore):
+    """Writes embedded chunks straight into a Weaviate collection.
+
+    Objects use the same property layout as llama_index's WeaviateVectorStore,
+    so they stay readable through it, but the vectors are passed to the client
+    as rows of one float32 matrix instead of being copied onto every node as a
+    list of Python floats first.
+
+    On a multi-tenant collection a store works on one tenant; see for_tenant.
+    """
+
+    def __init__(
+        self,
+        client,
+        index_name: str = "Documents",
+        text_key: str = "text",
+        tenant: Optional[str] = None,
+        batch_lock: Optional[threading.Lock] = None
+    ):
+        self.client = client
+        self.index_name = index_name
+        self.text_key = text_key
+        self.tenant = tenant
+        # The client keeps one batch (and its failed objects) at a time, so
+        # documents indexed concurrently take turns writing
+        self._batch_lock = batch_lock or threading.Lock()
+
+    def for_tenant(self, tenant: str) -> "WeaviateChunkStore":
+        """Store on a tenant of this multi-tenant collection, creating the tenant if needed"""
+        store = WeaviateChunkStore(self.client, self.index_name, self.text_key, tenant, self._batch_lock)
+        collection = self.client.collections.get(self.index_name)
+        if not collection.tenants.exists(tenant):
+            collection.tenants.create([Tenant(name=tenant)])
+            logger.info(f"Created tenant {tenant} in {self.index_name}")
+        return store
+
+    def set_tenant_status(self, tenants: Sequence[str], status) -> None:
+        """Activate, deactivate or offload tenants; a TenantActivityStatus"""
+        collection = self.client.collections.get(self.index_name)
+        collection.tenants.update([Tenant(name=tenant, activity_status=status) for tenant in tenants])
+
+    def tenants(self) -> Dict[str, Any]:
+        """Tenants of this multi-tenant collection with their activity status"""
+        return {
+            name: tenant.activity_status
+            for name, tenant in self.client.collections.get(self.index_name).tenants.get().items()
+        }
+
+    def add(
+        self,
+        nodes: Sequence[BaseNode],
+        embeddings: np.ndarray,
+        properties: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> List[str]:
+        """Insert nodes with embeddings[i] as the vector of nodes[i].
+
+        properties[i] are stored with nodes[i] next to its metadata, without
+        becoming part of the node llama_index reads back.
+        """
+        if len(nodes) != len(embeddings):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(nodes)} nodes")
+
+        with self._batch_lock:
+            with self.client.batch.dynamic() as batch:
+                for i, (node, vector) in enumerate(zip(nodes, embeddings)):
+                    batch.add_object(
+                        collection=self.index_name,
+                        properties={**self._properties(node), **(properties[i] if properties else {})},
+                        uuid=node.node_id,
+                        vector=vector,
+                        tenant=self.tenant
+                    )
+            failed = self.client.batch.failed_objects
+
+        if failed:
+            logger.error(f"Failed to insert {len(failed)} of {len(nodes)} chunks: {failed[0].message}")
+            raise VectorStoreError(f"Failed to insert {len(failed)} chunks into {self.index_name}")
+        return [node.node_id for node in nodes]
+
+    def update_chunks(self, updates: Mapping[str, Dict[str, Any]], ref_doc_id: Optional[str] = None) -> None:
+        """Set metadata fields per chunk id, optionally moving the chunks to another document.
+
+        llama_index rebuilds nodes from the serialized node in _node_content,
+        so the fields are updated there as well as in the flat properties.
+        Only the given properties are sent; vectors stay where they are.
+        Each object is one request, sent one after the other; callers split
+        large updates across their store threads.
+        """
+        collection = self._collection()
+        for obj in self._fetch(collection, list(updates), ["_node_content"]):
+            self._patch(collection, obj, updates[str(obj.uuid)], ref_doc_id)
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored metadata of chunks by id, without vectors; missing ids are left out"""
+        collection = self._collection()
+        return {
+            str(obj.uuid): json.loads(obj.properties["_node_content"])["metadata"]
+            for obj in self._fetch(collection, ids, ["_node_content"])
+        }
+
+    def legacy_documents(self) -> Iterator[Dict[str, Any]]:
+        """Documents as recorded on their first chunks before the document catalog existed"""
+        first_chunks = self._matching(
+            self._collection(),
+            Filter.by_property("chunk_id").equal(0),
+            lambda properties: properties.get("chunk_id") == 0,
+            ["search_id", "chunk_id", "filename", "file_size", "total_chunks", "users", "active"]
+        )
+        for obj in first_chunks:
+            yield {
+                "doc_id": obj.properties.get("search_id"),
+                "filename": obj.properties.get("filename"),
+                "file_size": obj.properties.get("file_size"),
+                "chunk_count": obj.properties.get("total_chunks"),
+                "users": obj.properties.get("users") or [],
+                "active": obj.properties.get("active", "true") == "true"
+            }
+
+    def chunk_hashes(self, doc_id: str) -> Dict[str, List[str]]:
+        """Ids of the chunks only this document uses, keyed by their chunk_hash"""
+        hashes: Dict[str, List[str]] = {}
+        chunks = self._matching(
+            self._collection(),
+            Filter.by_property("search_id").equal(doc_id),
+            lambda properties: properties.get("search_id") == doc_id,
+            ["search_id", "chunk_hash", "doc_ids"]
+        )
+        for obj in chunks:
+            if len(obj.properties.get("doc_ids") or []) > 1:
+                # Other documents use it too; see detach_document
+                continue
+            # Chunks indexed before chunk hashes were stored are listed
+            # under "", which no chunk hash matches
+            chunk_hash = obj.properties.get("chunk_hash") or ""
+            hashes.setdefault(chunk_hash, []).append(str(obj.uuid))
+        return hashes
+
+    def lsh_candidates(self, band_keys: Sequence[str], doc_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Chunks of the given documents that share any of the LSH band keys.
+
+        Returns the MinHash signature, chunk hash and owning document of each. First
+        chunks of documents stand for their document and are never shared,
+        so they are left out.
+        """
+        collection = self._collection()
+        found: Dict[str, Dict[str, Any]] = {}
+        keys = list(dict.fromkeys(band_keys))
+        for start in range(0, len(keys), _ID_PAGE):
+            result = collection.query.fetch_objects(
+                filters=(
+                    Filter.by_property("lsh_bands").contains_any(keys[start:start + _ID_PAGE])
+                    & Filter.by_property("doc_ids").contains_any(list(doc_ids))
+                    & Filter.by_property("chunk_id").greater_than(0)
+                ),
+                limit=_CANDIDATE_LIMIT,
+                return_properties=["minhash", "chunk_hash", "search_id"]
+            )
+            for obj in result.objects:
+                found[str(obj.uuid)] = {
+                    "minhash": np.asarray(obj.properties["minhash"], dtype=np.uint32),
+                    "chunk_hash": obj.properties.get("chunk_hash"),
+                    "search_id": obj.properties.get("search_id")
+                }
+        return found
+
+    def add_owner(self, ids: Sequence[str], doc_id: str) -> None:
+        """Make stored chunks part of another document as well"""
+        collection = self._collection()
+        # Read-modify-write of the owner lists; threads of this process take
+        # turns here, LlamaIndexService serializes processes with a lock
+        with self._batch_lock:
+            for obj in self._fetch(collection, ids, _OWNER_PROPERTIES):
+                owners = obj.properties.get("doc_ids") or [obj.properties["search_id"]]
+                self._patch(collection, obj, {"doc_ids": list(dict.fromkeys([*owners, doc_id]))})
+
+    def detach_document(self, doc_id: str) -> None:
+        """Take a document out of the chunks it shares with other documents.
+
+        Shared chunks it owns are handed over to the next document using
+        them. Afterwards every chunk left with the document belongs to it
+        alone and can be deleted with it.
+        """
+        collection = self._collection()
+        with self._batch_lock:
+            for obj in self._owned_by(collection, doc_id):
+                owners = [owner for owner in obj.properties.get("doc_ids") or [] if owner != doc_id]
+                if not owners:
+                    continue
+                if obj.properties.get("search_id") != doc_id:
+                    self._patch(collection, obj, {"doc_ids": owners})
+                else:
+                    self._patch(collection, obj, {"doc_ids": owners, "search_id": owners[0]}, ref_doc_id=owners[0])
+
+    def copy_document(self, doc_id: str, target: "WeaviateChunkStore") -> int:
+        """Copy a document's chunks with their vectors into another store; returns how many.
+
+        Copies belong to the document alone. Chunks the target already has,
+        because another document there shares them, get the document added
+        as an owner instead, so copying twice changes nothing.
+        """
+        objects = self._owned_by(self._collection(), doc_id, properties=None, include_vector=True)
+        if not objects:
+            return 0
+        target_collection = target._collection()
+        present = {
+            str(obj.uuid): obj
+            for obj in target._fetch(target_collection, [str(obj.uuid) for obj in objects], _OWNER_PROPERTIES)
+        }
+        with self._batch_lock:
+            for obj in present.values():
+                owners = obj.properties.get("doc_ids") or [obj.properties["search_id"]]
+                target._patch(target_collection, obj, {"doc_ids": list(dict.fromkeys([*owners, doc_id]))})
+            with self.client.batch.dynamic() as batch:
+                for obj in objects:
+                    if str(obj.uuid) in present:
+                        continue
+                    batch.add_object(
+                        collection=target.index_name,
+                        properties=self._owned_copy(obj.properties, doc_id),
+                        uuid=obj.uuid,
+                        vector=obj.vector["default"],
+                        tenant=target.tenant
+                    )
+            failed = self.client.batch.failed_objects
+        if failed:
+            logger.error(f"Failed to copy {len(failed)} chunks of {doc_id}: {failed[0].message}")
+            raise VectorStoreError(f"Failed to copy {len(failed)} chunks of {doc_id}")
+        return len(objects)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Delete chunks by id"""
+        collection = self._collection()
+        for start in range(0, len(ids), _ID_PAGE):
+            collection.data.delete_many(
+                where=Filter.by_id().contains_any(list(ids[start:start + _ID_PAGE]))
+            )
+
+    def _fetch(self, collection, ids: Sequence[str], properties: List[str]):
+        """Objects with the given ids, a page at a time"""
+        ids = list(ids)
+        for start in range(0, len(ids), _ID_PAGE):
+            page = ids[start:start + _ID_PAGE]
+            result = collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(page),
+                limit=len(page),
+                return_properties=properties
+            )
+            yield from result.objects
+
+    def _collection(self):
+        collection = self.client.collections.get(self.index_name)
+        return collection.with_tenant(self.tenant) if self.tenant else collection
+
+    def _owned_by(
+        self,
+        collection,
+        doc_id: str,
+        properties: Optional[List[str]] = _OWNER_PROPERTIES,
+        include_vector: bool = False
+    ) -> List[Any]:
+        """Chunks of the document and chunks of others it shares; properties=None fetches all"""
+        return list(self._matching(
+            collection,
+            Filter.by_property("search_id").equal(doc_id) | Filter.by_property("doc_ids").contains_any([doc_id]),
+            lambda properties: (
+                properties.get("search_id") == doc_id or doc_id in (properties.get("doc_ids") or [])
+            ),
+            properties,
+            include_vector
+        ))
+
+    def _matching(
+        self,
+        collection,
+        filters,
+        matches,
+        properties: Optional[List[str]],
+        include_vector: bool = False
+    ) -> Iterator[Any]:
+        """Objects matching filters, however many there are.
+
+        Filtered queries page by offset, which Weaviate stops at
+        QUERY_MAXIMUM_RESULTS, and its cursor can't be combined with a filter.
+        Past that window the collection is walked with the cursor instead and
+        matches, given an object's properties, stands in for filters. The
+        properties fetched must include those matches looks at.
+        """
+        seen = set()
+        for offset in range(0, _QUERY_WINDOW, _ID_PAGE):
+            limit = min(_ID_PAGE, _QUERY_WINDOW - offset)
+            result = collection.query.fetch_objects(
+                filters=filters,
+                limit=limit,
+                offset=offset,
+                return_properties=properties,
+                include_vector=include_vector
+            )
+            for obj in result.objects:
+                seen.add(str(obj.uuid))
+                yield obj
+            if len(result.objects) < limit:
+                return
+        objects = collection.iterator(
+            include_vector=include_vector, return_properties=properties, cache_size=_ID_PAGE
+        )
+        for obj in objects:
+            if str(obj.uuid) not in seen and matches(obj.properties):
+                yield obj
+
+    def _patch(self, collection, obj, metadata: Dict[str, Any], ref_doc_id: Optional[str] = None) -> None:
+        """Update a fetched object's metadata in its flat properties and _node_content"""
+        collection.data.update(
+            uuid=obj.uuid,
+            properties=self._patched(obj.properties["_node_content"], metadata, ref_doc_id)
+        )
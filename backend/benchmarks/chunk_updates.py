@@ -0,0 +1,96 @@
+"""Compare in-place metadata updates with deleting and re-adding a document's chunks.
+
+Indexes one synthetic document into a scratch collection of a running
+Weaviate, then tags every chunk twice: once the old way, deleting the
+chunks and adding them again with their vectors, and once through
+WeaviateChunkStore.update_chunks, which patches the changed properties of
+each object and leaves its vector alone. Chunk ids are the deterministic
+ones ingestion uses, so both paths address the same objects. Run from the
+backend directory against a disposable Weaviate:
+
+    python -m benchmarks.chunk_updates --host localhost --chunks 2000 --dim 384
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import weaviate
+from llama_index.core.schema import TextNode
+from weaviate.classes.config import Configure, DataType, Property
+
+from app.services.index_service import chunk_uuid
+from app.vectorstores import WeaviateChunkStore
+
+
+COLLECTION = "BenchChunkUpdates"
+WORDS = (
+    "invoice contract customer subscription payment address installation "
+    "rate plan charge monthly annual service network router fiber support"
+).split()
+
+
+def synthetic_nodes(count: int, doc_id: str, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        TextNode(
+            id_=chunk_uuid(doc_id, i),
+            text=" ".join(rng.choices(WORDS, k=rng.randint(50, 200))),
+            metadata={"doc_id": doc_id, "search_id": doc_id, "chunk_id": i, "total_chunks": count}
+        )
+        for i in range(count)
+    ]
+
+
+def main(args):
+    client = weaviate.connect_to_local(host=args.host, port=args.port, grpc_port=args.grpc_port)
+    try:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.collections.create(
+            name=COLLECTION,
+            properties=[Property(name="text", data_type=DataType.TEXT)],
+            vectorizer_config=Configure.Vectorizer.none()
+        )
+        store = WeaviateChunkStore(client, index_name=COLLECTION)
+        nodes = synthetic_nodes(args.chunks, "bench-doc")
+        ids = [node.node_id for node in nodes]
+        embeddings = np.random.default_rng(0).random((args.chunks, args.dim), dtype=np.float32)
+        store.add(nodes, embeddings)
+
+        # The old way: the vectors travel again with every change
+        start = time.perf_counter()
+        for node in nodes:
+            node.metadata["tags"] = ["reindexed"]
+        store.delete(ids)
+        store.add(nodes, embeddings)
+        readd = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.update_chunks({chunk_id: {"tags": ["patched"]} for chunk_id in ids})
+        patch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stored = store.get(ids)
+        fetch = time.perf_counter() - start
+        assert all(metadata["tags"] == ["patched"] for metadata in stored.values())
+
+        vector_bytes = embeddings.nbytes
+        print(f"{args.chunks} chunks, {args.dim}-dim vectors ({vector_bytes / 2**20:.1f} MiB)")
+        print(f"  delete + re-add : {readd:.2f}s  (re-sends all vectors)")
+        print(f"  partial update  : {patch:.2f}s  (no vectors sent)  {readd / patch:.1f}x")
+        print(f"  batch fetch     : {fetch:.2f}s")
+    finally:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--grpc-port", type=int, default=50051)
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks in the synthetic document")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    main(parser.parse_args())
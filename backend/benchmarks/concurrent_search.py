@@ -0,0 +1,118 @@
+"""Measure search latency under concurrent load with the sync and the async Weaviate client.
+
+Fills a scratch collection of a running Weaviate with random vectors, then
+runs the same concurrent search load twice through llama_index's
+WeaviateVectorStore: once calling the sync client's query from coroutines,
+as LlamaIndexService used to, and once awaiting the async client's aquery.
+Alongside the searches a probe coroutine stands in for unrelated requests
+and records how late it gets to run; with the sync client it waits behind
+every search's network round trip. Run from the backend directory against
+a disposable Weaviate:
+
+    python -m benchmarks.concurrent_search --host localhost --objects 20000 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+import weaviate
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from llama_index.vector_stores.weaviate import WeaviateVectorStore
+from weaviate.classes.config import Configure, DataType, Property
+
+COLLECTION = "BenchConcurrentSearch"
+
+
+def percentiles(samples: List[float]) -> str:
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms"
+
+
+async def probe(stop: asyncio.Event, lags: List[float], interval: float = 0.005):
+    """Sleep in short steps and record how much later than asked each wake-up comes"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_load(search, queries: np.ndarray, concurrency: int):
+    latencies: List[float] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(stop, lags))
+    position = iter(range(len(queries)))
+
+    async def worker():
+        for i in position:
+            start = time.perf_counter()
+            await search(queries[i])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+    return latencies, lags, elapsed
+
+
+async def main(args):
+    params = dict(host=args.host, port=args.port, grpc_port=args.grpc_port)
+    client = weaviate.connect_to_local(**params)
+    aclient = weaviate.use_async_with_local(**params)
+    await aclient.connect()
+    rng = np.random.default_rng(0)
+    try:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.collections.create(
+            name=COLLECTION,
+            properties=[Property(name="text", data_type=DataType.TEXT)],
+            vectorizer_config=Configure.Vectorizer.none()
+        )
+        vectors = rng.random((args.objects, args.dim), dtype=np.float32)
+        with client.batch.dynamic() as batch:
+            for i, vector in enumerate(vectors):
+                batch.add_object(collection=COLLECTION, properties={"text": f"object {i}"}, vector=vector)
+
+        sync_store = WeaviateVectorStore(weaviate_client=client, index_name=COLLECTION, text_key="text")
+        async_store = WeaviateVectorStore(weaviate_client=aclient, index_name=COLLECTION, text_key="text")
+        queries = rng.random((args.queries, args.dim), dtype=np.float32)
+
+        def request(vector):
+            return VectorStoreQuery(query_embedding=vector.tolist(), similarity_top_k=args.top_k)
+
+        async def sync_search(vector):
+            return sync_store.query(request(vector))
+
+        async def async_search(vector):
+            return await async_store.aquery(request(vector))
+
+        print(f"{args.queries} searches over {args.objects} objects, {args.concurrency} at a time")
+        for name, search in (("sync client ", sync_search), ("async client", async_search)):
+            await search(queries[0])  # warm-up
+            latencies, lags, elapsed = await run_load(search, queries, args.concurrency)
+            print(f"  {name}: {len(latencies) / elapsed:7.1f} searches/s")
+            print(f"    search latency       {percentiles(latencies)}")
+            print(f"    other requests delay {percentiles(lags)}")
+    finally:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.close()
+        await aclient.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--grpc-port", type=int, default=50051)
+    parser.add_argument("--objects", type=int, default=20000, help="Vectors in the scratch collection")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--queries", type=int, default=2000, help="Searches per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Searches in flight at once")
+    parser.add_argument("--top-k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
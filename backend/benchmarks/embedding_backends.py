@@ -0,0 +1,119 @@
+"""Compare embedding backends on latency, throughput and agreement.
+
+Runs the current PyTorch backend and the ONNX Runtime backend (fp32 and
+int8) over the same texts and reports single-text latency, batched
+throughput and cosine agreement with the PyTorch vectors. Run from the
+backend directory:
+
+    python -m benchmarks.embedding_backends --texts 512 --threads 4
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from app.core.config import settings
+from app.embeddings.base_embedder import BaseEmbedder
+from app.embeddings.local_embedder import LocalEmbedder, create_embedding_model
+from app.embeddings.onnx_embedder import OnnxEmbedder
+
+
+WORDS = (
+    "invoice contract customer subscription payment address installation "
+    "rate plan charge monthly annual service network router fiber support "
+    "ticket outage refund policy agreement termination notice period data "
+    "privacy document upload search question answer model latency"
+).split()
+
+
+def synthetic_texts(count: int, seed: int = 42) -> List[str]:
+    """Chunk-like texts with a realistic spread of lengths"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(8, 300))) for _ in range(count)]
+
+
+def load_texts(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def measure(embedder: BaseEmbedder, texts: List[str], batch_size: int, latency_runs: int):
+    await embedder.initialize()
+    await embedder.embed_batch(texts[:batch_size])  # warm-up
+
+    latencies = []
+    for text in texts[:latency_runs]:
+        start = time.perf_counter()
+        await embedder.embed_batch([text])
+        latencies.append(time.perf_counter() - start)
+
+    vectors = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        vectors.append(await embedder.embed_batch(texts[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+
+    await embedder.close()
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "texts_per_sec": len(texts) / elapsed,
+        "vectors": np.vstack(vectors)
+    }
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray):
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.sum(reference * candidate, axis=1)
+    return float(cosines.mean()), float(cosines.min())
+
+
+async def main(args):
+    if args.cache_dir:
+        settings.EMBEDDING_MODEL_CACHE = args.cache_dir
+    settings.EMBED_BATCH_SIZE = args.batch_size
+    texts = load_texts(args.corpus) if args.corpus else synthetic_texts(args.texts)
+
+    backends = {"pytorch": LocalEmbedder(create_embedding_model())}
+    for quantize in (False, True):
+        name = "onnx-int8" if quantize else "onnx-fp32"
+        backends[name] = OnnxEmbedder(
+            model_name=settings.EMBEDDING_MODEL,
+            model_dir=args.onnx_dir,
+            cache_folder=settings.EMBEDDING_MODEL_CACHE,
+            quantize=quantize,
+            intra_op_threads=args.threads
+        )
+
+    results = {}
+    for name, embedder in backends.items():
+        print(f"Running {name}...")
+        results[name] = await measure(embedder, texts, args.batch_size, args.latency_runs)
+
+    reference = results["pytorch"]["vectors"]
+    print(f"\n{len(texts)} texts, batch size {args.batch_size}, ONNX intra-op threads {args.threads or 'auto'}\n")
+    print(f"{'backend':<10} {'p50 ms':>9} {'p95 ms':>9} {'texts/s':>9} {'cos mean':>9} {'cos min':>9}")
+    for name, result in results.items():
+        mean, minimum = cosine_agreement(reference, result["vectors"])
+        print(
+            f"{name:<10} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['texts_per_sec']:>9.1f} {mean:>9.4f} {minimum:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=256, help="Number of synthetic texts")
+    parser.add_argument("--corpus", help="File with one text per line instead of synthetic texts")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=50, help="Single-text requests timed for latency")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = auto)")
+    parser.add_argument("--onnx-dir", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--cache-dir", help="Override EMBEDDING_MODEL_CACHE")
+    asyncio.run(main(parser.parse_args()))
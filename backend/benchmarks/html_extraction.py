@@ -0,0 +1,105 @@
+"""Compare chunk counts and ingest time of HTML pages with and without text extraction.
+
+The old path chunked the raw page, markup, scripts and styles included, as
+if it were a text file. The new path extracts the readable text first. Both
+are chunked with the same node parser as LlamaIndexService; with --embed
+the chunks are also embedded with the configured embedder, which is where
+most of the ingest time goes. Pages are read from files or URLs; without
+any, a synthetic page with typical site chrome is used. Run from the
+backend directory:
+
+    python -m benchmarks.html_extraction saved/*.html https://example.com/docs --embed
+"""
+import argparse
+import asyncio
+import random
+import time
+import urllib.request
+from typing import Callable, Iterator, List, Tuple
+
+from llama_index.core import Document
+from llama_index.core.node_parser import SimpleNodeParser
+
+from app.services.index_service import create_embedder
+from app.utils.document_utils import Segment, iter_html_blocks, iter_text_blocks
+
+
+WORDS = (
+    "invoice contract customer subscription payment address installation "
+    "rate plan charge monthly annual service network router fiber support "
+    "ticket outage refund policy agreement termination notice period data"
+).split()
+
+
+def synthetic_page(paragraphs: int = 60, seed: int = 42) -> bytes:
+    """An article wrapped in the navigation, scripts and styles of a typical site"""
+    rng = random.Random(seed)
+    links = "".join(f'<li><a href="/section/{i}">{rng.choice(WORDS).title()}</a></li>' for i in range(80))
+    style = "\n".join(f".c{i} {{ margin: {i}px; padding: {i}px; color: #{i:06x}; }}" for i in range(300))
+    script = "\n".join(f"window.dataLayer.push({{event: 'e{i}', value: {i}}});" for i in range(300))
+    article = "".join(f"<p>{' '.join(rng.choices(WORDS, k=60))}</p>" for _ in range(paragraphs))
+    page = (
+        f"<html><head><style>{style}</style><script>{script}</script></head><body>"
+        f"<header><nav><ul>{links}</ul></nav></header>"
+        f"<div class='layout'><aside><ul>{links}</ul></aside><article><h1>Service guide</h1>{article}</article></div>"
+        f"<footer><ul>{links}</ul><p>Copyright</p></footer></body></html>"
+    )
+    return page.encode()
+
+
+def load_page(source: str) -> bytes:
+    if source.startswith(("http://", "https://")):
+        request = urllib.request.Request(source, headers={"User-Agent": "Mozilla/5.0"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def chunk(blocks: Callable[[bytes], Iterator[Segment]], page: bytes, parser) -> Tuple[List[str], float]:
+    start = time.perf_counter()
+    text = "\n".join(block for block, _ in blocks(page))
+    nodes = parser.get_nodes_from_documents([Document(text=text)])
+    return [node.text for node in nodes], time.perf_counter() - start
+
+
+async def embed(embedder, texts: List[str]) -> float:
+    start = time.perf_counter()
+    for first in range(0, len(texts), 64):
+        await embedder.embed_batch(texts[first:first + 64])
+    return time.perf_counter() - start
+
+
+async def main(args):
+    pages = [(source, load_page(source)) for source in args.pages] or [("synthetic", synthetic_page())]
+    parser = SimpleNodeParser.from_defaults(chunk_size=512, chunk_overlap=50)
+    embedder = None
+    if args.embed:
+        embedder = create_embedder()
+        await embedder.initialize()
+
+    print(f"{'page':<40} {'path':<9} {'chunks':>7} {'chunk s':>9} {'embed s':>9}")
+    totals = {"raw": [0, 0.0], "extracted": [0, 0.0]}
+    try:
+        for source, page in pages:
+            for path, blocks in (("raw", iter_text_blocks), ("extracted", iter_html_blocks)):
+                texts, chunk_time = chunk(blocks, page, parser)
+                embed_time = await embed(embedder, texts) if embedder else 0.0
+                totals[path][0] += len(texts)
+                totals[path][1] += chunk_time + embed_time
+                print(f"{source[-40:]:<40} {path:<9} {len(texts):>7} {chunk_time:>9.3f} {embed_time:>9.3f}")
+    finally:
+        if embedder:
+            await embedder.close()
+
+    raw_chunks, raw_time = totals["raw"]
+    chunks, elapsed = totals["extracted"]
+    print(f"\n{chunks} chunks instead of {raw_chunks} ({1 - chunks / max(raw_chunks, 1):.0%} fewer), "
+          f"ingest time {elapsed:.2f}s instead of {raw_time:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="HTML files or URLs")
+    parser.add_argument("--embed", action="store_true", help="Also embed the chunks with the configured embedder")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+"""Measure memory and allocations of the ingest path for one large document.
+
+Compares the old path, where every embedding became a list of Python floats
+attached to its node before llama_index built the Weaviate objects, with the
+float32 matrix path used by LlamaIndexService._embed_texts and
+WeaviateChunkStore. A synthetic embedder stands in for the model and a fake
+batch client keeps every object it is handed (as the Weaviate client does
+until it flushes), so the numbers reflect the data path rather than model or
+network work. Run from the backend directory:
+
+    python -m benchmarks.ingest_memory --chunks 20000 --dim 384
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from typing import List
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.weaviate.utils import get_data_object
+
+from app.core.config import settings
+from app.embeddings.base_embedder import BaseEmbedder
+from app.services.index_service import LlamaIndexService
+from app.vectorstores import WeaviateChunkStore
+
+
+class SyntheticEmbedder(BaseEmbedder):
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rng = np.random.default_rng(0)
+
+    @property
+    def model_id(self) -> str:
+        return f"synthetic-{self.dim}"
+
+    async def initialize(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+
+
+class RecordingBatch:
+    def __init__(self, sink: list):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_object(self, collection, properties, uuid, vector):
+        self.sink.append((properties, uuid, vector))
+
+
+class RecordingClient:
+    """Stands in for weaviate.WeaviateClient, holding objects like an unflushed batch"""
+
+    def __init__(self):
+        self.objects = []
+        self.batch = self
+        self.failed_objects = []
+
+    def dynamic(self):
+        return RecordingBatch(self.objects)
+
+
+def make_nodes(count: int) -> List[TextNode]:
+    return [
+        TextNode(text=f"chunk {i} " + "lorem ipsum dolor sit amet " * 20, metadata={"chunk_id": i})
+        for i in range(count)
+    ]
+
+
+async def list_path(embedder: BaseEmbedder, nodes: List[TextNode], client: RecordingClient):
+    """The ingest path before embeddings were kept as float32 matrices"""
+    texts = [node.text for node in nodes]
+    batch_size = settings.EMBED_BATCH_SIZE
+    for start in range(0, len(texts), batch_size):
+        vectors = (await embedder.embed_batch(texts[start:start + batch_size])).tolist()
+        for node, vector in zip(nodes[start:start + batch_size], vectors):
+            node.embedding = vector
+    with client.batch.dynamic() as batch:
+        for node in nodes:
+            data_object = get_data_object(node=node, text_key="text")
+            batch.add_object("Documents", data_object.properties, data_object.uuid, data_object.vector)
+
+
+async def matrix_path(embedder: BaseEmbedder, nodes: List[TextNode], client: RecordingClient):
+    """The current ingest path through LlamaIndexService"""
+    service = LlamaIndexService.__new__(LlamaIndexService)
+    service.embedder = embedder
+    service.embedding_cache = None
+    service.chunk_store = WeaviateChunkStore(client)
+    await service._add_nodes(nodes)
+
+
+def measure(path, args):
+    nodes = make_nodes(args.chunks)
+    embedder = SyntheticEmbedder(args.dim)
+    client = RecordingClient()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    asyncio.run(path(embedder, nodes, client))
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    return {
+        "seconds": elapsed,
+        "peak_mb": peak / 2**20,
+        "retained_mb": sum(stat.size_diff for stat in stats) / 2**20,
+        "retained_blocks": sum(stat.count_diff for stat in stats),
+    }
+
+
+def main(args):
+    settings.EMBED_BATCH_SIZE = args.batch_size
+    print(f"{args.chunks} chunks, {args.dim} dimensions, batch size {args.batch_size}\n")
+    print(f"{'path':<8} {'seconds':>9} {'peak MB':>9} {'kept MB':>9} {'kept blocks':>12} {'blocks/chunk':>13}")
+    for name, path in (("lists", list_path), ("float32", matrix_path)):
+        result = measure(path, args)
+        print(
+            f"{name:<8} {result['seconds']:>9.2f} {result['peak_mb']:>9.1f} {result['retained_mb']:>9.1f} "
+            f"{result['retained_blocks']:>12} {result['retained_blocks'] / args.chunks:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks in the synthetic document")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--batch-size", type=int, default=64)
+    main(parser.parse_args())
@@ -0,0 +1,107 @@
+"""Measure PDF text extraction throughput in pages/sec across process counts.
+
+Compares the previous single-threaded extraction (llama_index PDFReader
+over a temporary file) with the process pool extraction at increasing
+numbers of worker processes. Uses a synthetic PDF unless one is given.
+Run from the backend directory:
+
+    python -m benchmarks.pdf_extraction --pages 400 --workers 1 2 4 8
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.core.config import settings
+from app.utils import document_utils
+
+
+WORDS = (
+    "invoice contract customer subscription payment address installation "
+    "rate plan charge monthly annual service network router fiber support "
+    "ticket outage refund policy agreement termination notice period data"
+).split()
+
+
+def synthetic_pdf(pages: int, lines_per_page: int = 40, seed: int = 42) -> bytes:
+    """A PDF with lines_per_page lines of Helvetica text on every page"""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for _ in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        lines = " T* ".join(f"({' '.join(rng.choices(WORDS, k=12))}) Tj" for _ in range(lines_per_page))
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 10 Tf 14 TL 50 750 Td {lines} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def tempfile_baseline(data: bytes) -> float:
+    """Extraction as it was done before the pool: temp file, one page after another"""
+    from llama_index.readers.file.docs import PDFReader
+
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        temp_file.write(data)
+    try:
+        PDFReader().load_data(temp_file.name)
+    finally:
+        os.unlink(temp_file.name)
+    return time.perf_counter() - start
+
+
+def pooled(data: bytes, workers: int) -> float:
+    settings.EXTRACT_WORKERS = workers
+    document_utils.shutdown_extraction_pool()
+    # Start the worker processes outside the timed run
+    list(document_utils.iter_pdf_pages(synthetic_pdf(workers * settings.EXTRACT_PAGES_PER_TASK)))
+
+    start = time.perf_counter()
+    for _ in document_utils.iter_pdf_pages(data):
+        pass
+    return time.perf_counter() - start
+
+
+def main(args):
+    settings.EXTRACT_PAGES_PER_TASK = args.pages_per_task
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_pdf(args.pages)
+    pages = len(document_utils.PdfReader(io.BytesIO(data)).pages)
+
+    print(f"{pages} pages, {len(data) / 1024 / 1024:.1f}MB, {os.cpu_count()} CPUs, "
+          f"{args.pages_per_task} pages per task\n")
+    print(f"{'extraction':<16} {'seconds':>9} {'pages/s':>9} {'speedup':>9}")
+    baseline = tempfile_baseline(data)
+    print(f"{'tempfile':<16} {baseline:>9.2f} {pages / baseline:>9.1f} {1.0:>9.2f}")
+    for workers in args.workers:
+        elapsed = pooled(data, workers)
+        name = f"pool x{workers}"
+        print(f"{name:<16} {elapsed:>9.2f} {pages / elapsed:>9.1f} {baseline / elapsed:>9.2f}")
+    document_utils.shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200, help="Pages of the synthetic PDF")
+    parser.add_argument("--pdf", help="Extract this PDF instead of a synthetic one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=settings.EXTRACT_PAGES_PER_TASK)
+    main(parser.parse_args())
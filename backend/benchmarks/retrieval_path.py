@@ -0,0 +1,168 @@
+"""Compare the per-query CPU and allocations of llama_index retrieval with WeaviateSearcher.
+
+Both paths get the same hits as the Weaviate client hands them over. The
+llama_index path gets what WeaviateVectorStore asks for: every property,
+including the serialized node, and the vector. It rebuilds TextNodes with
+parse_query_result and then copies the fields LlamaIndexService returns.
+The lean path gets only those fields and builds SearchHit records. Client-
+side decoding of the larger llama_index responses is not timed here, so the
+bytes each path transfers are reported next to the timings. Run from the
+backend directory:
+
+    python -m benchmarks.retrieval_path --queries 2000 --top-k 5 --dim 384
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+from typing import Callable, List
+
+import numpy as np
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from llama_index.vector_stores.weaviate import WeaviateVectorStore
+
+from app.vectorstores import SearchHit, WeaviateChunkStore
+from app.vectorstores.weaviate_search import _HIT_PROPERTIES
+
+
+WORDS = (
+    "invoice contract customer subscription payment address installation "
+    "rate plan charge monthly annual service network router fiber support"
+).split()
+
+
+def stored_chunks(count: int, dim: int, seed: int = 42):
+    """Properties and vectors of chunks as ingestion stores them"""
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).random((count, dim), dtype=np.float32)
+    store = WeaviateChunkStore(client=None)
+    chunks = []
+    for i in range(count):
+        doc_id = f"doc-{i // 20}"
+        node = TextNode(
+            text=" ".join(rng.choices(WORDS, k=rng.randint(60, 120))),
+            metadata={
+                "doc_id": doc_id, "search_id": doc_id, "doc_ids": [doc_id], "filename": f"{doc_id}.pdf",
+                "file_size": 123456, "chunk_id": i % 20, "total_chunks": 20, "chunk_hash": uuid.uuid4().hex * 2,
+            },
+            relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)}
+        )
+        chunks.append((str(uuid.uuid4()), store._properties(node), vectors[i].tolist()))
+    return chunks
+
+
+def llama_index_results(chunks, top_k: int):
+    # parse_query_result pops from the entries, so each query gets fresh ones
+    return SimpleNamespace(objects=[
+        SimpleNamespace(
+            uuid=chunk_id, properties=dict(properties), vector={"default": vector},
+            metadata=SimpleNamespace(score=0.5, distance=0.5)
+        )
+        for chunk_id, properties, vector in chunks[:top_k]
+    ])
+
+
+def lean_results(chunks, top_k: int):
+    wanted = ["text", *_HIT_PROPERTIES]
+    return SimpleNamespace(objects=[
+        SimpleNamespace(properties={key: properties.get(key) for key in wanted}, metadata=SimpleNamespace(score=0.5))
+        for _, properties, _ in chunks[:top_k]
+    ])
+
+
+def llama_index_path(store: WeaviateVectorStore, query: VectorStoreQuery):
+    def run(result):
+        parsed = store.parse_query_result(result, query)
+        return [
+            {
+                "text": node.text,
+                "similarity_score": score,
+                "chunk_id": node.metadata.get("chunk_id"),
+                "total_chunks": node.metadata.get("total_chunks"),
+                "doc_ids": node.metadata.get("doc_ids"),
+            }
+            for node, score in zip(parsed.nodes, parsed.similarities)
+        ]
+    return run
+
+
+def lean_path(result):
+    hits = [
+        SearchHit(
+            obj.properties.get("text") or "",
+            obj.properties.get("doc_id"),
+            obj.properties.get("doc_ids") or (),
+            obj.properties.get("chunk_id"),
+            obj.properties.get("total_chunks"),
+            obj.metadata.score
+        )
+        for obj in result.objects
+    ]
+    return [
+        {
+            "text": hit.text,
+            "similarity_score": hit.score,
+            "chunk_id": hit.chunk_id,
+            "total_chunks": hit.total_chunks,
+            "doc_ids": hit.owners,
+        }
+        for hit in hits
+    ]
+
+
+def measure(run: Callable, results: List):
+    start = time.process_time()
+    for result in results:
+        run(result)
+    cpu = (time.process_time() - start) / len(results)
+
+    # Peak memory a single query allocates on top of its input
+    peaks = []
+    tracemalloc.start()
+    for result in results[:200]:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run(result)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return cpu, sum(peaks) / len(peaks)
+
+
+def payload_bytes(result) -> int:
+    size = 0
+    for obj in result.objects:
+        size += len(json.dumps(obj.properties))
+        vector = getattr(obj, "vector", None)
+        if vector:
+            size += 4 * len(vector["default"])
+    return size
+
+
+def main(args):
+    chunks = stored_chunks(max(args.top_k, 20), args.dim)
+    store = WeaviateVectorStore.model_construct(text_key="text")
+    store._is_self_created_weaviate_client = False
+    query = VectorStoreQuery(similarity_top_k=args.top_k)
+
+    old_bytes = payload_bytes(llama_index_results(chunks, args.top_k))
+    new_bytes = payload_bytes(lean_results(chunks, args.top_k))
+    old = measure(llama_index_path(store, query), [llama_index_results(chunks, args.top_k) for _ in range(args.queries)])
+    new = measure(lean_path, [lean_results(chunks, args.top_k) for _ in range(args.queries)])
+
+    print(f"top {args.top_k} of {args.dim}-dim chunks, {args.queries} queries")
+    for name, (cpu, peak), size in (("llama_index", old, old_bytes), ("lean", new, new_bytes)):
+        print(f"  {name:12s} {cpu * 1e6:8.1f} us CPU/query  {peak / 1024:6.1f} KiB allocated/query  "
+              f"~{size / 1024:.1f} KiB transferred/query")
+    print(f"  CPU saved per query: {(1 - new[0] / old[0]) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    main(parser.parse_args())
@@ -0,0 +1,210 @@
+"""Sweep HNSW, filter-strategy and compression settings for recall@k, QPS and memory.
+
+Builds a scratch collection of a running Weaviate from a synthetic
+corpus for every combination of neighbour count, ef_construction and
+compression, with the index config LlamaIndexService would create from
+those settings. On each it runs the same queries for every search ef and
+filter strategy, changed in place as the app does at startup. Each query
+is filtered to a share of the documents, like a user's active ones, and
+is run unfiltered too. Recall@k is measured against exact cosine top-k
+over the vectors the filter allows. QPS comes from the async client with
+--concurrency searches in flight.
+
+Memory is read from Weaviate's Prometheus endpoint when --metrics-url is
+given (PROMETHEUS_MONITORING_ENABLED=true), as the growth in Go heap in use
+after building. An estimate of vectors plus layer-0 links is printed
+alongside. PQ only compresses once a collection has 100000 objects, so
+keep --objects at least that high when sweeping it. Run from the backend
+directory against a disposable Weaviate:
+
+    python -m benchmarks.vector_index_sweep --objects 100000 --dim 384 \\
+        --max-connections 32,64 --ef 64,128,256 --compression none,pq,bq,sq --filter-strategy sweeping,acorn
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+import numpy as np
+import weaviate
+from weaviate.classes.config import Configure, DataType, Property, Tokenization
+from weaviate.classes.query import Filter
+
+from app.core.config import settings
+from app.utils.weaviate_client import update_vector_index, vector_index_config
+
+COLLECTION = "BenchVectorIndexSweep"
+# Bytes per vector kept in memory; PQ uses one byte per segment, a quarter of the dimensions by default
+VECTOR_BYTES = {"none": lambda dim: 4 * dim, "sq": lambda dim: dim, "bq": lambda dim: dim / 8, "pq": lambda dim: dim / 4}
+
+
+def corpus(objects: int, dim: int, docs: int, clusters: int, seed: int = 0):
+    """Unit vectors in topical clusters; each document's chunks stay close to one topic"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    doc_topics = rng.integers(0, clusters, docs)
+    doc_of = np.arange(objects) * docs // objects
+    vectors = centers[doc_topics[doc_of]] + 0.6 * rng.standard_normal((objects, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, doc_of
+
+
+def workload(vectors: np.ndarray, doc_of: np.ndarray, docs: int, queries: int, share: float, seed: int = 1):
+    """Queries near stored chunks, each with the documents it may search, its own among them"""
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, len(vectors), queries)
+    query_vectors = vectors[sources] + 0.3 * rng.standard_normal((queries, vectors.shape[1]), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    allowed = [
+        np.union1d(rng.choice(docs, max(1, int(docs * share)), replace=False), [doc_of[source]])
+        for source in sources
+    ]
+    return query_vectors, allowed
+
+
+def exact_top_k(vectors, doc_of, query_vectors, allowed, k: int):
+    unfiltered, filtered = [], []
+    for query, docs in zip(query_vectors, allowed):
+        scores = vectors @ query
+        unfiltered.append(set(np.argsort(-scores)[:k]))
+        scores[~np.isin(doc_of, docs)] = -np.inf
+        filtered.append(set(np.argsort(-scores)[:k]))
+    return unfiltered, filtered
+
+
+def heap_in_use(metrics_url: Optional[str]) -> Optional[float]:
+    if not metrics_url:
+        return None
+    with urllib.request.urlopen(metrics_url) as response:
+        for line in response.read().decode().splitlines():
+            if line.startswith("go_memstats_heap_inuse_bytes "):
+                return float(line.split()[1])
+    return None
+
+
+def build(client, vectors: np.ndarray, doc_of: np.ndarray):
+    client.collections.create(
+        name=COLLECTION,
+        properties=[
+            Property(name="index", data_type=DataType.INT),
+            Property(name="doc_id", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+        ],
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=vector_index_config()
+    )
+    collection = client.collections.get(COLLECTION)
+    with client.batch.fixed_size(batch_size=500) as batch:
+        for i, vector in enumerate(vectors):
+            batch.add_object(
+                collection=COLLECTION, properties={"index": i, "doc_id": f"doc-{doc_of[i]}"}, vector=vector
+            )
+    if client.batch.failed_objects:
+        raise RuntimeError(f"{len(client.batch.failed_objects)} objects failed to import")
+    client.batch.wait_for_vector_indexing()
+    return collection
+
+
+async def run_queries(collection, query_vectors, allowed, k: int, concurrency: int, filtered: bool):
+    found: List[Optional[set]] = [None] * len(query_vectors)
+    position = iter(range(len(query_vectors)))
+
+    async def worker():
+        for i in position:
+            filters = Filter.by_property("doc_id").contains_any([f"doc-{d}" for d in allowed[i]]) if filtered else None
+            result = await collection.query.near_vector(
+                near_vector=query_vectors[i].tolist(), limit=k, filters=filters, return_properties=["index"]
+            )
+            found[i] = {obj.properties["index"] for obj in result.objects}
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return found, len(query_vectors) / (time.perf_counter() - start)
+
+
+def recall(found: List[set], truth: List[set], k: int) -> float:
+    return float(np.mean([len(f & t) / min(k, len(t)) for f, t in zip(found, truth) if t]))
+
+
+def apply(values: Dict[str, object]) -> None:
+    for name, value in values.items():
+        setattr(settings, name, value)
+
+
+async def main(args):
+    params = dict(host=args.host, port=args.port, grpc_port=args.grpc_port)
+    client = weaviate.connect_to_local(**params)
+    aclient = weaviate.use_async_with_local(**params)
+    await aclient.connect()
+    vectors, doc_of = corpus(args.objects, args.dim, args.docs, args.clusters)
+    query_vectors, allowed = workload(vectors, doc_of, args.docs, args.queries, args.filter_share)
+    truth_unfiltered, truth_filtered = exact_top_k(vectors, doc_of, query_vectors, allowed, args.top_k)
+    print(f"{args.objects} {args.dim}-dim vectors in {args.docs} documents, {args.queries} queries, "
+          f"top {args.top_k}, filters allow {args.filter_share:.0%} of documents, {args.concurrency} in flight")
+    print(f"{'M':>4} {'efC':>5} {'comp':>5} {'build s':>8} {'heap MiB':>9} {'est MiB':>8} {'ef':>5} {'filter':>9} "
+          f"{'recall':>7} {'QPS':>7} {'f.recall':>8} {'f.QPS':>7}")
+    try:
+        for max_connections, ef_construction, compression in itertools.product(
+            args.max_connections, args.ef_construction, args.compression
+        ):
+            apply(dict(
+                WEAVIATE_HNSW_MAX_CONNECTIONS=max_connections, WEAVIATE_HNSW_EF_CONSTRUCTION=ef_construction,
+                WEAVIATE_COMPRESSION=compression, WEAVIATE_HNSW_EF=args.ef[0],
+                WEAVIATE_FILTER_STRATEGY=args.filter_strategy[0]
+            ))
+            # Dropped before measuring, so the heap growth is this build's alone
+            if client.collections.exists(COLLECTION):
+                client.collections.delete(COLLECTION)
+            heap_before = heap_in_use(args.metrics_url)
+            start = time.perf_counter()
+            collection = build(client, vectors, doc_of)
+            build_time = time.perf_counter() - start
+            heap_after = heap_in_use(args.metrics_url)
+            heap = f"{(heap_after - heap_before) / 2**20:9.0f}" if heap_before is not None else f"{'-':>9}"
+            estimate = args.objects * (VECTOR_BYTES[compression](args.dim) + 2 * max_connections * 8) / 2**20
+            acollection = aclient.collections.get(COLLECTION)
+            for ef, strategy in itertools.product(args.ef, args.filter_strategy):
+                apply(dict(WEAVIATE_HNSW_EF=ef, WEAVIATE_FILTER_STRATEGY=strategy))
+                update_vector_index(collection)
+                await run_queries(acollection, query_vectors[:20], allowed, args.top_k, args.concurrency, True)
+                found, qps = await run_queries(acollection, query_vectors, allowed, args.top_k, args.concurrency, False)
+                ffound, fqps = await run_queries(acollection, query_vectors, allowed, args.top_k, args.concurrency, True)
+                print(f"{max_connections:>4} {ef_construction:>5} {compression:>5} {build_time:8.1f} {heap} "
+                      f"{estimate:8.0f} {ef:>5} {strategy:>9} {recall(found, truth_unfiltered, args.top_k):7.3f} "
+                      f"{qps:7.0f} {recall(ffound, truth_filtered, args.top_k):8.3f} {fqps:7.0f}")
+    finally:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.close()
+        await aclient.close()
+
+
+def integers(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def names(value: str) -> List[str]:
+    return value.split(",")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--grpc-port", type=int, default=50051)
+    parser.add_argument("--metrics-url", help="Weaviate Prometheus endpoint, e.g. http://localhost:2112/metrics")
+    parser.add_argument("--objects", type=int, default=100000, help="Vectors in the scratch collection")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents the vectors belong to")
+    parser.add_argument("--clusters", type=int, default=200, help="Topics the documents are about")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--filter-share", type=float, default=0.02, help="Share of documents a filtered query allows")
+    parser.add_argument("--concurrency", type=int, default=16, help="Searches in flight at once")
+    parser.add_argument("--max-connections", type=integers, default=[settings.WEAVIATE_HNSW_MAX_CONNECTIONS])
+    parser.add_argument("--ef-construction", type=integers, default=[settings.WEAVIATE_HNSW_EF_CONSTRUCTION])
+    parser.add_argument("--ef", type=integers, default=[-1, 64, 128, 256], help="Search ef values, -1 for dynamic")
+    parser.add_argument("--compression", type=names, default=["none", "pq", "bq", "sq"])
+    parser.add_argument("--filter-strategy", type=names, default=["sweeping", "acorn"])
+    asyncio.run(main(parser.parse_args()))
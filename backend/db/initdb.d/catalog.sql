@@ -0,0 +1,47 @@
+-- Document catalog: who has which document and whether it is searched.
+-- Kept out of the public schema, which is described to the LLM for SQL
+-- generation. Safe to run again; apply it by hand to databases created
+-- before it existed.
+CREATE SCHEMA IF NOT EXISTS catalog;
+
+CREATE TABLE IF NOT EXISTS catalog.documents (
+    doc_id VARCHAR(64) PRIMARY KEY,
+    file_size BIGINT NOT NULL DEFAULT 0,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS catalog.document_access (
+    doc_id VARCHAR(64) NOT NULL REFERENCES catalog.documents(doc_id) ON DELETE CASCADE,
+    user_id VARCHAR(255) NOT NULL,
+    filename VARCHAR(1024) NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    added_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (doc_id, user_id)
+);
+
+ALTER TABLE catalog.documents ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_document_access_user_id ON catalog.document_access(user_id);
+-- Listing pages walk these instead of sorting all of a user's documents
+CREATE INDEX IF NOT EXISTS idx_document_access_user_added
+    ON catalog.document_access(user_id, added_at, doc_id);
+CREATE INDEX IF NOT EXISTS idx_document_access_user_filename
+    ON catalog.document_access(user_id, filename, doc_id);
+
+-- Role generated SQL queries run as (POSTGRES_QUERY_ROLE): it reads the
+-- public schema and nothing else
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'sql_reader') THEN
+        CREATE ROLE sql_reader NOLOGIN;
+    END IF;
+END
+$$;
+GRANT sql_reader TO CURRENT_USER;
+REVOKE ALL ON SCHEMA catalog FROM PUBLIC;
+REVOKE ALL ON ALL TABLES IN SCHEMA catalog FROM sql_reader;
+GRANT USAGE ON SCHEMA public TO sql_reader;
+GRANT SELECT ON ALL TABLES IN SCHEMA public TO sql_reader;
+-- Tables created later, e.g. by the init scripts that run after this one
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT ON TABLES TO sql_reader;
@@ -54,9 +54,8 @@ async def initialize(self):
         pass
 
     async def index_document(self, content, filename, user_id):
-        # Create a simple doc id
-        unique_str = f"{filename}:{len(content)}"
-        doc_id = hashlib.md5(unique_str.encode()).hexdigest()
+        # Documents are identified by a hash of their content
+        doc_id = hashlib.sha256(content).hexdigest()
         
         self.documents[doc_id] = {
             "content": content,
@@ -72,6 +71,16 @@ async def get_user_documents(self, user_id):
             for key, doc in self.documents.items() if doc["user_id"] == user_id
         ]
 
+    async def list_documents(self, user_id, limit, cursor=None, sort="created_at", descending=False,
+                             active=None, search=None):
+        docs = [
+            doc for doc in await self.get_user_documents(user_id)
+            if active is None or doc["active"] == active
+        ]
+        start = int(cursor or 0)
+        next_cursor = str(start + limit) if start + limit < len(docs) else None
+        return docs[start:start + limit], next_cursor
+
     async def delete_document(self, doc_id, user_id):
         if doc_id in self.documents and self.documents[doc_id]["user_id"] == user_id:
             del self.documents[doc_id]
@@ -83,8 +92,8 @@ async def clear_user_documents(self, user_id):
             k: v for k, v in self.documents.items() if v["user_id"] != user_id
         }
 
-    async def update_document_status(self, doc_id, active):
-        if doc_id in self.documents:
+    async def update_document_status(self, doc_id, user_id, active):
+        if doc_id in self.documents and self.documents[doc_id]["user_id"] == user_id:
             self.documents[doc_id]["active"] = active
         else:
             raise Exception("Document not found")
@@ -93,6 +102,19 @@ async def close(self):
         # No cleanup needed for mock
         pass
 
+# Mock ingestion service that indexes uploads right away instead of queueing them
+class MockIngestionService:
+    def __init__(self, index_service):
+        self.index_service = index_service
+
+    async def submit(self, file, filename, user_id):
+        file.seek(0)
+        doc_id = await self.index_service.index_document(file.read(), filename, user_id)
+        return {"id": f"job-{doc_id}", "doc_id": doc_id, "status": "done"}
+
+    async def close(self):
+        pass
+
 # Mock LLM service for testing
 class MockLLMService:
     def __init__(self):
@@ -294,6 +316,7 @@ async def mock_get_instance():
         container = await original_get_instance()
         # Replace services with our mocks
         container.index_service = mock_index_service
+        container.ingestion_service = MockIngestionService(mock_index_service)
         container.qa_service = mock_qa_service
         container.llm_service = mock_llm_service
         container.cache_service = mock_cache_service
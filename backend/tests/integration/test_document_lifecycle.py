@@ -22,10 +22,10 @@ async def test_document_lifecycle_integration(client, auth_headers, sample_text_
         )
     
     # Print the response content to see the error details
-    if response.status_code != 200:
+    if response.status_code != 202:
         print(f"Error response: {response.text}")
     
-    assert response.status_code == 200
+    assert response.status_code == 202
     doc_data = response.json()
     assert "id" in doc_data
     doc_id = doc_data["id"]
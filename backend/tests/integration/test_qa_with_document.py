@@ -19,7 +19,7 @@ async def test_qa_with_document_context_integration(client, auth_headers, sample
             headers=auth_headers
         )
     
-    assert response.status_code == 200
+    assert response.status_code == 202
     doc_data = response.json()
     doc_id = doc_data["id"]
     
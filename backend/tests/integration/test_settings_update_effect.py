@@ -24,7 +24,7 @@ async def test_settings_update_effect_integration(client, auth_headers, sample_t
             headers=auth_headers
         )
     
-    assert response.status_code == 200
+    assert response.status_code == 202
     doc_data = response.json()
     doc_id = doc_data["id"]
     
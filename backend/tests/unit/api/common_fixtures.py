@@ -79,6 +79,10 @@ def __init__(self):
         self.documents = {}
 
     async def index_document(self, content, filename, user_id):
+        # Uploads arrive as spooled files that are closed after the request
+        if hasattr(content, "read"):
+            content.seek(0)
+            content = content.read()
         # Create a simple doc id
         doc_id = f"doc{len(self.documents) + 1}"
         self.documents[doc_id] = {
@@ -95,6 +99,18 @@ async def get_user_documents(self, user_id):
             for key, doc in self.documents.items() if doc["user_id"] == user_id
         ]
 
+    async def list_documents(self, user_id, limit, cursor=None, sort="created_at", descending=False,
+                             active=None, search=None):
+        docs = [
+            doc for doc in await self.get_user_documents(user_id)
+            if active is None or doc["active"] == active
+        ]
+        start = int(cursor or 0)
+        if limit is None:
+            return docs[start:], None
+        next_cursor = str(start + limit) if start + limit < len(docs) else None
+        return docs[start:start + limit], next_cursor
+
     async def delete_document(self, doc_id, user_id):
         if doc_id in self.documents and self.documents[doc_id]["user_id"] == user_id:
             del self.documents[doc_id]
@@ -106,12 +122,57 @@ async def clear_user_documents(self, user_id):
             k: v for k, v in self.documents.items() if v["user_id"] != user_id
         }
 
-    async def update_document_status(self, doc_id, active):
-        if doc_id in self.documents:
+    async def update_document_status(self, doc_id, user_id, active):
+        if doc_id in self.documents and self.documents[doc_id]["user_id"] == user_id:
             self.documents[doc_id]["active"] = active
         else:
             raise Exception("Document not found")
         
+# Mock ingestion service that indexes uploads right away instead of queueing them
+class MockIngestionService:
+    def __init__(self, index_service):
+        self.index_service = index_service
+        self.jobs = {}
+
+    async def submit(self, file, filename, user_id):
+        doc_id = await self.index_service.index_document(file, filename, user_id)
+        job = {
+            "id": f"job{len(self.jobs) + 1}",
+            "doc_id": doc_id,
+            "filename": filename,
+            "status": "done",
+            "stage": "done",
+            "progress": 1.0,
+            "error": None,
+        }
+        self.jobs[job["id"]] = (user_id, job)
+        return job
+
+    async def submit_bulk(self, files, user_id, rejected=()):
+        entries = [
+            {"filename": filename, "doc_id": None, "status": "rejected", "error": reason}
+            for filename, reason in rejected
+        ]
+        for file, filename in files:
+            doc_id = await self.index_service.index_document(file, filename, user_id)
+            entries.append({"filename": filename, "doc_id": doc_id, "status": "done", "error": None})
+        job = {
+            "id": f"job{len(self.jobs) + 1}",
+            "doc_id": "",
+            "filename": f"{len(entries)} files",
+            "status": "done",
+            "stage": "done",
+            "progress": 1.0,
+            "error": None,
+            "files": entries,
+        }
+        self.jobs[job["id"]] = (user_id, job)
+        return job
+
+    async def get_job(self, job_id, user_id):
+        owner, job = self.jobs.get(job_id, (None, None))
+        return job if owner == user_id else None
+
 # Mock LLM Service for Testing
 class MockLLMService:
     async def change_provider(self, provider: str):
@@ -124,6 +185,7 @@ def __init__(self, qa_service=None, llm_service=None, index_service=None):
         self.qa_service = qa_service if qa_service is not None else MockQAService()
         self.llm_service = llm_service if llm_service is not None else MockLLMService()
         self.index_service = index_service if index_service is not None else MockIndexService()
+        self.ingestion_service = MockIngestionService(self.index_service)
 
     async def initialize(self):
         # Do nothing for initialization in tests
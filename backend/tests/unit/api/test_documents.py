@@ -1,11 +1,15 @@
 import io
+import zipfile
 import pytest
+from unittest.mock import patch
 from fastapi import FastAPI, APIRouter
 from fastapi.testclient import TestClient
 
 # Import the documents router
 from app.api.documents import router as docs_router
 from app.api.documents import clear_documents  # Import the actual endpoint function
+from app.api.documents import file_validator
+from app.core.config import settings
 # We'll override the get_current_user dependency.
 from app.auth.deps import get_current_user  
 # Also override the ServiceContainer dependency.
@@ -49,14 +53,96 @@ def test_upload_document_success(client, mock_container):
     file_content = b"Test file content"
     files = {"file": ("test.txt", file_content, "text/plain")}
     response = client.post("/documents/upload", files=files)
-    assert response.status_code == 200, response.text
+    assert response.status_code == 202, response.text
     data = response.json()
     assert "id" in data
+    assert data["status"] == "done"
     # Verify that the document was added to the mock index service
     doc_id = data["id"]
     assert doc_id in mock_container.index_service.documents
     uploaded_doc = mock_container.index_service.documents[doc_id]
     assert uploaded_doc["filename"] == "test.txt"
+    assert uploaded_doc["content"] == file_content
+
+def test_upload_document_streams_large_file(client, mock_container):
+    mock_container.index_service.documents.clear()
+    # Larger than the in-memory spool, so the upload rolls over to disk
+    file_content = b"line of text\n" * 200_000
+    files = {"file": ("big.txt", file_content, "text/plain")}
+    response = client.post("/documents/upload", files=files)
+    assert response.status_code == 202, response.text
+    assert mock_container.index_service.documents[response.json()["id"]]["content"] == file_content
+
+def test_upload_document_too_large(client, mock_container):
+    mock_container.index_service.documents.clear()
+    with patch.object(file_validator, "max_size", 1024):
+        files = {"file": ("test.txt", b"x" * 4096, "text/plain")}
+        response = client.post("/documents/upload", files=files)
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
+    assert not mock_container.index_service.documents
+
+def test_upload_document_extension_not_allowed(client, mock_container):
+    files = {"file": ("script.exe", b"MZ binary", "application/octet-stream")}
+    response = client.post("/documents/upload", files=files)
+    assert response.status_code == 400
+    assert "not allowed" in response.json()["detail"]
+
+def test_upload_document_content_mismatch(client, mock_container):
+    files = {"file": ("fake.pdf", b"just some plain text", "application/pdf")}
+    response = client.post("/documents/upload", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File content doesn't match its extension"
+
+def test_upload_document_missing_file(client, mock_container):
+    response = client.post("/documents/upload", data={"other": "value"}, files={"note": ("", b"")})
+    assert response.status_code == 400
+
+def test_bulk_upload_indexes_files_and_archive_members(client, mock_container):
+    mock_container.index_service.documents.clear()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("inner/notes.txt", "archived notes")
+        zf.writestr("inner/tool.exe", "MZ binary")
+    files = [
+        ("files", ("first.txt", b"first file", "text/plain")),
+        ("files", ("bundle.zip", archive.getvalue(), "application/zip")),
+        ("files", ("fake.pdf", b"just some plain text", "application/pdf")),
+    ]
+    response = client.post("/documents/upload/bulk", files=files)
+    assert response.status_code == 202, response.text
+    data = response.json()
+    assert data["status"] == "done"
+    statuses = {entry["filename"]: entry["status"] for entry in data["files"]}
+    assert statuses == {
+        "first.txt": "done",
+        "bundle.zip/inner/notes.txt": "done",
+        "bundle.zip/inner/tool.exe": "rejected",
+        "fake.pdf": "rejected",
+    }
+    contents = sorted(doc["content"] for doc in mock_container.index_service.documents.values())
+    assert contents == [b"archived notes", b"first file"]
+
+def test_bulk_upload_too_many_files(client, mock_container):
+    with patch.object(settings, "BULK_UPLOAD_MAX_FILES", 2):
+        files = [("files", (f"{i}.txt", b"text", "text/plain")) for i in range(3)]
+        response = client.post("/documents/upload/bulk", files=files)
+    assert response.status_code == 400
+    assert "Too many files" in response.json()["detail"]
+
+def test_get_ingestion_job(client, mock_container):
+    files = {"file": ("test.txt", b"Test file content", "text/plain")}
+    job_id = client.post("/documents/upload", files=files).json()["job_id"]
+    response = client.get(f"/documents/jobs/{job_id}")
+    assert response.status_code == 200, response.text
+    job = response.json()
+    assert job["id"] == job_id
+    assert job["stage"] == "done"
+    assert job["progress"] == 1.0
+
+def test_get_ingestion_job_not_found(client, mock_container):
+    response = client.get("/documents/jobs/missing")
+    assert response.status_code == 404
 
 def test_list_documents_empty(client, mock_container):
     mock_container.index_service.documents.clear()
@@ -83,6 +169,44 @@ def test_list_documents_with_document(client, mock_container):
     assert data[0]["id"] == "doc1"
     assert data[0]["filename"] == "dummy.txt"
 
+def test_list_documents_pages_with_cursor_header(client, mock_container):
+    mock_container.index_service.documents.clear()
+    for i in range(3):
+        mock_container.index_service.documents[f"doc{i}"] = {
+            "content": b"dummy",
+            "filename": f"dummy{i}.txt",
+            "user_id": "test_user_id",
+            "active": True
+        }
+    first = client.get("/documents/list", params={"limit": 2})
+    assert first.status_code == 200, first.text
+    assert [doc["id"] for doc in first.json()] == ["doc0", "doc1"]
+
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get("/documents/list", params={"limit": 2, "cursor": cursor})
+    assert [doc["id"] for doc in second.json()] == ["doc2"]
+    assert "X-Next-Cursor" not in second.headers
+
+def test_list_documents_without_limit_or_cursor_lists_everything(client, mock_container):
+    mock_container.index_service.documents.clear()
+    for i in range(3):
+        mock_container.index_service.documents[f"doc{i}"] = {
+            "content": b"dummy",
+            "filename": f"dummy{i}.txt",
+            "user_id": "test_user_id",
+            "active": True
+        }
+
+    with patch('app.api.documents.settings.DOCUMENT_PAGE_SIZE', 2):
+        response = client.get("/documents/list")
+
+    assert [doc["id"] for doc in response.json()] == ["doc0", "doc1", "doc2"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_list_documents_rejects_unknown_sort(client, mock_container):
+    response = client.get("/documents/list", params={"sort": "owner"})
+    assert response.status_code == 422
+
 def test_delete_document_success(client, mock_container):
     mock_container.index_service.documents.clear()
     mock_container.index_service.documents["doc1"] = {
@@ -0,0 +1,103 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from app.cli.bulk_ingest import BulkIngestor, Checkpoint, iter_sources
+from app.utils.validators import FileValidator
+
+
+class FakeIndexService:
+    def __init__(self, broken=()):
+        self.indexed = []
+        self.broken = set(broken)
+
+    async def index_document(self, content, filename, user_id, progress=None):
+        if filename in self.broken:
+            raise ValueError("unreadable document")
+        self.indexed.append((filename, user_id, content))
+        return f"doc-{filename}"
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / "docs"
+    (root / "b").mkdir(parents=True)
+    (root / "a.txt").write_text("first document")
+    (root / "b" / "c.txt").write_text("second document")
+    (root / "b" / "broken.txt").write_text("third document")
+    (root / "image.png").write_bytes(b"\x89PNG\r\n")
+    return root
+
+
+def validator():
+    return FileValidator({"txt"}, 1024)
+
+
+def test_iter_sources_reads_directories_and_zips(source, tmp_path):
+    names = [name for name, _, _ in iter_sources(str(source))]
+    assert names == ["a.txt", "image.png", "b/broken.txt", "b/c.txt"]
+
+    archive_path = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("x/one.txt", "one")
+    assert [(name, size, read()) for name, size, read in iter_sources(str(archive_path))] == [
+        ("x/one.txt", 3, b"one")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_accounts_for_every_file(source, tmp_path):
+    service = FakeIndexService(broken={"b/broken.txt"})
+    checkpoint = Checkpoint(str(tmp_path / "run.ckpt"))
+
+    report = await BulkIngestor(service, "user1", validator(), checkpoint, concurrency=2).run(
+        iter_sources(str(source))
+    )
+    checkpoint.close()
+
+    assert sorted(name for name, _, _ in service.indexed) == ["a.txt", "b/c.txt"]
+    assert (report.indexed, report.failed, report.rejected) == (2, 1, 1)
+    assert report.bytes_indexed == len("first document") + len("second document")
+    assert report.failures == [("b/broken.txt", "ValueError: unreadable document")]
+    assert report.errors["ValueError"] == 1
+    entries = [json.loads(line) for line in open(tmp_path / "run.ckpt")]
+    assert {entry["name"]: entry["status"] for entry in entries} == {
+        "a.txt": "indexed", "b/c.txt": "indexed", "b/broken.txt": "failed", "image.png": "rejected"
+    }
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_resumes_from_checkpoint(source, tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    first = Checkpoint(path)
+    await BulkIngestor(FakeIndexService(broken={"b/broken.txt"}), "user1", validator(), first).run(
+        iter_sources(str(source))
+    )
+    first.close()
+
+    # The second run only retries what failed
+    service = FakeIndexService()
+    second = Checkpoint(path)
+    report = await BulkIngestor(service, "user1", validator(), second).run(iter_sources(str(source)))
+    second.close()
+
+    assert [name for name, _, _ in service.indexed] == ["b/broken.txt"]
+    assert (report.indexed, report.resumed) == (1, 3)
+
+
+@pytest.mark.asyncio
+async def test_oversized_files_are_rejected_without_being_read(tmp_path):
+    checkpoint = Checkpoint(None)
+    reads = []
+
+    def read():
+        reads.append("big.txt")
+        return b"x" * 2048
+
+    report = await BulkIngestor(FakeIndexService(), "user1", validator(), checkpoint).run(
+        iter([("big.txt", 2048, read)])
+    )
+
+    assert report.rejected == 1 and reads == []
@@ -0,0 +1,96 @@
+import asyncio
+import numpy as np
+import pytest
+from typing import List
+
+from app.embeddings.base_embedder import BaseEmbedder
+from app.embeddings.batcher import EmbeddingBatcher
+
+
+class CountingEmbedder(BaseEmbedder):
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    @property
+    def model_id(self) -> str:
+        return "counting-model"
+
+    async def initialize(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("model failure")
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_forward_passes():
+    embedder = CountingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=3, max_wait_ms=50)
+    try:
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+        results = await asyncio.gather(*(batcher.embed(text) for text in texts))
+
+        # Each caller gets its own vector back
+        assert [vector.tolist() for vector in results] == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        # Five requests, two forward passes capped at the max batch size
+        assert [len(batch) for batch in embedder.batches] == [3, 2]
+
+        snapshot = batcher.metrics.snapshot()
+        assert snapshot["batches"] == 2
+        assert snapshot["requests"] == 5
+        assert snapshot["batch_size_histogram"] == {"2": 1, "3": 1}
+        assert snapshot["queue_delay_ms"]["max"] >= 0
+    finally:
+        await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_lone_query_is_dispatched_after_max_wait():
+    embedder = CountingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=32, max_wait_ms=1)
+    try:
+        assert await asyncio.wait_for(batcher.embed("solo"), timeout=1) == [4.0]
+        assert embedder.batches == [["solo"]]
+    finally:
+        await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_is_raised_to_every_caller():
+    batcher = EmbeddingBatcher(CountingEmbedder(fail=True), max_batch_size=4, max_wait_ms=20)
+    try:
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        # The dispatcher survives the failure
+        batcher.embedder.fail = False
+        assert (await batcher.embed("ok")).tolist() == [2.0]
+    finally:
+        await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_embed_many_shares_passes_across_documents():
+    embedder = CountingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=8, max_wait_ms=50)
+    try:
+        first, second = await asyncio.gather(
+            batcher.embed_many(["a", "bb", "ccc"]),
+            batcher.embed_many(["dddd", "eeeee"])
+        )
+
+        assert first[:, 0].tolist() == [1.0, 2.0, 3.0]
+        assert second[:, 0].tolist() == [4.0, 5.0]
+        # Both documents' chunks went through one forward pass
+        assert embedder.batches == [["a", "bb", "ccc", "dddd", "eeeee"]]
+    finally:
+        await batcher.close()
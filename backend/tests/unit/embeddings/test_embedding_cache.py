@@ -0,0 +1,54 @@
+import pytest
+
+from app.embeddings.cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), "model-a", max_entries=10)
+    yield cache
+    cache.close()
+
+
+def as_lists(found):
+    return {i: vector.tolist() for i, vector in found.items()}
+
+
+def test_round_trip_by_position(cache):
+    cache.put_many(["alpha", "beta"], [[0.5, 1.0], [2.0, -1.0]])
+
+    found = cache.get_many(["beta", "missing", "alpha", "beta"])
+
+    assert as_lists(found) == {0: [2.0, -1.0], 2: [0.5, 1.0], 3: [2.0, -1.0]}
+
+
+def test_keys_include_model_id(tmp_path, cache):
+    cache.put_many(["alpha"], [[1.0]])
+    other = EmbeddingCache(cache.path, "model-b")
+    try:
+        assert other.get_many(["alpha"]) == {}
+    finally:
+        other.close()
+
+
+def test_persists_across_instances(tmp_path, cache):
+    cache.put_many(["alpha"], [[1.0, 2.0]])
+    cache.close()
+
+    reopened = EmbeddingCache(cache.path, "model-a")
+    try:
+        assert as_lists(reopened.get_many(["alpha"])) == {0: [1.0, 2.0]}
+    finally:
+        reopened.close()
+
+
+def test_evicts_least_recently_used(cache):
+    cache.put_many([f"text-{i}" for i in range(10)], [[float(i)] for i in range(10)])
+    # Touch the oldest entry so it survives eviction
+    cache.get_many(["text-0"])
+
+    cache.put_many(["text-10"], [[10.0]])
+
+    assert cache._size == 9
+    assert as_lists(cache.get_many(["text-0", "text-10"])) == {0: [0.0], 1: [10.0]}
+    assert cache.get_many(["text-1"]) == {}
@@ -0,0 +1,104 @@
+import asyncio
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from typing import List
+
+from app.embeddings.base_embedder import BaseEmbedder
+from app.embeddings.remote_embedder import RemoteEmbedder
+from app.embeddings.worker import EmbeddingWorker
+from app.utils.exceptions import EmbeddingError
+
+
+class FakeEmbedder(BaseEmbedder):
+    def __init__(self):
+        self.calls = []
+
+    @property
+    def model_id(self) -> str:
+        return "fake-model"
+
+    async def initialize(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        self.calls.append(list(texts))
+        if "boom" in texts:
+            raise RuntimeError("model failure")
+        if "slow" in texts:
+            await asyncio.sleep(0.3)
+        return np.array([[len(text), 0.5] for text in texts], dtype=np.float32)
+
+
+@pytest_asyncio.fixture
+async def worker(tmp_path):
+    embedder = FakeEmbedder()
+    worker = EmbeddingWorker(embedder, str(tmp_path / "embedder.sock"))
+    await worker.start()
+    yield worker
+    await worker.stop()
+
+
+@pytest.mark.asyncio
+async def test_remote_embedder_round_trip(worker):
+    client = RemoteEmbedder(worker.socket_path, max_connections=2)
+    await client.initialize()
+    try:
+        assert client.model_id == "fake-model"
+        vectors = await client.embed_batch(["a", "abc"])
+        assert vectors.dtype == np.float32
+        assert vectors.tolist() == [[1.0, 0.5], [3.0, 0.5]]
+        # The pooled connection is reused for the next request
+        assert (await client.embed_batch(["ab"])).tolist() == [[2.0, 0.5]]
+        assert worker.embedder.calls == [["a", "abc"], ["ab"]]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_remote_embedder_reports_worker_errors(worker):
+    client = RemoteEmbedder(worker.socket_path)
+    await client.initialize()
+    try:
+        with pytest.raises(EmbeddingError, match="model failure"):
+            await client.embed_batch(["boom"])
+        # The connection stays usable after an error response
+        assert (await client.embed_batch(["a"])).tolist() == [[1.0, 0.5]]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_remote_embedder_unavailable_worker(tmp_path):
+    client = RemoteEmbedder(str(tmp_path / "missing.sock"))
+    with pytest.raises(EmbeddingError, match="unavailable"):
+        await client.initialize()
+
+
+@pytest.mark.asyncio
+async def test_remote_embedder_timeout_is_an_embedding_error(worker):
+    client = RemoteEmbedder(worker.socket_path, timeout=0.05)
+    await client.initialize()
+    try:
+        with pytest.raises(EmbeddingError, match="did not answer"):
+            await client.embed_batch(["slow"])
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_remote_embedder_close_waits_for_requests_in_flight(worker):
+    client = RemoteEmbedder(worker.socket_path)
+    await client.initialize()
+    request = asyncio.create_task(client.embed_batch(["slow"]))
+    await asyncio.sleep(0.05)
+
+    await client.close()
+
+    assert (await request).tolist() == [[4.0, 0.5]]
+    with pytest.raises(EmbeddingError):
+        await client.embed_batch(["a"])
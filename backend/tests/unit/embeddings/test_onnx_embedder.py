@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from transformers import BertConfig, BertModel, BertTokenizerFast
+
+from app.embeddings.onnx_embedder import OnnxEmbedder
+
+
+TEXTS = ["hello world", "a b c d e f"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model_dir(tmp_path_factory):
+    """A randomly initialised two-layer BERT so the test needs no download"""
+    path = tmp_path_factory.mktemp("tinybert")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "hello", "world", "export", "sample"]
+    vocab += list("abcdefghijklmnopqrstuvwxyz")
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    BertTokenizerFast(str(path / "vocab.txt")).save_pretrained(str(path))
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64
+    )
+    torch.manual_seed(0)
+    BertModel(config).save_pretrained(str(path))
+    return str(path)
+
+
+def reference_embeddings(model_dir):
+    tokenizer = BertTokenizerFast.from_pretrained(model_dir)
+    model = BertModel.from_pretrained(model_dir).eval()
+    with torch.no_grad():
+        hidden = model(**tokenizer(TEXTS, padding=True, return_tensors="pt")).last_hidden_state
+    return torch.nn.functional.normalize(hidden[:, 0], dim=1).numpy()
+
+
+@pytest.mark.asyncio
+async def test_fp32_export_matches_pytorch(tiny_model_dir, tmp_path):
+    embedder = OnnxEmbedder(tiny_model_dir, str(tmp_path), quantize=False, intra_op_threads=1)
+    await embedder.initialize()
+
+    vectors = np.asarray(await embedder.embed_batch(TEXTS))
+
+    assert embedder.model_id.endswith(":onnx-fp32")
+    np.testing.assert_allclose(vectors, reference_embeddings(tiny_model_dir), atol=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_int8_quantized_model_stays_close(tiny_model_dir, tmp_path):
+    embedder = OnnxEmbedder(tiny_model_dir, str(tmp_path), quantize=True, intra_op_threads=1)
+    await embedder.initialize()
+
+    vectors = np.asarray(await embedder.embed_batch(TEXTS))
+    cosines = np.sum(vectors * reference_embeddings(tiny_model_dir), axis=1)
+
+    assert embedder.model_id.endswith(":onnx-int8")
+    assert (tmp_path / f"{tiny_model_dir.replace('/', '__')}.int8.onnx").exists()
+    assert np.all(cosines > 0.9)
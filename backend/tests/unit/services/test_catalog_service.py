@@ -0,0 +1,144 @@
+import pytest
+from datetime import datetime
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+from app.services.catalog_service import DocumentCatalog
+
+
+def create_catalog(conn):
+    @asynccontextmanager
+    async def fake_acquire():
+        yield conn
+
+    @asynccontextmanager
+    async def fake_transaction():
+        yield
+
+    conn.transaction = lambda: fake_transaction()
+    db_service = MagicMock()
+    db_service.acquire = lambda: fake_acquire()
+    return DocumentCatalog(db_service)
+
+
+@pytest.mark.asyncio
+async def test_documents_groups_users_per_document():
+    conn = AsyncMock()
+    conn.fetch.return_value = [
+        {"doc_id": "doc1", "file_size": 10, "user_id": "alice", "filename": "a.txt", "active": True},
+        {"doc_id": "doc1", "file_size": 10, "user_id": "bob", "filename": "b.txt", "active": False},
+    ]
+    catalog = create_catalog(conn)
+
+    documents = await catalog.documents(["doc1", "doc2"])
+
+    assert documents == {"doc1": {"doc_id": "doc1", "file_size": 10, "users": ["alice", "bob"]}}
+    assert conn.fetch.call_args.args[1] == ["doc1", "doc2"]
+
+
+@pytest.mark.asyncio
+async def test_initialize_fails_without_the_catalog_tables():
+    conn = AsyncMock()
+    conn.fetchval.return_value = True
+    catalog = create_catalog(conn)
+
+    with pytest.raises(RuntimeError, match="catalog.sql"):
+        await catalog.initialize()
+
+
+@pytest.mark.asyncio
+async def test_remove_last_user_drops_document():
+    conn = AsyncMock()
+    conn.fetchval.return_value = 0
+    catalog = create_catalog(conn)
+
+    assert await catalog.remove("doc1", "alice") == 0
+
+    statements = [call.args[0] for call in conn.execute.call_args_list]
+    assert len(statements) == 2
+    assert statements[1] == "DELETE FROM catalog.documents WHERE doc_id = $1"
+
+
+@pytest.mark.asyncio
+async def test_set_active_reports_missing_document():
+    conn = AsyncMock()
+    conn.execute.return_value = "UPDATE 0"
+    catalog = create_catalog(conn)
+
+    assert await catalog.set_active("doc1", "alice", False) is False
+    conn.execute.return_value = "UPDATE 1"
+    assert await catalog.set_active("doc1", "alice", False) is True
+
+
+@pytest.mark.asyncio
+async def test_import_documents_keeps_each_users_status():
+    conn = AsyncMock()
+    catalog = create_catalog(conn)
+
+    imported = await catalog.import_documents([
+        {"doc_id": "doc1", "filename": "a.txt", "file_size": 10, "users": ["alice", "bob"], "active": False},
+    ])
+
+    assert imported == 1
+    rows = conn.executemany.call_args.args[1]
+    assert rows == [("doc1", "alice", "a.txt", False), ("doc1", "bob", "a.txt", False)]
+
+
+@pytest.mark.asyncio
+async def test_page_continues_after_cursor():
+    conn = AsyncMock()
+    rows = [
+        {"doc_id": f"doc{i}", "filename": f"{i}.txt", "active": True, "added_at": datetime(2024, 1, i + 1),
+         "file_size": 10, "chunk_count": 2}
+        for i in range(3)
+    ]
+    conn.fetch.return_value = rows
+    catalog = create_catalog(conn)
+
+    documents, cursor = await catalog.page("alice", 2, sort="created_at", descending=True)
+
+    assert [document["id"] for document in documents] == ["doc0", "doc1"]
+    assert documents[0]["chunks"] == 2
+    # One row more than asked for tells there is a next page
+    assert conn.fetch.call_args.args[-1] == 3
+
+    conn.fetch.return_value = rows[2:]
+    documents, next_cursor = await catalog.page("alice", 2, cursor=cursor, sort="created_at", descending=True)
+
+    assert [document["id"] for document in documents] == ["doc2"] and next_cursor is None
+    query, *params = conn.fetch.call_args.args
+    assert "(a.added_at, a.doc_id) < ($2, $3)" in query
+    assert params == ["alice", datetime(2024, 1, 2), "doc1", 3]
+
+
+@pytest.mark.asyncio
+async def test_page_without_limit_returns_every_document():
+    conn = AsyncMock()
+    conn.fetch.return_value = [
+        {"doc_id": f"doc{i}", "filename": f"{i}.txt", "active": True, "added_at": datetime(2024, 1, 1),
+         "file_size": 10, "chunk_count": 1}
+        for i in range(3)
+    ]
+    catalog = create_catalog(conn)
+
+    documents, cursor = await catalog.page("alice", None)
+
+    assert [document["id"] for document in documents] == ["doc0", "doc1", "doc2"] and cursor is None
+    query, *params = conn.fetch.call_args.args
+    assert "LIMIT" not in query and params == ["alice"]
+
+
+@pytest.mark.asyncio
+async def test_page_rejects_cursor_of_other_sort():
+    conn = AsyncMock()
+    conn.fetch.return_value = [
+        {"doc_id": f"doc{i}", "filename": f"{i}.txt", "active": True, "added_at": datetime(2024, 1, 1),
+         "file_size": 10, "chunk_count": 1}
+        for i in range(2)
+    ]
+    catalog = create_catalog(conn)
+    _, cursor = await catalog.page("alice", 1, sort="filename")
+
+    with pytest.raises(ValueError):
+        await catalog.page("alice", 1, cursor=cursor, sort="size")
+    with pytest.raises(ValueError):
+        await catalog.page("alice", 1, cursor="not a cursor", sort="filename")
@@ -85,6 +85,9 @@ async def fake_connect():
     query = "SELECT * FROM users"
     result = await service.execute_query(query)
     assert result == [('user1', 'email1')]
+    # Run as the role that can't read the document catalog
+    statements = [str(call.args[0]) for call in fake_conn.execute.call_args_list]
+    assert statements == ['SET LOCAL ROLE "sql_reader"', query]
 
 # Test for execute_query to ensure that non-SELECT queries or queries with dangerous keywords raise ValueError.
 @pytest.mark.asyncio
@@ -106,4 +109,6 @@ async def test_execute_query_dangerous_keywords():
     service = DatabaseService()
     query = "SELECT * FROM users; DROP TABLE users;"
     with pytest.raises(ValueError, match="Dangerous SQL keyword detected"):
-        await service.execute_query(query) 
\ No newline at end of file
+        await service.execute_query(query)
+    with pytest.raises(ValueError, match="set_config"):
+        await service.execute_query("SELECT set_config('role', 'postgres', true)") 
\ No newline at end of file
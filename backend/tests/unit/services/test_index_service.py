@@ -7,12 +7,19 @@
     category=DeprecationWarning
 )
 
+import asyncio
+import hashlib
+import io
+import threading
+import numpy as np
 import pytest
-from unittest.mock import Mock, patch
-from app.services.index_service import LlamaIndexService
+from fakeredis import FakeAsyncRedis
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
+from app.services.index_service import LlamaIndexService, chunk_uuid, tenant_name
+from app.embeddings.cache import EmbeddingCache
 from llama_index.core.schema import TextNode
 from llama_index.core.base.embeddings.base import BaseEmbedding
-from llama_index.core.vector_stores import MetadataFilters, ExactMatchFilter
+from app.vectorstores import SearchHit
 
 class MockEmbedding(BaseEmbedding):
     def _get_text_embedding(self, text: str) -> list:
@@ -39,11 +46,25 @@ def mock_embed_model():
 
 async def create_index_service(mock_vector_store, mock_embed_model):
     with patch('app.services.index_service.create_embedding_model', return_value=mock_embed_model):
-        with patch('app.services.index_service.create_vector_store', return_value=mock_vector_store):
-            service = LlamaIndexService()
+        with patch('app.services.index_service.create_vector_store', return_value=mock_vector_store), \
+                patch('app.services.index_service.create_async_client', return_value=AsyncMock()), \
+                patch('app.services.index_service.WeaviateSearcher', return_value=AsyncMock()), \
+                patch('app.services.index_service.WeaviateChunkStore', return_value=MagicMock()), \
+                patch('app.services.index_service.settings.EMBEDDING_CACHE_ENABLED', False):
+            service = LlamaIndexService(create_catalog())
             await service.initialize()
+            service.chunk_store.lsh_candidates.return_value = {}
             return service
 
+def create_catalog():
+    catalog = AsyncMock()
+    catalog.is_empty.return_value = False
+    catalog.get.return_value = None
+    catalog.find_by_filename.return_value = None
+    catalog.user_documents.return_value = []
+    catalog.remove.return_value = 0
+    return catalog
+
 @pytest.mark.asyncio
 async def test_index_document(mock_vector_store, mock_embed_model):
     # Initialize service
@@ -61,7 +82,209 @@ async def test_index_document(mock_vector_store, mock_embed_model):
     doc_id = await service.index_document(content, filename, user_id)
     
     assert doc_id is not None
-    assert service.vector_store.add.called
+    assert service.chunk_store.add.called
+
+@pytest.mark.asyncio
+async def test_index_document_from_stream(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+
+    content = b"streamed test content"
+    doc_id = await service.index_document(io.BytesIO(content), "test.txt", "user123")
+
+    # Same identity as the in-memory upload of the same file
+    assert doc_id == service.document_id(content) == hashlib.sha256(content).hexdigest()
+    nodes = service.chunk_store.add.call_args.args[0]
+    assert nodes[0].text == "streamed test content"
+
+@pytest.mark.asyncio
+async def test_index_document_reports_progress(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+    reports = []
+
+    async def progress(stage, fraction):
+        reports.append((stage, fraction))
+
+    await service.index_document(b"test content", "test.txt", "user123", progress=progress)
+
+    assert reports == [("extracting", 0.0), ("indexing", 1.0), ("finalizing", 0.0)]
+
+@pytest.mark.asyncio
+async def test_index_document_stores_batches_as_they_are_embedded(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+    service.chunk_store.add.side_effect = lambda nodes, embeddings, properties=None: [node.node_id for node in nodes]
+    content = "\n\n".join(f"paragraph {i}" for i in range(5)).encode()
+
+    with patch('app.services.index_service.settings.INGEST_SEGMENT_CHARS', 1), \
+            patch('app.services.index_service.settings.EMBED_BATCH_SIZE', 2):
+        await service.index_document(content, "test.txt", "user123")
+
+    batches = [call.args[0] for call in service.chunk_store.add.call_args_list]
+    assert [len(nodes) for nodes in batches] == [2, 2, 1]
+    nodes = [node for batch in batches for node in batch]
+    assert [node.metadata["chunk_id"] for node in nodes] == [0, 1, 2, 3, 4]
+    # Only the last batch knows the chunk count up front; the rest aren't rewritten
+    assert nodes[-1].metadata["total_chunks"] == 5
+    assert nodes[0].metadata["total_chunks"] == 0
+    service.chunk_store.update_metadata.assert_not_called()
+    service.chunk_store.update_chunks.assert_not_called()
+    service.chunk_store.delete.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_new_version_only_embeds_changed_chunks(mock_vector_store):
+    embed_model = RecordingEmbedding()
+    embed_model.batches = []
+    service = await create_index_service(mock_vector_store, embed_model)
+    service.vector_store.query.return_value.nodes = []
+    service._find_previous_version = AsyncMock(return_value={"doc_id": "old-doc", "users": ["user123"]})
+    service.chunk_store.add.side_effect = lambda nodes, embeddings, properties=None: [node.node_id for node in nodes]
+    update_threads = []
+    service.chunk_store.update_chunks.side_effect = (
+        lambda updates, ref_doc_id=None: update_threads.append(threading.current_thread().name)
+    )
+
+    def chunk_hash(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    # The earlier version had "intro" and "outro"; "middle" was edited
+    service.chunk_store.chunk_hashes.return_value = {
+        chunk_hash("intro"): ["id-intro"],
+        chunk_hash("old middle"): ["id-old-middle"],
+        chunk_hash("outro"): ["id-outro"],
+    }
+    content = b"intro\n\nnew middle\n\noutro"
+
+    with patch('app.services.index_service.settings.INGEST_SEGMENT_CHARS', 1):
+        doc_id = await service.index_document(content, "manual.txt", "user123")
+
+    service.chunk_store.chunk_hashes.assert_called_once_with("old-doc")
+    assert embed_model.batches == [["new middle"]]
+    nodes = service.chunk_store.add.call_args.args[0]
+    assert [node.text for node in nodes] == ["new middle"]
+    assert nodes[0].metadata["chunk_hash"] == chunk_hash("new middle")
+    # Unchanged chunks move to the new version in place, on the store threads
+    calls = service.chunk_store.update_chunks.call_args_list
+    updates = {uuid: meta for call in calls for uuid, meta in call.args[0].items()}
+    assert all(call.args[1] == doc_id for call in calls)
+    assert all(name.startswith("weaviate") for name in update_threads)
+    assert {uuid: meta["chunk_id"] for uuid, meta in updates.items()} == {"id-intro": 0, "id-outro": 2}
+    assert all(meta["total_chunks"] == 3 and meta["doc_id"] == doc_id for meta in updates.values())
+    service.chunk_store.delete.assert_called_once_with(["id-old-middle"])
+
+@pytest.mark.asyncio
+async def test_new_version_of_shared_document_is_indexed_separately(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+    service._find_previous_version = AsyncMock(return_value={"doc_id": "old-doc", "users": ["user123", "other"]})
+    service.delete_document = AsyncMock()
+
+    await service.index_document(b"edited content", "manual.txt", "user123")
+
+    # The other user keeps the earlier version; only the uploader moves on
+    service.chunk_store.chunk_hashes.assert_not_called()
+    assert service.chunk_store.add.called
+    service.delete_document.assert_awaited_once_with("old-doc", "user123")
+
+@pytest.mark.asyncio
+async def test_index_document_rolls_back_stored_chunks_on_failure(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+    stored = []
+
+    def add(nodes, embeddings, properties=None):
+        if stored:
+            raise RuntimeError("weaviate unavailable")
+        stored.extend(node.node_id for node in nodes)
+        return [node.node_id for node in nodes]
+
+    service.chunk_store.add.side_effect = add
+    content = b"first\n\nsecond\n\nthird"
+
+    with patch('app.services.index_service.settings.INGEST_SEGMENT_CHARS', 1), \
+            patch('app.services.index_service.settings.EMBED_BATCH_SIZE', 1):
+        with pytest.raises(RuntimeError):
+            await service.index_document(content, "test.txt", "user123")
+
+    service.chunk_store.delete.assert_called_once_with(stored)
+
+@pytest.mark.asyncio
+async def test_chunk_ids_are_stable_across_retries(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.vector_store.query.return_value.nodes = []
+    service.chunk_store.add.side_effect = lambda nodes, embeddings, properties=None: [node.node_id for node in nodes]
+    content = b"first\n\nsecond\n\nthird"
+
+    with patch('app.services.index_service.settings.INGEST_SEGMENT_CHARS', 1):
+        doc_id = await service.index_document(content, "test.txt", "user123")
+        await service.index_document(content, "test.txt", "user123")
+
+    first, retry = [call.args[0] for call in service.chunk_store.add.call_args_list]
+    # A retry overwrites the same objects instead of adding a second copy
+    assert [node.node_id for node in first] == [chunk_uuid(doc_id, i) for i in range(3)]
+    assert [node.node_id for node in retry] == [node.node_id for node in first]
+
+@pytest.mark.asyncio
+async def test_concurrent_uploads_of_same_document_index_it_once(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    stored = []
+
+    def add(nodes, embeddings, properties=None):
+        stored.extend(node.node_id for node in nodes)
+        return [node.node_id for node in nodes]
+
+    service.chunk_store.add.side_effect = add
+    service._find_previous_version = AsyncMock(return_value=None)
+    service.catalog.get.side_effect = lambda doc_id: {"doc_id": doc_id} if stored else None
+
+    doc_ids = await asyncio.gather(
+        service.index_document(b"same content", "a.txt", "user1"),
+        service.index_document(b"same content", "b.txt", "user2"),
+    )
+
+    assert doc_ids[0] == doc_ids[1]
+    assert service.chunk_store.add.call_count == 1
+    # The upload that lost the race only joins the indexed document
+    assert service.catalog.add.await_args_list[-1].args == (doc_ids[0], "user2", "b.txt", len(b"same content"))
+
+@pytest.mark.asyncio
+async def test_repeated_chunks_are_shared_instead_of_stored(mock_vector_store):
+    embed_model = RecordingEmbedding()
+    embed_model.batches = []
+    service = await create_index_service(mock_vector_store, embed_model)
+    service.vector_store.query.return_value.nodes = []
+    service.chunk_store.add.side_effect = lambda nodes, embeddings, properties=None: [node.node_id for node in nodes]
+    footer = (
+        "Terms of service apply to every plan. Contact support for refunds within the notice period. "
+        "Prices include taxes. Installation is free for annual subscriptions. Routers remain our property "
+        "and must be returned when the contract ends."
+    )
+    stored_footer = "0d6c2f7e-5b4a-4e3d-9c1b-8a7f6e5d4c3b"
+    service.catalog.user_documents.return_value = [
+        {"id": "other-doc", "filename": "other.txt", "size": 100, "active": False}
+    ]
+    service.chunk_store.lsh_candidates.return_value = {
+        stored_footer: {
+            "minhash": service.minhasher.signature(footer),
+            "chunk_hash": hashlib.sha256(footer.encode()).hexdigest(),
+            "search_id": "other-doc"
+        }
+    }
+    content = f"Welcome\n\nRouter setup guide\n\n{footer}\n\nRouter reset guide\n\n{footer}\n\n{footer} Page 3".encode()
+
+    with patch('app.services.index_service.settings.INGEST_SEGMENT_CHARS', 1):
+        doc_id = await service.index_document(content, "guide.txt", "user123")
+
+    # Neither the footer another document has nor its repetition is embedded,
+    # but a footer that differs is, however similar
+    assert embed_model.batches == [["Welcome", "Router setup guide", "Router reset guide", f"{footer} Page 3"]]
+    nodes, _, properties = service.chunk_store.add.call_args.args
+    assert [node.metadata["doc_ids"] for node in nodes] == [[doc_id]] * 4
+    assert [len(chunk["lsh_bands"]) for chunk in properties] == [16] * 4
+    service.chunk_store.add_owner.assert_called_once_with([stored_footer], doc_id)
+    assert service.chunk_store.lsh_candidates.call_args.args[1] == ["other-doc"]
+    service.catalog.add.assert_awaited_once_with(doc_id, "user123", "guide.txt", len(content), 6)
 
 @pytest.mark.asyncio
 async def test_query(mock_vector_store, mock_embed_model):
@@ -71,28 +294,36 @@ async def test_query(mock_vector_store, mock_embed_model):
     # Test data
     question = "test question"
     user_id = "user123"
+    service.catalog.user_documents.return_value = [
+        {"id": "123", "filename": "mine.txt", "size": 100, "chunks": 7, "active": True}
+    ]
     
-    # Mock response nodes
-    mock_node = TextNode(
-        text="test response",
-        metadata={
-            "doc_id": "123",
-            "filename": "test.txt",
-            "chunk_id": 0,
-            "total_chunks": 1
-        }
-    )
-    
-    # Setup mock returns
-    service.vector_store.query.return_value.nodes = [mock_node]
-    service.vector_store.query.return_value.similarities = [0.8]
+    # The chunk was stored for another document first
+    service.searcher.search.return_value = [
+        SearchHit("test response", "456", ["456", "123"], chunk_id=1, total_chunks=2, score=0.8)
+    ]
     
     # Test query
     results = await service.query(question, user_id)
     
+    service.catalog.user_documents.assert_awaited_once_with(user_id, active_only=True)
+    vector, doc_ids, limit = service.searcher.search.call_args.args
+    assert doc_ids == ["123"] and limit == 5
+    # Plain vector search unless hybrid is asked for
+    assert service.searcher.search.call_args.kwargs == {"query": None, "alpha": 1.0, "tenant": None}
     assert len(results) == 1
-    assert results[0]["filename"] == "test.txt"
+    # Attributed to the user's document, under the user's filename
+    assert results[0]["filename"] == "mine.txt"
     assert results[0]["similarity_score"] == 0.8
+    # The count comes from the catalog, not the chunk
+    assert results[0]["total_chunks"] == 7
+
+@pytest.mark.asyncio
+async def test_query_without_active_documents_searches_nothing(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+
+    assert await service.query("test question", "user123") == []
+    service.searcher.search.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_get_user_documents(mock_vector_store, mock_embed_model):
@@ -101,29 +332,30 @@ async def test_get_user_documents(mock_vector_store, mock_embed_model):
     
     # Test data
     user_id = "user123"
-    
-    # Mock response node
-    mock_node = TextNode(
-        text="test content",
-        metadata={
-            "doc_id": "123",
-            "filename": "test.txt",
-            "file_size": 100,
-            "active": "true"
-        }
-    )
-    
-    # Setup mock returns
-    service.vector_store.query.return_value.nodes = [mock_node]
+    service.catalog.user_documents.return_value = [
+        {"id": "123", "filename": "test.txt", "size": 100, "active": True}
+    ]
     
     # Test getting user documents
     docs = await service.get_user_documents(user_id)
     
+    service.catalog.user_documents.assert_awaited_once_with(user_id)
     assert len(docs) == 1
     assert docs[0]["filename"] == "test.txt"
     assert docs[0]["size"] == 100
     assert docs[0]["active"] is True
 
+@pytest.mark.asyncio
+async def test_update_document_status_of_missing_document(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.catalog.set_active.return_value = False
+
+    with pytest.raises(ValueError):
+        await service.update_document_status("123", "user123", False)
+
+    service.catalog.set_active.assert_awaited_once_with("123", "user123", False)
+    service.chunk_store.update_metadata.assert_not_called()
+
 @pytest.mark.asyncio
 async def test_delete_document(mock_vector_store, mock_embed_model):
     # Initialize service
@@ -133,29 +365,34 @@ async def test_delete_document(mock_vector_store, mock_embed_model):
     doc_id = "123"
     user_id = "user123"
     
-    # Mock response node
-    mock_node = TextNode(
-        text="test content",
-        metadata={
-            "doc_id": "123",
-            "filename": "test.txt",
-            "users": [user_id],  # Only one user
-            "active": "true"
-        }
-    )
-    
-    # Setup mock returns
-    service.vector_store.query.return_value.nodes = [mock_node]
+    # Only one user
+    service.catalog.remove.return_value = 0
     
     # Test deleting document for user
     await service.delete_document(doc_id, user_id)
     
     # Since this was the last user, verify the document was deleted with correct filter
-    service.vector_store.delete.assert_called_with(
-        filter=MetadataFilters(filters=[
-            ExactMatchFilter(key="doc_id", value=doc_id)
-        ])
-    )
+    service.catalog.remove.assert_awaited_once_with(doc_id, user_id)
+    service.chunk_store.detach_document.assert_called_once_with(doc_id)
+    service.searcher.delete_document.assert_awaited_once_with(doc_id, tenant=None)
+
+@pytest.mark.asyncio
+async def test_delete_document_hands_over_shared_chunks_under_the_owners_lock(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.redis = FakeAsyncRedis(decode_responses=True)
+    service.chunk_store.tenant = None
+    service.catalog.remove.return_value = 0
+    held = []
+
+    async def delete_document(doc_id, tenant=None):
+        held.append(await service.redis.get("ingest:owners:"))
+    service.searcher.delete_document.side_effect = delete_document
+
+    await service.delete_document("123", "user123")
+
+    # Other processes can't add owners between the hand-over and the delete
+    assert held[0] is not None
+    assert await service.redis.get("ingest:owners:") is None
 
 @pytest.mark.asyncio
 async def test_delete_document_with_remaining_users(mock_vector_store, mock_embed_model):
@@ -165,31 +402,179 @@ async def test_delete_document_with_remaining_users(mock_vector_store, mock_embe
     # Test data
     doc_id = "123"
     user_id = "user123"
-    other_user = "other_user"
-    
-    # Mock response node with multiple users
-    mock_node = TextNode(
-        text="test content",
-        metadata={
-            "doc_id": "123",
-            "filename": "test.txt",
-            "users": [user_id, other_user],
-            "active": "true"
-        }
-    )
     
-    # Setup mock returns
-    service.vector_store.query.return_value.nodes = [mock_node]
+    # Another user still has the document
+    service.catalog.remove.return_value = 1
     
     # Test deleting document for one user
     await service.delete_document(doc_id, user_id)
     
-    # Verify document was updated with remaining users
-    service.vector_store.update.assert_called_with(
-        filter=MetadataFilters(filters=[
-            ExactMatchFilter(key="doc_id", value=doc_id)
-        ]),
-        update={
-            "users": [other_user]
-        }
-    ) 
\ No newline at end of file
+    # Only the catalog changes; the chunks stay for the other user
+    service.catalog.remove.assert_awaited_once_with(doc_id, user_id)
+    service.chunk_store.detach_document.assert_not_called()
+    service.searcher.delete_document.assert_not_called()
+
+
+class RecordingEmbedding(MockEmbedding):
+    batches: list = []
+
+    def _get_text_embeddings(self, texts: list) -> list:
+        self.batches.append(list(texts))
+        return [[float(len(text)), 0.0, 0.0] for text in texts]
+
+@pytest.mark.asyncio
+async def test_add_nodes_embeds_in_length_sorted_batches(mock_vector_store):
+    embed_model = RecordingEmbedding()
+    embed_model.batches = []
+    service = await create_index_service(mock_vector_store, embed_model)
+
+    nodes = [TextNode(text=text) for text in ["ccc", "a", "dddd", "bb", "eeeee"]]
+
+    with patch('app.services.index_service.settings.EMBED_BATCH_SIZE', 2):
+        await service._add_nodes(nodes)
+
+    # Chunks are grouped by length, shortest first, at most two per forward pass
+    assert embed_model.batches == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    # Every node gets its own row back regardless of batch order
+    service.chunk_store.add.assert_called_once()
+    added_nodes, embeddings = service.chunk_store.add.call_args.args
+    assert added_nodes == nodes
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (5, 3)
+    assert embeddings[:, 0].tolist() == [3.0, 1.0, 4.0, 2.0, 5.0]
+
+@pytest.mark.asyncio
+async def test_add_nodes_reuses_cached_embeddings(mock_vector_store, tmp_path):
+    embed_model = RecordingEmbedding()
+    embed_model.batches = []
+    service = await create_index_service(mock_vector_store, embed_model)
+    service.embedding_cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), "test-model")
+
+    await service._add_nodes([TextNode(text="shared"), TextNode(text="first")])
+    nodes = [TextNode(text="shared"), TextNode(text="second"), TextNode(text="second")]
+    await service._add_nodes(nodes)
+
+    # Known texts come from the cache and duplicates are embedded once
+    assert embed_model.batches == [["first", "shared"], ["second"]]
+    _, embeddings = service.chunk_store.add.call_args.args
+    assert embeddings[:, 0].tolist() == [6.0, 6.0, 6.0]
+
+@pytest.mark.asyncio
+async def test_update_chunks_patches_metadata_in_place(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    ids = [chunk_uuid("doc-1", i) for i in range(2)]
+
+    with patch('app.services.index_service.settings.WEAVIATE_WORKERS', 1):
+        await service.update_chunks({chunk: {"tags": ["faq"]} for chunk in ids})
+
+    service.chunk_store.update_chunks.assert_called_once_with({chunk: {"tags": ["faq"]} for chunk in ids}, None)
+    service.chunk_store.delete.assert_not_called()
+    service.chunk_store.add.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_chunks_refuses_fields_ingestion_maintains(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+
+    with pytest.raises(ValueError):
+        await service.update_chunks({chunk_uuid("doc-1", 0): {"chunk_id": 5, "tags": ["faq"]}})
+
+    service.chunk_store.update_chunks.assert_not_called()
+    # Nor the references llama_index rebuilds nodes from
+    for field in ("ref_doc_id", "_node_content", "filename"):
+        with pytest.raises(ValueError):
+            await service.update_chunks({chunk_uuid("doc-1", 0): {field: "other"}})
+
+@pytest.mark.asyncio
+async def test_update_chunks_spreads_large_updates_over_the_store_threads(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    updates = {chunk_uuid("doc-1", i): {"tags": ["faq"]} for i in range(10)}
+
+    with patch('app.services.index_service.settings.WEAVIATE_WORKERS', 4):
+        await service.update_chunks(updates)
+
+    parts = [call.args[0] for call in service.chunk_store.update_chunks.call_args_list]
+    assert sorted(len(part) for part in parts) == [2, 2, 3, 3]
+    assert {uuid: update for part in parts for uuid, update in part.items()} == updates
+
+@pytest.mark.asyncio
+async def test_chunk_store_calls_run_on_weaviate_threads(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    threads = []
+
+    def add(nodes, embeddings, properties=None):
+        threads.append(threading.current_thread().name)
+        return [node.node_id for node in nodes]
+
+    service.chunk_store.add.side_effect = add
+
+    await service.index_document(b"test content", "test.txt", "user123")
+
+    assert threads and all(name.startswith("weaviate") for name in threads)
+
+def test_tenant_names():
+    with patch('app.services.index_service.settings.WEAVIATE_MULTI_TENANCY', False):
+        assert tenant_name("42") is None
+    with patch('app.services.index_service.settings.WEAVIATE_MULTI_TENANCY', True), \
+            patch('app.services.index_service.settings.WEAVIATE_TENANT_GROUPS', 0):
+        assert tenant_name("42") == "user-42"
+        assert tenant_name("a@b.c").startswith("user-") and "@" not in tenant_name("a@b.c")
+    with patch('app.services.index_service.settings.WEAVIATE_MULTI_TENANCY', True), \
+            patch('app.services.index_service.settings.WEAVIATE_TENANT_GROUPS', 4):
+        assert tenant_name("42") in {f"group-{i}" for i in range(4)}
+
+@pytest.mark.asyncio
+async def test_document_shared_across_tenants_is_copied_not_reembedded(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.tenant_root = MagicMock()
+    service.tenant_root.for_tenant.side_effect = lambda tenant: MagicMock(tenant=tenant)
+    content = b"shared content"
+    doc_id = service.document_id(content)
+    service.catalog.get.return_value = {"doc_id": doc_id, "file_size": len(content), "users": ["alice"]}
+
+    with patch('app.services.index_service.settings.WEAVIATE_MULTI_TENANCY', True), \
+            patch('app.services.index_service.settings.WEAVIATE_TENANT_GROUPS', 0):
+        await service.index_document(content, "copy.txt", "bob")
+
+    source = service.tenant_stores["user-alice"]
+    target = service.tenant_stores["user-bob"]
+    source.copy_document.assert_called_once_with(doc_id, target)
+    target.add.assert_not_called()
+    service.catalog.add.assert_awaited_once_with(doc_id, "bob", "copy.txt", len(content))
+
+@pytest.mark.asyncio
+async def test_delete_document_removes_only_the_users_tenant_copy(mock_vector_store, mock_embed_model):
+    service = await create_index_service(mock_vector_store, mock_embed_model)
+    service.tenant_root = MagicMock()
+    service.tenant_root.for_tenant.side_effect = lambda tenant: MagicMock(tenant=tenant)
+    service.catalog.remove.return_value = 1
+    service.catalog.get.return_value = {"doc_id": "123", "file_size": 10, "users": ["alice"]}
+
+    with patch('app.services.index_service.settings.WEAVIATE_MULTI_TENANCY', True), \
+            patch('app.services.index_service.settings.WEAVIATE_TENANT_GROUPS', 0):
+        await service.delete_document("123", "bob")
+
+    # Alice still has the document, but in her own tenant
+    service.tenant_stores["user-bob"].detach_document.assert_called_once_with("123")
+    service.searcher.delete_document.assert_awaited_once_with("123", tenant="user-bob")
+
+@pytest.mark.asyncio
+async def test_local_backend_indexes_searches_and_deletes_without_weaviate(mock_embed_model, tmp_path):
+    with patch('app.services.index_service.create_embedding_model', return_value=mock_embed_model), \
+            patch('app.services.index_service.create_vector_store') as create_vector_store, \
+            patch('app.services.index_service.settings.VECTOR_STORE_BACKEND', "local"), \
+            patch('app.services.index_service.settings.LOCAL_VECTOR_STORE_PATH', str(tmp_path)), \
+            patch('app.services.index_service.settings.EMBEDDING_CACHE_ENABLED', False):
+        service = LlamaIndexService(create_catalog())
+        await service.initialize()
+    create_vector_store.assert_not_called()
+
+    doc_id = await service.index_document(b"local content", "local.txt", "user123")
+    service.catalog.user_documents.return_value = [{"id": doc_id, "filename": "local.txt"}]
+    results = await service.query("content", "user123", query_embedding=np.array([0.1, 0.2, 0.3], dtype=np.float32))
+
+    assert [(result["text"], result["filename"]) for result in results] == [("local content", "local.txt")]
+    assert results[0]["similarity_score"] == pytest.approx(1.0)
+
+    await service.delete_document(doc_id, "user123")
+    assert await service.query("content", "user123", query_embedding=np.ones(3, dtype=np.float32)) == []
+    await service.close()
@@ -0,0 +1,259 @@
+import asyncio
+import io
+import time
+
+import pytest
+import pytest_asyncio
+from fakeredis import FakeAsyncRedis
+from unittest.mock import AsyncMock, patch
+
+from app.services.ingestion_service import (
+    IngestionService, JOB_KEY, PROCESSING_KEY, QUEUE_KEY, SPOOL_ID_KEY, SPOOL_MARKER, WORKERS_KEY
+)
+
+
+class FakeIndexService:
+    """Records ingested documents and lets tests hold jobs mid-flight"""
+
+    def __init__(self):
+        self.indexed = []
+        self.existing = {}
+        self.running = 0
+        self.max_running = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    def document_id(self, content):
+        content.seek(0)
+        doc_id = f"doc-{content.read().decode()}"
+        content.seek(0)
+        return doc_id
+
+    async def existing_documents(self, doc_ids):
+        return {doc_id: self.existing[doc_id] for doc_id in doc_ids if doc_id in self.existing}
+
+    async def index_document(self, content, filename, user_id, progress=None):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await progress("indexing", 0.5)
+            await self.release.wait()
+            if filename == "broken.txt":
+                raise ValueError("unreadable document")
+            self.indexed.append((filename, user_id, content.read()))
+        finally:
+            self.running -= 1
+        return self.document_id(content)
+
+
+@pytest_asyncio.fixture
+async def service(tmp_path):
+    redis = FakeAsyncRedis(decode_responses=True)
+    cache_service = AsyncMock()
+    cache_service.get_client.return_value = redis
+    index_service = FakeIndexService()
+    with patch.multiple(
+        "app.services.ingestion_service.settings",
+        INGEST_SPOOL_DIR=str(tmp_path),
+        INGEST_WORKERS=3,
+        INGEST_MAX_CONCURRENT=2,
+        INGEST_MAX_PER_USER=1,
+        INGEST_POLL_INTERVAL=0.01
+    ):
+        service = IngestionService(cache_service, index_service)
+        await service.initialize()
+        yield service
+        await service.close()
+    await redis.aclose()
+
+
+def payloads(spool):
+    return [path.name for path in spool.iterdir() if path.name != SPOOL_MARKER]
+
+
+async def wait_for(service, job_id, user_id, status, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await service.get_job(job_id, user_id)
+        if job["status"] == status:
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job stuck in {job}"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_submitted_job_is_indexed(service, tmp_path):
+    job = await service.submit(io.BytesIO(b"document body"), "notes.txt", "user1")
+
+    assert job["status"] == "queued"
+    assert job["doc_id"] == "doc-document body"
+    done = await wait_for(service, job["id"], "user1", "done")
+
+    assert done["stage"] == "done"
+    assert done["progress"] == 1.0
+    assert service.index_service.indexed == [("notes.txt", "user1", b"document body")]
+    # The spooled payload is removed once the job has run
+    assert payloads(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_progress_is_reported_per_stage(service):
+    service.index_service.release.clear()
+    job = await service.submit(io.BytesIO(b"body"), "notes.txt", "user1")
+
+    running = await wait_for(service, job["id"], "user1", "running")
+    while running["stage"] != "indexing":
+        await asyncio.sleep(0.01)
+        running = await service.get_job(job["id"], "user1")
+    # Halfway through indexing, which spans 0% to 95% overall
+    assert running["progress"] == pytest.approx(0.475)
+
+    service.index_service.release.set()
+    await wait_for(service, job["id"], "user1", "done")
+
+
+@pytest.mark.asyncio
+async def test_failed_job_reports_error(service):
+    job = await service.submit(io.BytesIO(b"body"), "broken.txt", "user1")
+
+    failed = await wait_for(service, job["id"], "user1", "failed")
+
+    assert failed["error"] == "unreadable document"
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_private_to_their_user(service):
+    job = await service.submit(io.BytesIO(b"body"), "notes.txt", "user1")
+
+    assert await service.get_job(job["id"], "user2") is None
+    assert await service.get_job("missing", "user1") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limits(service):
+    index_service = service.index_service
+    index_service.release.clear()
+    jobs = [
+        await service.submit(io.BytesIO(b"body"), f"{user}-{i}.txt", user)
+        for user in ("user1", "user2", "user3")
+        for i in range(2)
+    ]
+
+    await asyncio.sleep(0.3)
+    # Three workers, but only two documents at once and one per user
+    assert index_service.running == 2
+    running = [
+        job for job in jobs
+        if (await service.get_job(job["id"], job["filename"].split("-")[0]))["status"] == "running"
+    ]
+    assert len({job["filename"].split("-")[0] for job in running}) == 2
+
+    index_service.release.set()
+    for job in jobs:
+        await wait_for(service, job["id"], job["filename"].split("-")[0], "done")
+    assert index_service.max_running == 2
+    assert await service._redis.llen(QUEUE_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_close_requeues_running_jobs(service, tmp_path):
+    service.index_service.release.clear()
+    job = await service.submit(io.BytesIO(b"body"), "notes.txt", "user1")
+    await wait_for(service, job["id"], "user1", "running")
+
+    await service.close()
+    await asyncio.sleep(0.05)
+
+    assert (await service.get_job(job["id"], "user1"))["status"] == "queued"
+    assert await service._redis.lrange(QUEUE_KEY, 0, -1) == [job["id"]]
+    assert await service._redis.keys(PROCESSING_KEY.format("*")) == []
+    # The payload stays on disk for the worker that picks the job up again
+    assert payloads(tmp_path) == [job["id"]]
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_a_killed_worker_are_requeued(service, tmp_path):
+    job = {
+        "id": "lost", "user_id": "user1", "doc_id": "doc-body", "filename": "notes.txt", "status": "running",
+        "stage": "indexing", "progress": 0.5, "error": "", "created_at": 0.0, "updated_at": 0.0
+    }
+    (tmp_path / "lost").write_bytes(b"body")
+    # Taken off the queue by a worker of a process that died without a word
+    await service._redis.hset(JOB_KEY.format("lost"), mapping=job)
+    await service._redis.lpush(PROCESSING_KEY.format("dead:0"), "lost")
+    await service._redis.zadd(WORKERS_KEY, {"dead:0": time.time() - 1})
+
+    await service._recover()
+
+    await wait_for(service, "lost", "user1", "done")
+    assert service.index_service.indexed == [("notes.txt", "user1", b"body")]
+    assert await service._redis.exists(PROCESSING_KEY.format("dead:0")) == 0
+    assert "dead:0" not in await service._redis.zrange(WORKERS_KEY, 0, -1)
+
+
+@pytest.mark.asyncio
+async def test_bulk_job_reports_each_file(service, tmp_path):
+    service.index_service.existing = {"doc-known": {"users": ["user1"]}}
+    files = [
+        (io.BytesIO(b"first"), "first.txt"),
+        (io.BytesIO(b"known"), "known.txt"),
+        (io.BytesIO(b"first"), "copy-of-first.txt"),
+        (io.BytesIO(b"broken"), "broken.txt"),
+    ]
+
+    job = await service.submit_bulk(files, "user1", rejected=[("tool.exe", "File type not allowed")])
+    done = await wait_for(service, job["id"], "user1", "done")
+
+    statuses = {entry["filename"]: (entry["status"], entry["error"]) for entry in done["files"]}
+    assert statuses == {
+        "tool.exe": ("rejected", "File type not allowed"),
+        "first.txt": ("done", None),
+        "known.txt": ("exists", None),
+        "copy-of-first.txt": ("duplicate", None),
+        "broken.txt": ("failed", "unreadable document"),
+    }
+    assert [name for name, _, _ in service.index_service.indexed] == ["first.txt"]
+    assert done["progress"] == 1.0
+    assert payloads(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_job_with_nothing_to_index_is_done_at_once(service):
+    service.index_service.existing = {"doc-known": {"users": ["user1"]}}
+
+    job = await service.submit_bulk([(io.BytesIO(b"known"), "known.txt")], "user1")
+
+    assert job["status"] == "done"
+    assert await service._redis.llen(QUEUE_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_spool_that_other_workers_cannot_see_is_refused(service, tmp_path):
+    # Another host, sharing the queue but with a spool of its own
+    other_spool = tmp_path / "other-host"
+    other = IngestionService(service.cache_service, service.index_service)
+    with patch("app.services.ingestion_service.settings.INGEST_SPOOL_DIR", str(other_spool)):
+        with pytest.raises(RuntimeError, match="shared volume"):
+            await other.initialize()
+
+    # A second process on the shared spool starts fine
+    again = IngestionService(service.cache_service, service.index_service)
+    await again.initialize()
+    await again.close()
+
+
+@pytest.mark.asyncio
+async def test_spool_id_lapses_once_its_workers_are_gone(service, tmp_path):
+    # Renewed while workers run
+    await service._redis.pexpire(SPOOL_ID_KEY, 1000)
+    await service._claim_spool()
+    assert await service._redis.pttl(SPOOL_ID_KEY) > 1000
+
+    # The spool volume is recreated after every process stopped
+    await service.close()
+    await service._redis.pexpire(SPOOL_ID_KEY, 1)
+    await asyncio.sleep(0.01)
+    recreated = IngestionService(service.cache_service, service.index_service)
+    with patch("app.services.ingestion_service.settings.INGEST_SPOOL_DIR", str(tmp_path / "recreated")):
+        await recreated.initialize()
+        await recreated.close()
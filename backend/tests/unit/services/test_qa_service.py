@@ -102,3 +102,29 @@ async def test_get_answer_exception(dummy_user):
     assert response["answer"].startswith("Error:")
     assert response["context"]["source_nodes"] == []
     assert response["context"]["time_taken"] == 0
+
+# Test that the question is embedded once and handed to document retrieval.
+@pytest.mark.asyncio
+async def test_get_answer_embeds_question_once(dummy_user):
+    qa = QAService()
+    fake_llm = AsyncMock()
+    fake_llm.current_provider = "cloud"
+    fake_llm.generate_answer.return_value = {"answer": "dummy answer"}
+    fake_llm.is_db_question.return_value = False
+
+    fake_index = AsyncMock()
+    fake_index.embed_query.return_value = [0.1, 0.2, 0.3]
+    fake_index.query.return_value = [{"filename": "doc1.txt", "text": "doc content"}]
+
+    fake_url = AsyncMock()
+    fake_url.extract_urls.return_value = []
+
+    with patch("app.services.qa_service.PromptGenerator.format_prompt", return_value="dummy prompt"):
+        qa.initialize(fake_llm, fake_index, fake_url, None)
+        response = await qa.get_answer("What is the answer?", dummy_user)
+
+    fake_index.embed_query.assert_awaited_once_with("What is the answer?")
+    fake_index.query.assert_awaited_once_with(
+        "What is the answer?", "1", query_embedding=[0.1, 0.2, 0.3]
+    )
+    assert response["answer"] == "dummy answer"
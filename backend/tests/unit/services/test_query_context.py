@@ -0,0 +1,50 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.query_context import QueryContext
+
+
+class CountingEmbed:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, text: str) -> np.ndarray:
+        self.calls.append(text)
+        await asyncio.sleep(0.01)
+        return np.array([float(len(text)), 1.0], dtype=np.float32)
+
+
+@pytest.mark.asyncio
+async def test_embedding_is_lazy():
+    embed = CountingEmbed()
+    ctx = QueryContext("question", "user123", embed)
+
+    assert not ctx.has_embedding
+    assert embed.calls == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stages_share_one_embedding():
+    embed = CountingEmbed()
+    ctx = QueryContext("question", "user123", embed)
+
+    vectors = await asyncio.gather(*(ctx.embedding() for _ in range(4)))
+    vectors.append(await ctx.embedding())
+
+    assert embed.calls == ["question"]
+    assert all(vector is vectors[0] for vector in vectors)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stage_does_not_cancel_embedding():
+    embed = CountingEmbed()
+    ctx = QueryContext("question", "user123", embed)
+
+    stage = asyncio.ensure_future(ctx.embedding())
+    await asyncio.sleep(0)
+    stage.cancel()
+
+    assert (await ctx.embedding()).tolist() == [8.0, 1.0]
+    assert embed.calls == ["question"]
@@ -0,0 +1,239 @@
+import asyncio
+import io
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from unittest.mock import patch
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.utils import document_utils
+from app.utils.async_utils import iterate_in_thread
+from app.utils.document_utils import (
+    extract_html_blocks,
+    extract_text_from_pdf,
+    iter_document_segments,
+    iter_pdf_pages,
+)
+from app.utils.exceptions import DocumentExtractionError
+
+
+def pdf_bytes(pages):
+    """A PDF with one line of Helvetica text per page"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def docx_bytes(paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", xml)
+    return buffer.getvalue()
+
+
+def test_text_segments_end_on_blank_lines():
+    content = b"first block\nstill first\n\nsecond block\n\n\nthird block\n"
+
+    segments = list(iter_document_segments(io.BytesIO(content), "notes.txt", min_chars=20))
+
+    assert [text for text, _ in segments] == [
+        "first block\nstill first\n",
+        "second block\n\nthird block\n",
+    ]
+    assert segments[-1][1] == 1.0
+
+
+def test_docx_segments_are_read_paragraph_by_paragraph():
+    content = docx_bytes(["one", "two", "three"])
+
+    segments = list(iter_document_segments(content, "report.docx", min_chars=1))
+
+    assert [text for text, _ in segments] == ["one\n", "two\n", "three\n"]
+    fractions = [fraction for _, fraction in segments]
+    assert fractions == sorted(fractions) and fractions[-1] <= 1.0
+
+
+PAGE = """<html><head><title>Plans</title><style>p { color: red }</style></head>
+<body>
+  <header><a href="/">Home</a> <a href="/shop">Shop</a></header>
+  <nav><ul><li><a href="/plans">Plans</a></li><li><a href="/help">Help</a></li></ul></nav>
+  <div class="related"><a href="/a">Fiber</a> | <a href="/b">DSL</a></div>
+  <h1>Fiber   plans</h1>
+  <p>All plans include a <b>free</b> router and <a href="/install">installation</a>.</p>
+  <!-- tracking pixel -->
+  <script>track("pageview")</script>
+  <table><tr><th>Plan</th><th>Price</th></tr><tr><td>Basic</td><td>10</td></tr></table>
+  <footer>Copyright ACME</footer>
+</body></html>"""
+
+
+def test_html_blocks_drop_markup_and_boilerplate():
+    assert extract_html_blocks(PAGE) == [
+        "Fiber plans",
+        "All plans include a free router and installation.",
+        "Plan Price",
+        "Basic 10",
+    ]
+    # Bytes in a legacy encoding go by the page's charset
+    latin = '<html><head><meta charset="iso-8859-1"></head><body><p>caf\xe9</p></body></html>'
+    assert extract_html_blocks(latin.encode("latin-1")) == ["caf\xe9"]
+
+
+def test_html_blocks_keep_only_main_content_when_marked_up():
+    page = "<body><aside><p>Sidebar</p></aside><main><p>Article</p></main><p>Teaser</p></body>"
+
+    assert extract_html_blocks(page) == ["Article"]
+
+
+def test_html_nested_articles_are_collected_once():
+    page = (
+        "<body><article><header><h1>Release notes</h1></header><p>Intro</p>"
+        "<article><p>Comment</p></article></article></body>"
+    )
+
+    # The article's own header is its title, not page chrome
+    assert extract_html_blocks(page) == ["Release notes", "Intro", "Comment"]
+
+
+def test_html_forms_keep_their_text_but_not_their_controls():
+    page = (
+        '<body><form action="/postback"><h1>Terms</h1><p>Read these first.</p>'
+        '<input type="text" value="search"><select><option>English</option></select>'
+        "<button>Accept</button></form></body>"
+    )
+
+    assert extract_html_blocks(page) == ["Terms", "Read these first."]
+
+
+def test_html_segments_are_extracted_text():
+    segments = list(iter_document_segments(io.BytesIO(PAGE.encode()), "plans.html", min_chars=1))
+
+    text = "\n".join(text for text, _ in segments)
+    assert "track(" not in text and "<" not in text and "Copyright" not in text
+    assert segments[-1][1] == 1.0
+
+
+def test_pdf_pages_are_extracted_in_order_across_tasks():
+    content = pdf_bytes([f"page {i}" for i in range(7)])
+
+    with patch('app.utils.document_utils.settings.EXTRACT_PAGES_PER_TASK', 2):
+        pages = list(iter_pdf_pages(io.BytesIO(content), timeout=60))
+
+    assert [text for text, _ in pages] == [f"page {i}" for i in range(7)]
+    assert pages[-1][1] == 1.0
+    assert extract_text_from_pdf(content) == "\n".join(f"page {i}" for i in range(7))
+
+
+def stuck_on_long_ranges(buffer_name, size, start, stop):
+    if stop - start > 1:
+        time.sleep(60)
+    return document_utils._pdf_page_texts(buffer_name, size, start, stop)
+
+
+@pytest.fixture
+def single_worker():
+    document_utils.shutdown_extraction_pool()
+    with patch('app.utils.document_utils.settings.EXTRACT_WORKERS', 1):
+        yield
+    document_utils.shutdown_extraction_pool(terminate=True)
+
+
+def test_timed_out_extraction_leaves_other_documents_running(single_worker):
+    stuck = pdf_bytes(["first", "second"])
+    other = pdf_bytes(["only page"])
+
+    with ThreadPoolExecutor(2) as threads, \
+            patch('app.utils.document_utils._pdf_page_texts', stuck_on_long_ranges):
+        stuck_pages = threads.submit(lambda: list(iter_pdf_pages(stuck, timeout=2.0)))
+        time.sleep(0.5)
+        # Queued behind the stuck range for longer than its own timeout
+        other_pages = threads.submit(lambda: list(iter_pdf_pages(other, timeout=1.0)))
+
+        with pytest.raises(DocumentExtractionError, match="timed out"):
+            stuck_pages.result()
+        assert [text for text, _ in other_pages.result()] == ["only page"]
+
+
+def test_crashed_worker_is_replaced(single_worker):
+    pool = document_utils.get_extraction_pool()
+
+    with pytest.raises(DocumentExtractionError, match="crashed"):
+        pool.submit(os._exit, 1).result()
+    assert pool.submit(pow, 2, 10).result() == 1024
+
+
+def test_invalid_pdf_is_an_extraction_error():
+    with pytest.raises(DocumentExtractionError):
+        list(iter_pdf_pages(b"%PDF-1.7 not really", timeout=60))
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_thread_applies_backpressure():
+    produced = []
+
+    def numbers():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    received = []
+    async with aclosing(iterate_in_thread(numbers, maxsize=2)) as items:
+        async for item in items:
+            received.append(item)
+            if item == 0:
+                await asyncio.sleep(0.1)
+                # The producer stalls once the queue is full instead of running ahead
+                assert len(produced) <= 4
+
+    assert received == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_thread_reraises_and_stops_producer():
+    finished = threading.Event()
+
+    def failing():
+        yield 1
+        raise ValueError("broken page")
+
+    def endless():
+        try:
+            while True:
+                yield 0
+        finally:
+            finished.set()
+
+    with pytest.raises(ValueError):
+        async for _ in iterate_in_thread(failing):
+            pass
+
+    async with aclosing(iterate_in_thread(endless)) as items:
+        async for _ in items:
+            break
+    assert finished.wait(1)
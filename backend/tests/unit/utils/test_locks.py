@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.utils.exceptions import LockError
+from app.utils.locks import LocalLocks, RedisLock
+
+
+@pytest.fixture
+def redis():
+    return FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_excludes_other_holders(redis):
+    order = []
+
+    async def hold(name):
+        async with RedisLock(redis, "lock:doc", poll_interval=0.01):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.05)
+            order.append(f"{name} out")
+
+    await asyncio.gather(hold("a"), hold("b"))
+
+    assert order in (["a in", "a out", "b in", "b out"], ["b in", "b out", "a in", "a out"])
+    assert await redis.get("lock:doc") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_times_out(redis):
+    async with RedisLock(redis, "lock:doc"):
+        with pytest.raises(LockError):
+            await RedisLock(redis, "lock:doc", timeout=0.05, poll_interval=0.01).acquire()
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_lease_is_renewed_while_held(redis):
+    async with RedisLock(redis, "lock:doc", lease=0.1):
+        await asyncio.sleep(0.3)
+        assert await redis.get("lock:doc") is not None
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_expires_when_holder_dies(redis):
+    # A holder that never releases, like a crashed process
+    await redis.set("lock:doc", "dead-token", px=50)
+
+    async with RedisLock(redis, "lock:doc", timeout=1.0, poll_interval=0.01) as lock:
+        assert await redis.get("lock:doc") == lock._token
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_release_keeps_lock_taken_over_by_another_holder(redis):
+    lock = RedisLock(redis, "lock:doc")
+    await lock.acquire()
+    # The lease ran out and someone else took the lock
+    await redis.set("lock:doc", "other-token")
+
+    await lock.release()
+
+    assert await redis.get("lock:doc") == "other-token"
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_lost_while_held_stops_the_holder(redis):
+    writes = []
+
+    with pytest.raises(LockError):
+        async with RedisLock(redis, "lock:doc", lease=0.1):
+            # The lease ran out and someone else took the lock
+            await redis.set("lock:doc", "other-token")
+            for i in range(10):
+                await asyncio.sleep(0.05)
+                writes.append(i)
+
+    # Cancelled at the first renewal after the takeover
+    assert len(writes) < 3
+    assert await redis.get("lock:doc") == "other-token"
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_is_lost_when_redis_stays_unreachable(redis):
+    lock = RedisLock(redis, "lock:doc", lease=0.1)
+    with pytest.raises(LockError):
+        async with lock:
+            redis.eval = AsyncMock(side_effect=ConnectionError("redis is down"))
+            await asyncio.sleep(1)
+    assert lock.lost
+
+
+@pytest.mark.asyncio
+async def test_local_locks_serialize_same_name_and_forget_released_locks():
+    locks = LocalLocks()
+    order = []
+
+    async def hold(name):
+        async with locks.lock("doc"):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} out")
+
+    await asyncio.gather(hold("a"), hold("b"))
+
+    assert order == ["a in", "a out", "b in", "b out"]
+    assert locks._locks == {}
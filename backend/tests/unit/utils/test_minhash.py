@@ -0,0 +1,21 @@
+import random
+
+from app.utils.minhash import MinHasher
+
+
+WORDS = "contract customer payment router fiber support notice period refund service".split()
+
+
+def text(seed, words=300):
+    return " ".join(random.Random(seed).choices(WORDS, k=words))
+
+
+def test_signatures_estimate_similarity():
+    hasher = MinHasher()
+    original = text(1)
+    edited = original.replace("router", "modem", 1)
+
+    assert hasher.similarity(hasher.signature(original), hasher.signature(original.upper())) == 1.0
+    assert hasher.similarity(hasher.signature(original), hasher.signature(edited)) > 0.9
+    assert hasher.similarity(hasher.signature(original), hasher.signature(text(2))) < 0.3
+
@@ -0,0 +1,154 @@
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from app.utils.uploads import UploadReceiver
+from app.utils.validators import FileValidator
+
+
+BOUNDARY = "test-boundary"
+
+
+class StreamingRequest:
+    """Minimal stand-in for a starlette Request that records how much was read"""
+
+    def __init__(self, body: bytes, chunk_size: int = 1024, content_length: bool = False):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.consumed = 0
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+        if content_length:
+            self.headers["content-length"] = str(len(body))
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            chunk = self.body[start:start + self.chunk_size]
+            self.consumed += len(chunk)
+            yield chunk
+
+
+def multipart_body(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def validator():
+    return FileValidator({"txt", "pdf"}, max_size=64 * 1024)
+
+
+@pytest.mark.asyncio
+async def test_receive_spools_file(validator):
+    content = b"hello world\n" * 1000
+    receiver = UploadReceiver(validator)
+    try:
+        upload = await receiver.receive(StreamingRequest(multipart_body("notes.txt", content)))
+        assert upload.filename == "notes.txt"
+        assert upload.size == len(content)
+        assert await upload.read() == content
+    finally:
+        receiver.close()
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_rejected_while_streaming(validator):
+    request = StreamingRequest(multipart_body("big.txt", b"a" * 1024 * 1024))
+    with pytest.raises(HTTPException, match="too large"):
+        await UploadReceiver(validator).receive(request)
+    # Reading stopped shortly after the limit instead of at the end of the body
+    assert request.consumed < validator.max_size + 2 * request.chunk_size
+
+
+@pytest.mark.asyncio
+async def test_oversized_content_length_rejected_before_reading(validator):
+    request = StreamingRequest(multipart_body("big.txt", b"a" * 1024 * 1024), content_length=True)
+    with pytest.raises(HTTPException, match="too large"):
+        await UploadReceiver(validator).receive(request)
+    assert request.consumed == 0
+
+
+@pytest.mark.asyncio
+async def test_mismatched_content_rejected_after_header(validator):
+    request = StreamingRequest(multipart_body("report.pdf", b"plain text " * 5000))
+    with pytest.raises(HTTPException, match="doesn't match"):
+        await UploadReceiver(validator).receive(request)
+    # Only the sniffing window had to arrive before the upload was refused
+    assert request.consumed < FileValidator.HEADER_SIZE + 2 * request.chunk_size
+
+
+@pytest.mark.asyncio
+async def test_bulk_receive_sets_bad_files_aside(validator):
+    body = b"".join(
+        (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + content + b"\r\n"
+        for filename, content in [
+            ("notes.txt", b"plain notes"),
+            ("report.pdf", b"plain text " * 5000),
+            ("big.txt", b"a" * 100 * 1024),
+            ("more.txt", b"more notes"),
+        ]
+    ) + f"--{BOUNDARY}--\r\n".encode()
+    receiver = UploadReceiver(validator, field_name="files", max_files=10, max_total_size=1024 * 1024)
+    try:
+        uploads = await receiver.receive_all(StreamingRequest(body))
+        assert [(upload.filename, await upload.read()) for upload in uploads] == [
+            ("notes.txt", b"plain notes"),
+            ("more.txt", b"more notes"),
+        ]
+        assert [filename for filename, _ in receiver.rejected] == ["report.pdf", "big.txt"]
+    finally:
+        receiver.close()
+
+
+def archive_upload(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename="bundle.zip")
+
+
+def archive_receiver(validator, members, **limits):
+    receiver = UploadReceiver(validator, field_name="files", archive_extensions={"zip"}, **limits)
+    receiver.uploads = [archive_upload(members)]
+    return receiver
+
+
+def test_archive_members_are_expanded(validator):
+    receiver = archive_receiver(validator, [("a.txt", b"first"), ("b.txt", b"second")], max_files=2)
+
+    uploads = receiver.expand_archives()
+
+    assert [(upload.filename, upload.file.read()) for upload in uploads] == [
+        ("bundle.zip/a.txt", b"first"), ("bundle.zip/b.txt", b"second")
+    ]
+    receiver.close()
+
+
+def test_archive_with_too_many_members_is_refused_before_extracting(validator):
+    receiver = archive_receiver(validator, [(f"{i}.txt", b"notes") for i in range(3)], max_files=2)
+
+    with pytest.raises(HTTPException, match="Too many files"):
+        receiver.expand_archives()
+    assert receiver.rejected == []
+
+
+def test_archive_declaring_too_many_bytes_is_refused_before_extracting(validator):
+    # Compresses far below the limit, but unpacks above it
+    receiver = archive_receiver(
+        validator, [(f"{i}.txt", b"a" * 60 * 1024) for i in range(3)], max_files=10, max_total_size=100 * 1024
+    )
+
+    with pytest.raises(HTTPException, match="too large"):
+        receiver.expand_archives()
+    assert receiver._unpacked == 0
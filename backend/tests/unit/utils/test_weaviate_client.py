@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from weaviate.classes.config import VectorFilterStrategy
+from weaviate.collections.classes.config import _BQConfig
+
+from app.utils.weaviate_client import update_vector_index, vector_index_config
+
+
+def existing(quantizer=None, **index):
+    config = dict(ef_construction=128, max_connections=64, ef=-1, filter_strategy=VectorFilterStrategy.SWEEPING)
+    collection = MagicMock()
+    collection.name = "Documents"
+    collection.config.get.return_value.vector_index_config = SimpleNamespace(
+        quantizer=quantizer, **{**config, **index}
+    )
+    return collection
+
+
+def test_unchanged_index_is_left_alone():
+    collection = existing()
+
+    assert update_vector_index(collection) is False
+    collection.config.update.assert_not_called()
+
+
+def test_mutable_settings_are_applied_in_place():
+    collection = existing()
+
+    with patch('app.utils.weaviate_client.settings.WEAVIATE_HNSW_EF', 256), \
+            patch('app.utils.weaviate_client.settings.WEAVIATE_FILTER_STRATEGY', "acorn"), \
+            patch('app.utils.weaviate_client.settings.WEAVIATE_COMPRESSION', "sq"):
+        assert update_vector_index(collection) is True
+
+    index = collection.config.update.call_args.kwargs["vector_index_config"]
+    assert index.ef == 256 and index.filterStrategy == VectorFilterStrategy.ACORN
+    assert index.quantizer is not None
+
+
+def test_compression_is_not_switched_in_place():
+    collection = existing(quantizer=_BQConfig.__new__(_BQConfig), max_connections=32)
+
+    with patch('app.utils.weaviate_client.settings.WEAVIATE_COMPRESSION', "pq"):
+        # Needs a rebuild, like the neighbour count; only logged
+        assert update_vector_index(collection) is False
+    collection.config.update.assert_not_called()
+
+
+def test_unknown_compression_is_rejected():
+    with patch('app.utils.weaviate_client.settings.WEAVIATE_COMPRESSION', "zstd"):
+        with pytest.raises(ValueError):
+            vector_index_config()
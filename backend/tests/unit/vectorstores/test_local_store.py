@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+
+from app.utils.exceptions import VectorStoreError
+from app.vectorstores import LocalChunkStore, LocalSearcher
+from app.vectorstores import local_store
+
+
+def chunk(chunk_uuid, doc_id, chunk_id, text, **metadata):
+    return TextNode(
+        id_=chunk_uuid,
+        text=text,
+        metadata={
+            "doc_id": doc_id, "search_id": doc_id, "doc_ids": [doc_id],
+            "chunk_id": chunk_id, "total_chunks": 2, "chunk_hash": f"hash-{text}", **metadata
+        },
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)}
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalChunkStore(str(tmp_path / "vectors"))
+    store.add(
+        [chunk("a0", "doc-a", 0, "alpha intro"), chunk("a1", "doc-a", 1, "shared footer"),
+         chunk("b0", "doc-b", 0, "beta intro")],
+        np.array([[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0]], dtype=np.float32),
+        [{"minhash": [1, 2], "lsh_bands": ["band-1"]}, {"minhash": [3, 4], "lsh_bands": ["band-2"]},
+         {"minhash": [5, 6], "lsh_bands": ["band-1"]}]
+    )
+    yield store
+    store.close()
+
+
+def test_search_only_returns_chunks_of_the_given_documents(store):
+    hits = store.search(np.array([1, 0, 0], dtype=np.float32), ["doc-b"], 5)
+
+    assert [(hit.text, hit.doc_id, hit.chunk_id) for hit in hits] == [("beta intro", "doc-b", 0)]
+    assert hits[0].score == pytest.approx(0.9 / np.linalg.norm([0.9, 0.1]))
+
+
+def test_search_ranks_by_cosine_similarity(store):
+    hits = store.search(np.array([2, 0.1, 0], dtype=np.float32), ["doc-a", "doc-b"], 2)
+
+    assert [hit.text for hit in hits] == ["alpha intro", "beta intro"]
+
+
+def test_hybrid_search_favours_chunks_with_the_query_words(store):
+    hits = store.search(np.array([1, 0, 0], dtype=np.float32), ["doc-a"], 1, query="footer", alpha=0.3)
+
+    assert [hit.text for hit in hits] == ["shared footer"]
+
+
+def test_adding_a_chunk_again_replaces_it(store):
+    store.add([chunk("a0", "doc-a", 0, "alpha intro, second version")], np.array([[0, 0, 1]], dtype=np.float32))
+
+    hits = store.search(np.array([0, 0, 1], dtype=np.float32), ["doc-a"], 5)
+    assert hits[0].text == "alpha intro, second version"
+    assert len(hits) == 2
+
+
+def test_vectors_of_another_size_are_rejected(store):
+    with pytest.raises(VectorStoreError):
+        store.add([chunk("c0", "doc-c", 0, "gamma")], np.ones((1, 4), dtype=np.float32))
+
+
+def test_shared_chunks_are_found_through_every_owner_and_handed_over(store):
+    store.add_owner(["a1"], "doc-b")
+
+    assert [hit.text for hit in store.search(np.array([0, 1, 0], dtype=np.float32), ["doc-b"], 1)] == ["shared footer"]
+    # Shared chunks can't be reused by a new version of doc-a
+    assert store.chunk_hashes("doc-a") == {"hash-alpha intro": ["a0"]}
+
+    store.detach_document("doc-a")
+    store.delete_document("doc-a")
+
+    assert list(store.get(["a0", "a1"])) == ["a1"]
+    metadata = store.get(["a1"])["a1"]
+    assert metadata["search_id"] == "doc-b" and metadata["doc_ids"] == ["doc-b"]
+    hits = store.search(np.array([0, 1, 0], dtype=np.float32), ["doc-a", "doc-b"], 5)
+    assert [(hit.text, hit.doc_id) for hit in hits][0] == ("shared footer", "doc-b")
+
+
+def test_lsh_candidates_skip_first_chunks_and_other_documents(store):
+    store.add(
+        [chunk("b1", "doc-b", 1, "beta body")], np.array([[0, 0, 1]], dtype=np.float32),
+        [{"minhash": [7, 8], "lsh_bands": ["band-1"]}]
+    )
+
+    found = store.lsh_candidates(["band-1", "band-2"], ["doc-a"])
+
+    assert list(found) == ["a1"]
+    assert found["a1"]["search_id"] == "doc-a" and found["a1"]["chunk_hash"] == "hash-shared footer"
+    assert found["a1"]["minhash"].dtype == np.uint32 and found["a1"]["minhash"].tolist() == [3, 4]
+
+
+def test_update_chunks_moves_chunks_to_another_document(store):
+    store.update_chunks({"a1": {"chunk_id": 5, "search_id": "doc-c", "doc_ids": ["doc-c"]}}, "doc-c")
+
+    metadata = store.get(["a1"])["a1"]
+    assert metadata["chunk_id"] == 5
+    assert [hit.doc_id for hit in store.search(np.array([0, 1, 0], dtype=np.float32), ["doc-c"], 1)] == ["doc-c"]
+    assert store.delete_document("doc-c") == 1
+
+
+def test_store_is_reopened_from_disk(tmp_path):
+    path = str(tmp_path / "vectors")
+    store = LocalChunkStore(path)
+    store.add([chunk("a0", "doc-a", 0, "alpha intro")], np.array([[1, 0, 0]], dtype=np.float32))
+    store.close()
+
+    reopened = LocalChunkStore(path)
+    try:
+        assert [hit.text for hit in reopened.search(np.array([1, 0, 0], dtype=np.float32), ["doc-a"], 1)] == ["alpha intro"]
+    finally:
+        reopened.close()
+
+
+def test_store_is_open_in_one_process_at_a_time(tmp_path):
+    path = str(tmp_path / "vectors")
+    store = LocalChunkStore(path)
+
+    # Another process would hand out the same row numbers
+    with pytest.raises(VectorStoreError, match="another process"):
+        LocalChunkStore(path)
+
+    store.close()
+    LocalChunkStore(path).close()
+
+
+def test_dead_rows_are_compacted_away(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_store, "_COMPACT_MIN_ROWS", 4)
+    store = LocalChunkStore(str(tmp_path / "vectors"))
+    vectors = np.eye(4, dtype=np.float32)
+    store.add([chunk(f"a{i}", "doc-a", i, f"text {i}") for i in range(4)], vectors)
+
+    store.delete(["a0", "a1", "a2"])
+
+    assert store._rows == 1
+    hits = store.search(vectors[3], ["doc-a"], 5)
+    assert [(hit.text, hit.score) for hit in hits] == [("text 3", pytest.approx(1.0))]
+    store.close()
+
+
+def test_search_keeps_its_hits_when_compacted_meanwhile(tmp_path, monkeypatch):
+    store = LocalChunkStore(str(tmp_path / "vectors"))
+    vectors = np.eye(4, dtype=np.float32)
+    store.add([chunk(f"a{i}", "doc-a", i, f"text {i}") for i in range(4)], vectors)
+    store.delete(["a0", "a1"])
+    top = local_store._top
+
+    def compacting_top(scores, wanted):
+        # Renumbers the rows the search has already read
+        store.compact()
+        return top(scores, wanted)
+
+    monkeypatch.setattr(local_store, "_top", compacting_top)
+    hits = store.search(vectors[3], ["doc-a"], 1)
+
+    assert store._rows == 2
+    assert [(hit.text, hit.score) for hit in hits] == [("text 3", pytest.approx(1.0))]
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_searcher_runs_the_store_off_the_event_loop(store):
+    searcher = LocalSearcher(store)
+
+    hits = await searcher.search(np.array([1, 0, 0], dtype=np.float32), ["doc-a"], 1, tenant="ignored")
+    await searcher.delete_document("doc-b")
+
+    assert hits[0].text == "alpha intro"
+    assert store.search(np.array([1, 0, 0], dtype=np.float32), ["doc-b"], 1) == []
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.vectorstores import SearchHit, WeaviateSearcher
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.collections.get.return_value.query.hybrid = AsyncMock()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_search_requests_only_the_fields_it_returns(client):
+    hybrid = client.collections.get.return_value.query.hybrid
+    hybrid.return_value.objects = [
+        MagicMock(
+            properties={"text": "shared footer", "doc_id": "doc-a", "doc_ids": ["doc-a", "doc-b"],
+                        "chunk_id": 3, "total_chunks": 7},
+            metadata=MagicMock(score=0.9)
+        ),
+        MagicMock(
+            properties={"text": "old chunk", "doc_id": "doc-c", "doc_ids": None, "chunk_id": 0, "total_chunks": 1},
+            metadata=MagicMock(score=0.4)
+        ),
+    ]
+    searcher = WeaviateSearcher(client)
+    vector = np.ones(3, dtype=np.float32)
+
+    hits = await searcher.search(vector, ["doc-b", "doc-c"], 5)
+
+    kwargs = hybrid.call_args.kwargs
+    assert kwargs["vector"] is vector and kwargs["limit"] == 5
+    assert kwargs["query"] is None and kwargs["alpha"] == 1.0
+    assert set(kwargs["return_properties"]) == {"text", "doc_id", "doc_ids", "chunk_id", "total_chunks"}
+    assert "include_vector" not in kwargs
+    assert all(isinstance(hit, SearchHit) for hit in hits)
+    assert [(hit.text, hit.chunk_id, hit.score) for hit in hits] == [("shared footer", 3, 0.9), ("old chunk", 0, 0.4)]
+    assert list(hits[0].owners) == ["doc-a", "doc-b"]
+    # Chunks stored before sharing belong to their own document only
+    assert list(hits[1].owners) == ["doc-c"]
+
+
+def test_search_hits_have_no_instance_dict():
+    hit = SearchHit("text", "doc-a", (), 0, 1, 0.5)
+
+    assert not hasattr(hit, "__dict__")
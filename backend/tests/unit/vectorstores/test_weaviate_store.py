@@ -0,0 +1,193 @@
+import json
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from llama_index.core.schema import TextNode
+
+from app.utils.exceptions import VectorStoreError
+from app.vectorstores import WeaviateChunkStore
+from app.vectorstores import weaviate_store
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.batch.failed_objects = []
+    return client
+
+
+def test_add_passes_matrix_rows_as_vectors(client):
+    store = WeaviateChunkStore(client, index_name="Documents")
+    nodes = [
+        TextNode(text="first chunk", metadata={"search_id": "doc-1", "chunk_id": 0}),
+        TextNode(text="second chunk", metadata={"search_id": "doc-1", "chunk_id": 1}),
+    ]
+    embeddings = np.arange(6, dtype=np.float32).reshape(2, 3)
+
+    ids = store.add(nodes, embeddings)
+
+    assert ids == [node.node_id for node in nodes]
+    batch = client.batch.dynamic.return_value.__enter__.return_value
+    calls = batch.add_object.call_args_list
+    assert len(calls) == 2
+    for node, row, call in zip(nodes, embeddings, calls):
+        vector = call.kwargs["vector"]
+        # Each vector is a view into the matrix, not a copy or a list
+        assert isinstance(vector, np.ndarray) and np.shares_memory(vector, embeddings)
+        assert np.array_equal(vector, row)
+        assert call.kwargs["uuid"] == node.node_id
+        properties = call.kwargs["properties"]
+        assert properties["text"] == node.text
+        assert properties["search_id"] == "doc-1"
+        # The serialized node must not carry the embedding a second time
+        assert json.loads(properties["_node_content"])["embedding"] is None
+
+
+def test_add_raises_on_failed_objects(client):
+    client.batch.failed_objects = [MagicMock(message="vector dimension mismatch")]
+    store = WeaviateChunkStore(client)
+
+    with pytest.raises(VectorStoreError):
+        store.add([TextNode(text="chunk")], np.zeros((1, 3), dtype=np.float32))
+
+
+def test_add_rejects_mismatched_lengths(client):
+    store = WeaviateChunkStore(client)
+
+    with pytest.raises(ValueError):
+        store.add([TextNode(text="chunk")], np.zeros((2, 3), dtype=np.float32))
+
+
+def test_update_metadata_patches_serialized_node(client):
+    store = WeaviateChunkStore(client)
+    chunk_id = "6c5b5e5e-7d1c-4c5e-9a57-2f1f4d1a2b3c"
+    stored = MagicMock(uuid=chunk_id, properties={
+        "_node_content": json.dumps({"metadata": {"chunk_id": 0, "total_chunks": 0}})
+    })
+    collection = client.collections.get.return_value
+    collection.query.fetch_objects.return_value.objects = [stored]
+
+    store.update_metadata([chunk_id], {"total_chunks": 3})
+
+    call = collection.data.update.call_args
+    assert call.kwargs["uuid"] == chunk_id
+    properties = call.kwargs["properties"]
+    assert properties["total_chunks"] == 3
+    # Nodes read back through llama_index see the new value too
+    assert json.loads(properties["_node_content"])["metadata"] == {"chunk_id": 0, "total_chunks": 3}
+
+
+def test_update_chunks_moves_chunks_to_another_document(client):
+    store = WeaviateChunkStore(client)
+    chunk_id = "0f8fad5b-d9cb-469f-a165-70867728950e"
+    stored = MagicMock(uuid=chunk_id, properties={"_node_content": json.dumps({
+        "metadata": {"doc_id": "old-doc", "chunk_id": 4},
+        "relationships": {"1": {"node_id": "old-doc", "node_type": "4"}},
+    })})
+    collection = client.collections.get.return_value
+    collection.query.fetch_objects.return_value.objects = [stored]
+
+    store.update_chunks({chunk_id: {"doc_id": "new-doc", "chunk_id": 1}}, ref_doc_id="new-doc")
+
+    properties = collection.data.update.call_args.kwargs["properties"]
+    assert properties["ref_doc_id"] == properties["document_id"] == "new-doc"
+    node_content = json.loads(properties["_node_content"])
+    assert node_content["metadata"] == {"doc_id": "new-doc", "chunk_id": 1}
+    assert node_content["relationships"]["1"]["node_id"] == "new-doc"
+
+
+def test_detach_document_hands_shared_chunks_to_remaining_documents(client):
+    store = WeaviateChunkStore(client)
+    owned = MagicMock(uuid="5f0a3c1e-8d4b-4a5e-9b7c-1d2e3f4a5b6c", properties={
+        "search_id": "doc-a", "doc_ids": ["doc-a", "doc-b"],
+        "_node_content": json.dumps({
+            "metadata": {"doc_id": "doc-a"},
+            "relationships": {"1": {"node_id": "doc-a", "node_type": "4"}},
+        }),
+    })
+    referenced = MagicMock(uuid="9b2d7e4f-3a1c-4f6b-8e5d-2c7a9f0b1e3d", properties={
+        "search_id": "doc-c", "doc_ids": ["doc-c", "doc-a"],
+        "_node_content": json.dumps({"metadata": {"doc_id": "doc-c"}, "relationships": {}}),
+    })
+    collection = client.collections.get.return_value
+    collection.query.fetch_objects.return_value.objects = [owned, referenced]
+
+    store.detach_document("doc-a")
+
+    updates = {call.kwargs["uuid"]: call.kwargs["properties"] for call in collection.data.update.call_args_list}
+    moved = updates[owned.uuid]
+    assert moved["doc_id"] == moved["search_id"] == "doc-b"
+    assert moved["doc_ids"] == ["doc-b"]
+    assert json.loads(moved["_node_content"])["relationships"]["1"]["node_id"] == "doc-b"
+    kept = updates[referenced.uuid]
+    assert "doc_id" not in kept
+    assert kept["doc_ids"] == ["doc-c"]
+    collection.data.delete_many.assert_not_called()
+
+
+def test_chunk_hashes_walk_the_collection_past_the_query_window(client, monkeypatch):
+    monkeypatch.setattr(weaviate_store, "_ID_PAGE", 2)
+    monkeypatch.setattr(weaviate_store, "_QUERY_WINDOW", 4)
+    store = WeaviateChunkStore(client)
+    chunks = [
+        MagicMock(uuid=f"00000000-0000-4000-8000-00000000000{i}", properties={
+            "search_id": "doc-a", "chunk_hash": f"hash-{i}", "doc_ids": ["doc-a"]
+        })
+        for i in range(6)
+    ]
+    other = MagicMock(uuid="00000000-0000-4000-8000-000000000009", properties={
+        "search_id": "doc-b", "chunk_hash": "hash-b", "doc_ids": ["doc-b"]
+    })
+    collection = client.collections.get.return_value
+    collection.query.fetch_objects.side_effect = [MagicMock(objects=chunks[:2]), MagicMock(objects=chunks[2:4])]
+    collection.iterator.return_value = iter([chunks[0], other, *chunks[2:]])
+
+    hashes = store.chunk_hashes("doc-a")
+
+    assert hashes == {f"hash-{i}": [str(chunk.uuid)] for i, chunk in enumerate(chunks)}
+    # Offsets only go as far as Weaviate allows
+    assert [call.kwargs["offset"] for call in collection.query.fetch_objects.call_args_list] == [0, 2]
+
+
+def test_get_returns_metadata_by_id(client):
+    store = WeaviateChunkStore(client)
+    chunk_id = "3e1f2a4b-5c6d-4e7f-8a9b-0c1d2e3f4a5b"
+    stored = MagicMock(uuid=chunk_id, properties={
+        "_node_content": json.dumps({"metadata": {"doc_id": "doc-1", "chunk_id": 2, "tags": ["faq"]}})
+    })
+    collection = client.collections.get.return_value
+    collection.query.fetch_objects.return_value.objects = [stored]
+
+    assert store.get([chunk_id]) == {chunk_id: {"doc_id": "doc-1", "chunk_id": 2, "tags": ["faq"]}}
+    # Vectors aren't fetched
+    assert not collection.query.fetch_objects.call_args.kwargs.get("include_vector")
+
+
+def test_copy_document_gives_the_copies_to_the_document(client):
+    source = WeaviateChunkStore(client, index_name="Documents")
+    target = WeaviateChunkStore(client, index_name="TenantDocuments", tenant="user-bob")
+    owned = MagicMock(uuid="5f0a3c1e-8d4b-4a5e-9b7c-1d2e3f4a5b6c", vector={"default": [0.1, 0.2]}, properties={
+        "text": "intro", "search_id": "doc-a", "doc_id": "doc-a", "doc_ids": ["doc-a"],
+        "_node_content": json.dumps({"metadata": {"doc_id": "doc-a"}, "relationships": {}}),
+    })
+    borrowed = MagicMock(uuid="9b2d7e4f-3a1c-4f6b-8e5d-2c7a9f0b1e3d", vector={"default": [0.3, 0.4]}, properties={
+        "text": "footer", "search_id": "doc-c", "doc_id": "doc-c", "doc_ids": ["doc-c", "doc-a"],
+        "_node_content": json.dumps({
+            "metadata": {"doc_id": "doc-c"},
+            "relationships": {"1": {"node_id": "doc-c", "node_type": "4"}},
+        }),
+    })
+    collection = client.collections.get.return_value
+    # The document's chunks in the source, then those the target has already
+    collection.query.fetch_objects.side_effect = [MagicMock(objects=[owned, borrowed]), MagicMock(objects=[])]
+
+    assert source.copy_document("doc-a", target) == 2
+
+    collection.with_tenant.assert_called_with("user-bob")
+    batch = client.batch.dynamic.return_value.__enter__.return_value
+    copies = {call.kwargs["uuid"]: call.kwargs for call in batch.add_object.call_args_list}
+    assert copies[owned.uuid]["tenant"] == "user-bob" and copies[owned.uuid]["vector"] == [0.1, 0.2]
+    copied = copies[borrowed.uuid]["properties"]
+    assert copied["search_id"] == copied["doc_id"] == "doc-a" and copied["doc_ids"] == ["doc-a"]
+    assert json.loads(copied["_node_content"])["relationships"]["1"]["node_id"] == "doc-a"
@@ -6,7 +6,24 @@ import Input from '../../../common/Input/Input';
 import DocumentItem from '../DocumentItem/DocumentItem';
 import { Document } from '../../../../types/documents';
 import { handleApiError } from '../../../../utils/errorHandler';
-import { apiClient } from '../../../../services/api';
+import { apiClient, IngestionJob } from '../../../../services/api';
+
+interface UploadFailure {
+    filename: string;
+    error: string;
+}
+
+// Files of a finished job that didn't make it into the index, with the reason
+const jobFailures = (job: IngestionJob): UploadFailure[] => {
+    if (job.files) {
+        return job.files
+            .filter(file => file.status === 'failed' || file.status === 'rejected')
+            .map(file => ({ filename: file.filename, error: file.error || 'Indexing failed' }));
+    }
+    return job.status === 'failed'
+        ? [{ filename: job.filename || 'Upload', error: job.error || 'Indexing failed' }]
+        : [];
+};
 
 interface DocumentsModalProps {
     isOpen: boolean;
@@ -18,6 +35,7 @@ const DocumentsModal: React.FC<DocumentsModalProps> = ({ isOpen, onClose, onUplo
     const [documents, setDocuments] = useState<Document[]>([]);
     const [uploading, setUploading] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
+    const [failures, setFailures] = useState<UploadFailure[]>([]);
     const fileInputRef = useRef<HTMLInputElement>(null);
 
     useEffect(() => {
@@ -42,18 +60,26 @@ const DocumentsModal: React.FC<DocumentsModalProps> = ({ isOpen, onClose, onUplo
     };
 
     const handleUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
-        const file = event.target.files?.[0];
-        if (!file) return;
+        const files = Array.from(event.target.files ?? []);
+        if (files.length === 0) return;
 
         try {
             setUploading(true);
-            await apiClient.uploadDocument(file);
+            setFailures([]);
+            // Several files or an archive go up in one request and are indexed as one job
+            const jobId = files.length === 1 && !files[0].name.toLowerCase().endsWith('.zip')
+                ? await apiClient.uploadDocument(files[0])
+                : await apiClient.uploadDocuments(files);
+            const job = await apiClient.waitForJob(jobId);
+            setFailures(jobFailures(job));
             await fetchDocuments();
             onUploadComplete();
         } catch (err) {
             handleApiError(err);
         } finally {
             setUploading(false);
+            // Lets the same file be picked again after a failure
+            event.target.value = '';
         }
     };
 
@@ -102,10 +128,20 @@ const DocumentsModal: React.FC<DocumentsModalProps> = ({ isOpen, onClose, onUplo
                     disabled={uploading}
                     icon="upload"
                 >
-                    Upload
+                    {uploading ? 'Indexing...' : 'Upload'}
                 </Button>
             </div>
 
+            {failures.length > 0 && (
+                <ul className={styles.failures}>
+                    {failures.map((failure, index) => (
+                        <li key={index}>
+                            {failure.filename}: {failure.error}
+                        </li>
+                    ))}
+                </ul>
+            )}
+
             <div className={styles.documentList}>
                 {filteredDocuments.map(doc => (
                     <DocumentItem
@@ -121,7 +157,8 @@ const DocumentsModal: React.FC<DocumentsModalProps> = ({ isOpen, onClose, onUplo
                 ref={fileInputRef}
                 type="file"
                 onChange={handleUpload}
-                accept=".pdf,.txt,.doc,.docx"
+                accept=".pdf,.txt,.doc,.docx,.zip"
+                multiple
                 style={{ display: 'none' }}
             />
         </Modal>
@@ -4,12 +4,35 @@ const BASE_URL = process.env.REACT_APP_API_URL || (
         : 'http://localhost:8000'
 );
 
+// Documents asked for per request when loading the document list
+const DOCUMENT_PAGE_SIZE = 100;
+// Milliseconds between checks on an upload that is still being indexed
+const JOB_POLL_INTERVAL = 1000;
+
 export interface Document {
     id: string;
     filename: string;
     active: boolean;
 }
 
+export interface IngestionFile {
+    filename: string;
+    doc_id: string | null;
+    status: 'queued' | 'running' | 'done' | 'failed' | 'rejected' | 'duplicate' | 'exists';
+    error: string | null;
+}
+
+export interface IngestionJob {
+    id: string;
+    doc_id: string | null;
+    filename: string | null;
+    status: 'queued' | 'running' | 'done' | 'failed';
+    stage: string;
+    progress: number;
+    error: string | null;
+    files?: IngestionFile[];
+}
+
 export class ApiClient {
     private baseUrl: string;
 
@@ -84,7 +107,7 @@ export class ApiClient {
         }
     }
 
-    async upload(path: string, formData: FormData): Promise<void> {
+    async upload<T>(path: string, formData: FormData): Promise<T> {
         const token = localStorage.getItem('access_token');
         const headers: Record<string, string> = {};
         if (token) {
@@ -99,12 +122,24 @@ export class ApiClient {
         if (!response.ok) {
             throw new Error('Upload failed');
         }
+        return response.json();
     }
 
     // Document management
     async getDocuments(): Promise<Document[]> {
-        const response = await this.get<Document[]>('/api/documents/list');
-        return response;
+        // Asked for a page at a time; follow the cursors to the end
+        const documents: Document[] = [];
+        let cursor: string | null = null;
+        do {
+            const query: string = `?limit=${DOCUMENT_PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+            const response = await fetch(`${this.baseUrl}/api/documents/list${query}`, {
+                headers: this.getHeaders(),
+            });
+            if (!response.ok) throw new Error(`API Error: ${response.statusText}`);
+            documents.push(...await response.json());
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+        return documents;
     }
 
     async deleteDocument(docId: string): Promise<void> {
@@ -119,10 +154,32 @@ export class ApiClient {
         await this.patch(`/api/documents/${docId}`, { active });
     }
 
-    async uploadDocument(file: File): Promise<void> {
+    // Uploads are indexed in the background; both return the id of the ingestion job
+    async uploadDocument(file: File): Promise<string> {
         const formData = new FormData();
         formData.append('file', file);
-        await this.upload('/api/documents/upload', formData);
+        const { job_id } = await this.upload<{ job_id: string }>('/api/documents/upload', formData);
+        return job_id;
+    }
+
+    async uploadDocuments(files: File[]): Promise<string> {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        const { job_id } = await this.upload<{ job_id: string }>('/api/documents/upload/bulk', formData);
+        return job_id;
+    }
+
+    async getJob(jobId: string): Promise<IngestionJob> {
+        return this.get<IngestionJob>(`/api/documents/jobs/${jobId}`);
+    }
+
+    async waitForJob(jobId: string): Promise<IngestionJob> {
+        // Polled until the job is done or has failed
+        for (;;) {
+            const job = await this.getJob(jobId);
+            if (job.status === 'done' || job.status === 'failed') return job;
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
     }
 
     // Add other methods as needed (PUT, DELETE, etc.)